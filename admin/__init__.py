@@ -2,12 +2,28 @@ import azure.functions as func
 import logging
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from typing import Dict, Any, List
 
-# Azure SDK imports
-import azure.cosmos.cosmos_client as cosmos_client
-import azure.cosmos.exceptions as exceptions
+# Shared Cosmos DB connection
+from cosmos_connection import get_container
+from continuation import encode_continuation, decode_continuation, split_page
+from refresh_cache import RefreshingCache
+from session_store import CosmosSessionStore, LayoutCutoverInProgress, check_single_layout
+from answer_codec import ANSWERS_COUNT_SQL
+import change_feed
+
+SESSIONS_FILTER = CosmosSessionStore.SESSIONS_FILTER
+
+# Only the listed fields are read; answersCount mirrors answer_codec.count_answers for either answer format
+LISTING_SELECT = (
+    "c.id, c.nickname, c.status, c.createdAt, c.completedAt, c.reportFirstViewedAt, "
+    f"{ANSWERS_COUNT_SQL} AS answersCount, IS_DEFINED(c.result) AS hasResult, "
+    "c.result.primaryArchetype AS primaryArchetype, c.result.secondaryArchetype AS secondaryArchetype"
+)
+LISTING_FIELDS = ("id", "nickname", "status", "createdAt", "completedAt", "reportFirstViewedAt",
+                  "answersCount", "hasResult", "primaryArchetype", "secondaryArchetype")
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -17,8 +33,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     Query Parameters: 
     - status (optional): Filter by status (InProgress, Completed)
     - limit (optional): Limit number of results (default: 100)
-    - offset (optional): Offset for pagination (default: 0)
-    Returns: 200 OK with list of sessions
+    - continuation (optional): pagination.continuationToken from the previous page
+    Returns: 200 OK with list of sessions, newest first; 409 during the cosmos-dual layout cutover
     """
     logging.info('Python HTTP trigger function processed a request.')
     
@@ -26,7 +42,6 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         # Get query parameters
         status_filter = req.params.get('status')
         limit = int(req.params.get('limit', 100))
-        offset = int(req.params.get('offset', 0))
         
         # Validate parameters
         if limit > 1000:
@@ -36,21 +51,57 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
         
-        if offset < 0:
+        if limit < 1:
             return func.HttpResponse(
-                json.dumps({"error": "Offset cannot be negative"}),
+                json.dumps({"error": "Limit must be at least 1"}),
                 status_code=400,
                 mimetype="application/json"
             )
         
-        # Initialize Cosmos DB client
-        cosmos_client_instance = get_cosmos_client()
+        if 'offset' in req.params:
+            return func.HttpResponse(
+                json.dumps({"error": "offset is no longer supported; pass pagination.continuationToken as continuation"}),
+                status_code=400,
+                mimetype="application/json"
+            )
         
-        # Get all sessions with optional filtering
-        sessions = get_all_sessions(cosmos_client_instance, status_filter, limit, offset)
+        try:
+            after = decode_continuation(req.params.get('continuation'))
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        # The listing, its counts and the read models see only the partitioned container during the cutover
+        try:
+            check_single_layout("The session listing")
+        except LayoutCutoverInProgress as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=409,
+                mimetype="application/json"
+            )
         
-        # Calculate summary statistics
-        summary = calculate_summary_statistics(cosmos_client_instance)
+        if change_feed.is_enabled():
+            # Served from the change-feed read models, off the write-hot sessions container
+            sessions, next_key = change_feed.list_sessions(status_filter, limit, after)
+            total = change_feed.count_sessions(status_filter)
+        else:
+            # Get the shared sessions container
+            container = get_container()
+            
+            # Get one page of sessions with optional filtering
+            sessions, next_key = get_all_sessions(container, status_filter, limit, after)
+            total = count_sessions(container, status_filter)
+        
+        # Summary statistics change slowly, so every admin shares one cached computation
+        try:
+            summary, summary_age = get_cached_summary()
+        except Exception as e:
+            logging.error(f"Error calculating summary statistics: {str(e)}")
+            summary, summary_age = dict(EMPTY_SUMMARY), None
         
         # Prepare response
         response_data = {
@@ -58,10 +109,16 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "summary": summary,
             "pagination": {
                 "limit": limit,
-                "offset": offset,
-                "total": len(sessions)
+                "continuationToken": encode_continuation(next_key),
+                "total": total
+            },
+            "summaryCache": {
+                "ageSeconds": summary_age,
+                "ttlSeconds": _summary_cache.ttl_seconds
             }
         }
+        if change_feed.is_enabled():
+            response_data["projection"] = change_feed.get_projection_status()
         
         return func.HttpResponse(
             json.dumps(response_data),
@@ -77,131 +134,107 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
-def get_cosmos_client():
-    """Initialize and return Cosmos DB client"""
-    cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
-    cosmos_key = os.environ.get('COSMOS_KEY')
-    
-    if not cosmos_endpoint or not cosmos_key:
-        raise ValueError("Cosmos DB credentials not configured")
-    
-    return cosmos_client.CosmosClient(cosmos_endpoint, cosmos_key)
+def get_all_sessions(container, status_filter=None, limit=100, after=None):
+    """Retrieve one page of sessions, newest first, starting after the (createdAt, id) key
 
-def get_database_name():
-    """Get database name from environment or use default"""
-    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
-
-def get_container_name():
-    """Get container name from environment or use default"""
-    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
-
-def get_all_sessions(cosmos_client_instance, status_filter=None, limit=100, offset=0):
-    """Retrieve all sessions with optional filtering"""
+    Returns (sessions, next_key); next_key is None on the last page.
+    """
     try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Build query based on filters
+        # Seek past the previous page's last key instead of skipping rows with OFFSET
+        conditions = [SESSIONS_FILTER]
+        parameters = [{"name": "@limit", "value": limit + 1}]
         if status_filter:
-            query = "SELECT * FROM c WHERE c.status = @status ORDER BY c.createdAt DESC OFFSET @offset LIMIT @limit"
-            parameters = [
-                {"name": "@status", "value": status_filter},
-                {"name": "@offset", "value": offset},
-                {"name": "@limit", "value": limit}
-            ]
-        else:
-            query = "SELECT * FROM c ORDER BY c.createdAt DESC OFFSET @offset LIMIT @limit"
-            parameters = [
-                {"name": "@offset", "value": offset},
-                {"name": "@limit", "value": limit}
-            ]
-        
-        items = list(container.query_items(
+            conditions.append("c.status = @status")
+            parameters.append({"name": "@status", "value": status_filter})
+        if after:
+            conditions.append("(c.createdAt < @afterCreatedAt OR (c.createdAt = @afterCreatedAt AND c.id < @afterId))")
+            parameters.extend([
+                {"name": "@afterCreatedAt", "value": after[0]},
+                {"name": "@afterId", "value": after[1]}
+            ])
+        query = (f"SELECT TOP @limit {LISTING_SELECT} FROM c WHERE {' AND '.join(conditions)} "
+                 "ORDER BY c.createdAt DESC, c.id DESC")
+        
+        items = container.query_items(
             query=query,
             parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        
-        # Sanitize sensitive data for admin view
-        sanitized_items = []
-        for item in items:
-            sanitized_item = {
-                "id": item.get('id'),
-                "nickname": item.get('nickname'),
-                "status": item.get('status'),
-                "createdAt": item.get('createdAt'),
-                "completedAt": item.get('completedAt'),
-                "reportFirstViewedAt": item.get('reportFirstViewedAt'),
-                "answersCount": len(item.get('answers', [])),
-                "hasResult": 'result' in item,
-                "primaryArchetype": item.get('result', {}).get('primaryArchetype'),
-                "secondaryArchetype": item.get('result', {}).get('secondaryArchetype')
-            }
-            sanitized_items.append(sanitized_item)
+            enable_cross_partition_query=True,
+            max_item_count=limit + 1
+        )
         
-        return sanitized_items
+        # Undefined properties are left out of a projection, so fill every listed field
+        sessions = [{field: item.get(field) for field in LISTING_FIELDS} for item in items]
+        return split_page(sessions, limit, 'createdAt')
         
     except Exception as e:
         logging.error(f"Error retrieving sessions: {str(e)}")
-        return []
+        return [], None
 
-def calculate_summary_statistics(cosmos_client_instance):
-    """Calculate summary statistics for all sessions"""
+def count_sessions(container, status_filter=None):
+    """Count every session matching the filter, not just the current page"""
     try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Get total count
-        total_query = "SELECT VALUE COUNT(1) FROM c"
-        total_result = list(container.query_items(
-            query=total_query,
-            enable_cross_partition_query=True
-        ))
-        total_sessions = total_result[0] if total_result else 0
-        
-        # Get completed count
-        completed_query = "SELECT VALUE COUNT(1) FROM c WHERE c.status = 'Completed'"
-        completed_result = list(container.query_items(
-            query=completed_query,
-            enable_cross_partition_query=True
-        ))
-        completed_sessions = completed_result[0] if completed_result else 0
-        
-        # Get in progress count
-        in_progress_query = "SELECT VALUE COUNT(1) FROM c WHERE c.status = 'InProgress'"
-        in_progress_result = list(container.query_items(
-            query=in_progress_query,
+        conditions = [SESSIONS_FILTER]
+        parameters = []
+        if status_filter:
+            conditions.append("c.status = @status")
+            parameters.append({"name": "@status", "value": status_filter})
+        result = list(container.query_items(
+            query=f"SELECT VALUE COUNT(1) FROM c WHERE {' AND '.join(conditions)}",
+            parameters=parameters,
             enable_cross_partition_query=True
         ))
-        in_progress_sessions = in_progress_result[0] if in_progress_result else 0
+        return result[0] if result else 0
         
-        # Get reports viewed count
-        reports_viewed_query = "SELECT VALUE COUNT(1) FROM c WHERE IS_DEFINED(c.reportFirstViewedAt)"
-        reports_viewed_result = list(container.query_items(
-            query=reports_viewed_query,
+    except Exception as e:
+        logging.error(f"Error counting sessions: {str(e)}")
+        return 0
+
+def get_summary_cache_settings():
+    """Get summary cache TTL and stale window from environment or use defaults"""
+    return (float(os.environ.get('ADMIN_SUMMARY_TTL_SECONDS', 30)),
+            float(os.environ.get('ADMIN_SUMMARY_STALE_SECONDS', 300)))
+
+_summary_cache = RefreshingCache("admin-summary", *get_summary_cache_settings())
+
+EMPTY_SUMMARY = {
+    "totalSessions": 0,
+    "completedSessions": 0,
+    "inProgressSessions": 0,
+    "reportsViewed": 0,
+    "completionRate": 0.0
+}
+
+# Every summary counter as a filtered COUNT(1), so each query reads only the documents it counts
+SUMMARY_CONDITIONS = {
+    "totalSessions": [],
+    "completedSessions": ["c.status = 'Completed'"],
+    "inProgressSessions": ["c.status = 'InProgress'"],
+    "reportsViewed": ["IS_STRING(c.reportFirstViewedAt)"]
+}
+
+def query_summary_statistics(container):
+    """Compute summary statistics with filtered counts, issued together"""
+    def run_count(item):
+        name, conditions = item
+        result = list(container.query_items(
+            query=f"SELECT VALUE COUNT(1) FROM c WHERE {' AND '.join([SESSIONS_FILTER] + conditions)}",
             enable_cross_partition_query=True
         ))
-        reports_viewed = reports_viewed_result[0] if reports_viewed_result else 0
-        
-        # Calculate completion rate
-        completion_rate = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
-        
-        return {
-            "totalSessions": total_sessions,
-            "completedSessions": completed_sessions,
-            "inProgressSessions": in_progress_sessions,
-            "reportsViewed": reports_viewed,
-            "completionRate": round(completion_rate, 1)
-        }
-        
-    except Exception as e:
-        logging.error(f"Error calculating summary statistics: {str(e)}")
-        return {
-            "totalSessions": 0,
-            "completedSessions": 0,
-            "inProgressSessions": 0,
-            "reportsViewed": 0,
-            "completionRate": 0.0
-        } 
\ No newline at end of file
+        return name, (result[0] if result else 0) or 0
+    
+    with ThreadPoolExecutor(max_workers=len(SUMMARY_CONDITIONS)) as executor:
+        counts = dict(executor.map(run_count, SUMMARY_CONDITIONS.items()))
+    
+    # Calculate completion rate
+    total_sessions = counts["totalSessions"]
+    completion_rate = (counts["completedSessions"] / total_sessions * 100) if total_sessions > 0 else 0
+    counts["completionRate"] = round(completion_rate, 1)
+    return counts
+
+def get_cached_summary(force=False):
+    """Summary statistics from the in-process cache; returns (summary, cache age in seconds)"""
+    if change_feed.is_enabled():
+        cached = _summary_cache.get("projections", change_feed.get_summary, force=force)
+    else:
+        cached = _summary_cache.get("sessions", lambda: query_summary_statistics(get_container()), force=force)
+    return cached.value, round(cached.age, 1)
@@ -0,0 +1,68 @@
+import azure.functions as func
+import logging
+import json
+from change_feed import is_enabled, list_contacts, get_summary, get_projection_status
+from continuation import encode_continuation, decode_continuation
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Admin Contacts API - Contact inbox served from the change-feed projection
+    
+    GET /api/admin/contacts
+    Query Parameters:
+    - limit (optional): Limit number of results (default: 100)
+    - continuation (optional): pagination.continuationToken from the previous page
+    Returns: 200 OK with contact submissions, newest first
+    """
+    logging.info('Python HTTP trigger function processed a request.')
+    
+    try:
+        if not is_enabled():
+            return func.HttpResponse(
+                json.dumps({"error": "Contact inbox requires CHANGE_FEED_ENABLED=true"}),
+                status_code=404,
+                mimetype="application/json"
+            )
+        
+        # Get query parameters
+        limit = int(req.params.get('limit', 100))
+        after = decode_continuation(req.params.get('continuation'))
+        
+        # Validate parameters
+        if limit > 1000 or limit < 1:
+            return func.HttpResponse(
+                json.dumps({"error": "limit must be between 1 and 1000"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        contacts, next_key = list_contacts(limit, after)
+        response_data = {
+            "contacts": contacts,
+            "projection": get_projection_status(),
+            "pagination": {
+                "limit": limit,
+                "continuationToken": encode_continuation(next_key),
+                "total": get_summary()["contacts"]
+            }
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response_data, indent=2),
+            status_code=200,
+            mimetype="application/json"
+        )
+        
+    except ValueError:
+        return func.HttpResponse(
+            json.dumps({"error": "limit must be an integer and continuation a token from a previous page"}),
+            status_code=400,
+            mimetype="application/json"
+        )
+    except Exception as e:
+        logging.error(f"Error in admin contacts API: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal server error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
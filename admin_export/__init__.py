@@ -0,0 +1,87 @@
+import azure.functions as func
+import logging
+import json
+import gzip
+from session_export import (EXPORT_FORMATS, get_export_settings, parse_filters, read_export_page,
+                            encode_export_token, decode_export_token)
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Admin Export API - One page of session rows as NDJSON or CSV
+
+    GET /api/admin/sessions/export
+    Query Parameters:
+    - format (optional): ndjson or csv (default: ndjson)
+    - status (optional): Only sessions with this status (InProgress, Completed)
+    - from, to (optional): Only sessions created at or after from and before to (ISO dates)
+    - archetype (optional): Only sessions with this primary archetype
+    - limit (optional): Rows per page (default: EXPORT_PAGE_SIZE or 1000)
+    - continuation (optional): X-Continuation-Token from the previous page (the header is accepted too)
+    Returns: 200 OK with the rows; X-Continuation-Token is set while more pages remain.
+    The CSV header is only sent on the first page, so pages concatenate into one file.
+    Responses are gzipped when the client sends Accept-Encoding: gzip.
+    """
+    logging.info('Python HTTP trigger function processed a request.')
+
+    try:
+        settings = get_export_settings()
+
+        # Get query parameters
+        export_format = req.params.get('format', 'ndjson').lower()
+        token = req.params.get('continuation') or req.headers.get('X-Continuation-Token')
+
+        # Validate parameters
+        if export_format not in EXPORT_FORMATS:
+            return func.HttpResponse(
+                json.dumps({"error": f"format must be one of: {', '.join(sorted(EXPORT_FORMATS))}"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        try:
+            limit = int(req.params.get('limit', settings["page_size"]))
+            if limit < 1 or limit > settings["max_page_size"]:
+                raise ValueError(f"limit must be between 1 and {settings['max_page_size']}")
+            filters = parse_filters(req.params.get('status'), req.params.get('from'),
+                                    req.params.get('to'), req.params.get('archetype'))
+            continuation = decode_export_token(token, filters)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        # One bounded page per request keeps memory and response time flat however large the export
+        rows, next_continuation = read_export_page(filters, limit, continuation,
+                                                   max_seconds=settings["request_seconds"])
+        encode, mimetype = EXPORT_FORMATS[export_format]
+        body = "".join(encode(rows, header=not token)).encode('utf-8')
+
+        headers = {
+            "Content-Disposition": f'attachment; filename="sessions.{export_format}"',
+            "X-Export-Rows": str(len(rows)),
+            "Vary": "Accept-Encoding"
+        }
+        next_token = encode_export_token(next_continuation, filters)
+        if next_token:
+            headers["X-Continuation-Token"] = next_token
+        if 'gzip' in req.headers.get('Accept-Encoding', '').lower():
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+        return func.HttpResponse(
+            body,
+            status_code=200,
+            mimetype=mimetype,
+            charset="utf-8",
+            headers=headers
+        )
+
+    except Exception as e:
+        logging.error(f"Error in admin export API: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal server error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -1,13 +1,31 @@
 import azure.functions as func
+import hashlib
 import logging
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
 
-# Azure SDK imports
-import azure.cosmos.cosmos_client as cosmos_client
-import azure.cosmos.exceptions as exceptions
+# Shared Cosmos DB connection
+from cosmos_connection import get_container
+from scoring import ARCHETYPE_NAMES
+from session_store import CosmosSessionStore, check_single_layout
+from analytics_rollups import get_rollup_metrics, get_rollup_timings
+from refresh_cache import RefreshingCache
+
+SESSIONS_FILTER = CosmosSessionStore.SESSIONS_FILTER
+
+def get_analytics_cache_settings():
+    """Get response cache TTL, stale window and minimum forced-refresh interval from environment or use defaults"""
+    return {
+        "ttl_seconds": float(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 60)),
+        "stale_seconds": float(os.environ.get('ANALYTICS_CACHE_STALE_SECONDS', 600)),
+        "min_refresh_seconds": float(os.environ.get('ANALYTICS_MIN_REFRESH_SECONDS', 5))
+    }
+
+_settings = get_analytics_cache_settings()
+_response_cache = RefreshingCache("analytics", _settings["ttl_seconds"], _settings["stale_seconds"])
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -16,7 +34,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     GET /api/admin/analytics
     Query Parameters:
     - period (optional): "24h", "7d", "30d", "all" (default: "7d")
-    Returns: 200 OK with analytics data
+    - refresh (optional): If true, recompute instead of serving the cached response (default: false)
+    Returns: 200 OK with analytics data, or 304 Not Modified when If-None-Match matches
     """
     logging.info('Python HTTP trigger function processed a request.')
     
@@ -33,26 +52,36 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # Initialize Cosmos DB client
-        cosmos_client_instance = get_cosmos_client()
-
-        # Calculate date filter
-        date_filter = calculate_date_filter(period)
-        
-        # Get analytics data
-        analytics_data = get_analytics_data(cosmos_client_instance, date_filter)
-
-        # Build response
-        response_data = {
-            "period": period,
-            "generatedAt": datetime.now(timezone.utc).isoformat(),
-            "metrics": analytics_data
+        # Serve the cached response; a forced refresh is honoured at most once per min_refresh_seconds
+        settings = get_analytics_cache_settings()
+        refresh = req.params.get('refresh', 'false').lower() == 'true'
+        previous = _response_cache.peek(period)
+        force = refresh and (previous is None or previous.age >= settings["min_refresh_seconds"])
+        try:
+            cached = _response_cache.get(period, lambda: build_response(period), force=force)
+        except Exception:
+            # The cache has logged the failure; keep serving the last good response, and fail only when cold
+            if previous is None:
+                raise
+            cached = previous
+        body, etag = cached.value
+        age = int(cached.age)
+        headers = {
+            "Cache-Control": f"private, max-age={max(0, int(_response_cache.ttl_seconds) - age)}, "
+                             f"stale-while-revalidate={int(_response_cache.stale_seconds)}",
+            "Age": str(age),
+            "ETag": etag
         }
 
+        if_none_match = [tag.strip() for tag in (req.headers.get('If-None-Match') or '').split(',')]
+        if etag in if_none_match or '*' in if_none_match:
+            return func.HttpResponse(status_code=304, headers=headers)
+
         return func.HttpResponse(
-            json.dumps(response_data, indent=2),
+            body,
             status_code=200,
-            mimetype="application/json"
+            mimetype="application/json",
+            headers=headers
         )
 
     except Exception as e:
@@ -63,6 +92,34 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
+def build_response(period):
+    """Compute the analytics response for a period; returns (serialized body, ETag)"""
+    # Read the incrementally maintained rollups, or aggregate the sessions themselves
+    if get_analytics_source() == "rollups":
+        analytics_data = get_rollup_metrics(period)
+    else:
+        check_single_layout("ANALYTICS_SOURCE=query")
+        analytics_data = get_analytics_data(get_container(), calculate_date_filter(period), period)
+
+    # Build response
+    response_data = {
+        "period": period,
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "metrics": analytics_data
+    }
+
+    # Weak ETag over the metrics only, so a recomputation with unchanged numbers keeps the same tag
+    metrics = {key: value for key, value in analytics_data.items() if key != "periodStats"}
+    digest = hashlib.sha256(json.dumps(metrics, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+    return json.dumps(response_data, indent=2).encode('utf-8'), f'W/"{digest}"'
+
+def get_analytics_source():
+    """Get where analytics are computed from: "rollups" (default) or "query" over the sessions"""
+    source = os.environ.get('ANALYTICS_SOURCE', 'rollups').strip().lower()
+    if source not in ("rollups", "query"):
+        raise ValueError(f"Unknown ANALYTICS_SOURCE: {source}")
+    return source
+
 def calculate_date_filter(period):
     """Calculate the date filter based on period"""
     now = datetime.now(timezone.utc)
@@ -76,123 +133,100 @@ def calculate_date_filter(period):
     else:  # 'all'
         return None
 
-def get_analytics_data(cosmos_client_instance, date_filter):
-    """Get analytics data from Cosmos DB"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-
-        # Build query based on date filter
-        if date_filter:
-            query = "SELECT * FROM c WHERE c.createdAt >= @date_filter"
-            parameters = [{"name": "@date_filter", "value": date_filter.isoformat()}]
-        else:
-            query = "SELECT * FROM c"
-            parameters = []
-
-        # Execute query
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-
-        # Calculate metrics
-        total_sessions = len(items)
-        completed_sessions = len([item for item in items if item.get('status') == 'Completed'])
-        in_progress_sessions = len([item for item in items if item.get('status') == 'InProgress'])
-        
-        # Calculate completion rate
-        completion_rate = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
-        
-        # Calculate average completion time
-        completion_times = []
-        for item in items:
-            if item.get('status') == 'Completed' and item.get('createdAt') and item.get('completedAt'):
-                try:
-                    created = datetime.fromisoformat(item['createdAt'].replace('Z', '+00:00'))
-                    completed = datetime.fromisoformat(item['completedAt'].replace('Z', '+00:00'))
-                    duration = (completed - created).total_seconds() / 60  # minutes
-                    completion_times.append(duration)
-                except:
-                    continue
-        
-        avg_completion_time = sum(completion_times) / len(completion_times) if completion_times else 0
-        
-        # Calculate archetype distribution
-        archetype_counts = {}
-        for item in items:
-            if item.get('status') == 'Completed' and item.get('result'):
-                primary = item['result'].get('primaryArchetype')
-                if primary:
-                    archetype_counts[primary] = archetype_counts.get(primary, 0) + 1
-        
-        # Calculate report generation stats
-        reports_generated = len([item for item in items if item.get('result', {}).get('reportContent')])
-        reports_viewed = len([item for item in items if item.get('reportFirstViewedAt')])
-        
-        # Calculate daily activity (last 7 days)
-        daily_activity = {}
-        for i in range(7):
-            date = (datetime.now(timezone.utc) - timedelta(days=i)).strftime('%Y-%m-%d')
-            daily_activity[date] = 0
-        
-        for item in items:
-            if item.get('createdAt'):
-                try:
-                    created = datetime.fromisoformat(item['createdAt'].replace('Z', '+00:00'))
-                    date_key = created.strftime('%Y-%m-%d')
-                    if date_key in daily_activity:
-                        daily_activity[date_key] += 1
-                except:
-                    continue
-
-        return {
-            "sessions": {
-                "total": total_sessions,
-                "completed": completed_sessions,
-                "inProgress": in_progress_sessions,
-                "completionRate": round(completion_rate, 1)
-            },
-            "performance": {
-                "averageCompletionTimeMinutes": round(avg_completion_time, 1),
-                "reportsGenerated": reports_generated,
-                "reportsViewed": reports_viewed,
-                "reportViewRate": round((reports_viewed / reports_generated * 100) if reports_generated > 0 else 0, 1)
-            },
-            "archetypeDistribution": archetype_counts,
-            "dailyActivity": daily_activity,
-            "periodStats": {
-                "startDate": date_filter.isoformat() if date_filter else "all time",
-                "endDate": datetime.now(timezone.utc).isoformat()
-            }
-        }
-
-    except Exception as e:
-        logging.error(f"Error getting analytics data: {str(e)}")
-        return {
-            "sessions": {"total": 0, "completed": 0, "inProgress": 0, "completionRate": 0},
-            "performance": {"averageCompletionTimeMinutes": 0, "reportsGenerated": 0, "reportsViewed": 0, "reportViewRate": 0},
-            "archetypeDistribution": {},
-            "dailyActivity": {},
-            "periodStats": {"startDate": "all time", "endDate": datetime.now(timezone.utc).isoformat()}
+def query_value(container, select, conditions, parameters):
+    """Run a single-value aggregate over session documents and return the value (None if no rows)"""
+    query = f"SELECT VALUE {select} FROM c WHERE " + " AND ".join([SESSIONS_FILTER] + conditions)
+    results = list(container.query_items(
+        query=query,
+        parameters=parameters,
+        enable_cross_partition_query=True
+    ))
+    return results[0] if results else None
+
+def get_analytics_data(container, date_filter, period='all'):
+    """Get analytics data from Cosmos DB
+
+    Errors propagate, so the response cache keeps serving its last good value instead of caching zeros.
+    Completion times and answer latency are read from the rollups for the
+    period's whole UTC days; periodStats.timingsStartDate labels that window.
+    """
+    # Every metric is an aggregate computed by Cosmos DB; only single values come back
+    conditions = []
+    parameters = []
+    if date_filter:
+        conditions.append("c.createdAt >= @date_filter")
+        parameters.append({"name": "@date_filter", "value": date_filter.isoformat()})
+
+    # name -> (aggregate, extra conditions, extra parameters)
+    aggregates = {
+        "total": ("COUNT(1)", [], []),
+        "completed": ("COUNT(1)", ["c.status = 'Completed'"], []),
+        "inProgress": ("COUNT(1)", ["c.status = 'InProgress'"], []),
+        "reportsGenerated": ("COUNT(1)", ["IS_STRING(c.result.reportContent)", "LENGTH(c.result.reportContent) > 0"], []),
+        "reportsViewed": ("COUNT(1)", ["IS_STRING(c.reportFirstViewedAt)"], [])
+    }
+    for archetype in ARCHETYPE_NAMES:
+        aggregates[archetype] = ("COUNT(1)", ["c.status = 'Completed'", "c.result.primaryArchetype = @archetype"],
+                                 [{"name": "@archetype", "value": archetype}])
+
+    # Daily activity (last 7 days) as one range count per day
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [today - timedelta(days=i) for i in range(7)]
+    for day in days:
+        aggregates[day.strftime('%Y-%m-%d')] = ("COUNT(1)", ["c.createdAt >= @dayStart", "c.createdAt < @dayEnd"], [
+            {"name": "@dayStart", "value": day.isoformat()},
+            {"name": "@dayEnd", "value": (day + timedelta(days=1)).isoformat()}
+        ])
+
+    def run_aggregate(item):
+        name, (select, extra_conditions, extra_parameters) = item
+        return name, query_value(container, select, conditions + extra_conditions, parameters + extra_parameters) or 0
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = dict(executor.map(run_aggregate, aggregates.items()))
+
+    # Completion times come from the rollups, which cover sessions stored before
+    # completionDurationSeconds existed, rather than a scan over every completed session
+    timings = get_rollup_timings(period)
+
+    # Calculate metrics
+    total_sessions = values["total"]
+    completed_sessions = values["completed"]
+    in_progress_sessions = values["inProgress"]
+    
+    # Calculate completion rate
+    completion_rate = (completed_sessions / total_sessions * 100) if total_sessions > 0 else 0
+    
+    # Calculate archetype distribution
+    archetype_counts = {archetype: values[archetype] for archetype in ARCHETYPE_NAMES if values[archetype]}
+    
+    # Calculate report generation stats
+    reports_generated = values["reportsGenerated"]
+    reports_viewed = values["reportsViewed"]
+    
+    # Calculate daily activity (last 7 days)
+    daily_activity = {day.strftime('%Y-%m-%d'): values[day.strftime('%Y-%m-%d')] for day in days}
+
+    return {
+        "sessions": {
+            "total": total_sessions,
+            "completed": completed_sessions,
+            "inProgress": in_progress_sessions,
+            "completionRate": round(completion_rate, 1)
+        },
+        "performance": {
+            "averageCompletionTimeMinutes": timings["averageCompletionTimeMinutes"],
+            "completionTimeMinutes": timings["completionTimeMinutes"],
+            "answerLatencySeconds": timings["answerLatencySeconds"],
+            "reportsGenerated": reports_generated,
+            "reportsViewed": reports_viewed,
+            "reportViewRate": round((reports_viewed / reports_generated * 100) if reports_generated > 0 else 0, 1)
+        },
+        "archetypeDistribution": archetype_counts,
+        "dailyActivity": daily_activity,
+        "periodStats": {
+            "startDate": date_filter.isoformat() if date_filter else "all time",
+            "timingsStartDate": timings["startDate"],
+            "endDate": datetime.now(timezone.utc).isoformat()
         }
-
-def get_cosmos_client():
-    """Initialize and return Cosmos DB client"""
-    cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
-    cosmos_key = os.environ.get('COSMOS_KEY')
-
-    if not cosmos_endpoint or not cosmos_key:
-        raise ValueError("Cosmos DB credentials not configured")
-
-    return cosmos_client.CosmosClient(cosmos_endpoint, cosmos_key)
-
-def get_database_name():
-    """Get database name from environment or use default"""
-    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
-
-def get_container_name():
-    """Get container name from environment or use default"""
-    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions') 
\ No newline at end of file
+    }
@@ -0,0 +1,77 @@
+import azure.functions as func
+import logging
+import json
+from datetime import datetime, timezone, timedelta
+from analytics_rollups import get_activity, ACTIVITY_GRANULARITIES
+from analytics import get_analytics_cache_settings
+
+def parse_timestamp(value):
+    """ISO date or timestamp as an aware UTC datetime; dates and naive values are taken as UTC"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Analytics Activity API - Starts, completions and report views per hour or day
+
+    GET /api/analytics/activity
+    Query Parameters:
+    - from (optional): ISO date or timestamp the range starts at (default: 7 days before to)
+    - to (optional): ISO date or timestamp the range ends before (default: now)
+    - granularity (optional): "hour" or "day" (default: "day")
+    Returns: 200 OK with one bucket per hour or day, read from precomputed histograms
+    """
+    logging.info('Python HTTP trigger function processed a request.')
+
+    try:
+        # Get query parameters
+        granularity = req.params.get('granularity', 'day')
+        try:
+            end = parse_timestamp(req.params['to']) if req.params.get('to') else datetime.now(timezone.utc)
+            start = parse_timestamp(req.params['from']) if req.params.get('from') else end - timedelta(days=7)
+        except ValueError:
+            return func.HttpResponse(
+                json.dumps({"error": "from and to must be ISO dates or timestamps"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        # Validate parameters
+        if granularity not in ACTIVITY_GRANULARITIES:
+            return func.HttpResponse(
+                json.dumps({"error": f"Invalid granularity. Must be one of: {', '.join(ACTIVITY_GRANULARITIES)}"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        if start >= end:
+            return func.HttpResponse(
+                json.dumps({"error": "from must be earlier than to"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        try:
+            activity = get_activity(start, end, granularity)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        activity["generatedAt"] = datetime.now(timezone.utc).isoformat()
+        return func.HttpResponse(
+            json.dumps(activity),
+            status_code=200,
+            mimetype="application/json",
+            headers={"Cache-Control": f"private, max-age={int(get_analytics_cache_settings()['ttl_seconds'])}"}
+        )
+
+    except Exception as e:
+        logging.error(f"Error in analytics activity: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal server error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
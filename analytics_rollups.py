@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained analytics rollups.
+
+Every session state change adds to one rollup document for the UTC day the
+session was created and to a running total:
+
+    {"id": "2025-01-06", "month": "2025-01", "day": "2025-01-06",
+     "started": 41, "completed": 30, "reportsGenerated": 28, "reportsViewed": 28,
+     "durationSum": 16200, "durationCount": 30,
+     "archetypes": {"The Critical Interrogator": 12, ...},
+     "completionSketch": {"574": 2, ...}, "answerLatencySketch": {"421": 37, ...}}
+
+The two sketches are DDSketch bucket counts (quantile_sketch.py) of completion
+time in seconds and of the time each answer took in milliseconds. Because
+buckets only ever add up, day documents merge into exact-bucket sketches for
+any period, and p50/p90/p99 are read from them in constant time and memory.
+
+Day documents also hold hour-of-day histograms of starts, completions and
+report views ("startedByHour": {"09": 4, ...}). Unlike the counters above, which
+belong to the day a session was created, each event is counted in the document
+for the UTC day and hour it happened. An activity chart for any range and
+granularity reads only the day documents inside the range.
+
+The Cosmos backend applies these as atomic `incr` patches in the rollups
+container (COSMOS_ROLLUPS_CONTAINER_NAME, default "rollups", partitioned on
+/month), so concurrent instances never lose an update. Any period served by
+/api/analytics reads at most 30 day documents plus the total, whatever the
+traffic. ANALYTICS_ROLLUP_STORE=memory|cosmos selects the backend (default:
+cosmos when the session store is cosmos, an in-process store otherwise).
+
+Rollup updates are best effort: a failure is logged and never fails the request.
+Run `python analytics_rollups.py --rebuild` to recompute every rollup from the
+stored sessions, e.g. after first deploying them.
+"""
+
+import argparse
+import copy
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone, timedelta
+
+import azure.cosmos.exceptions as exceptions
+
+from answer_codec import from_stored
+from cosmos_connection import get_container
+from item_bank import TOTAL_QUESTIONS
+from quantile_sketch import bucket_key, merge, quantiles
+from scoring import ARCHETYPE_NAMES
+from session_store import COSMOS_BACKENDS, get_session_store, get_store_backend_name
+from session_writer import completion_duration_seconds
+
+TOTAL_ID = "total"
+ROLLUP_COUNTERS = ("started", "completed", "reportsGenerated", "reportsViewed", "durationSum", "durationCount")
+# Hour-of-day histogram maps of each activity event
+ACTIVITY_MAPS = {"started": "startedByHour", "completed": "completedByHour", "reportsViewed": "reportsViewedByHour"}
+ACTIVITY_GRANULARITIES = ("hour", "day")
+MAX_ACTIVITY_DAYS = 366
+# Maps of counters, incremented through "<map>/<key>" paths
+ROLLUP_MAPS = ("archetypes", "completionSketch", "answerLatencySketch") + tuple(ACTIVITY_MAPS.values())
+# Rollups are per UTC day, so periods are whole days ending today
+PERIOD_DAYS = {"24h": 1, "7d": 7, "30d": 30}
+ACTIVITY_DAYS = 7
+
+
+def get_rollup_backend():
+    """Resolve where rollup documents live"""
+    backend = os.environ.get('ANALYTICS_ROLLUP_STORE', '').strip().lower()
+    if not backend:
+        backend = "cosmos" if get_store_backend_name() in COSMOS_BACKENDS else "memory"
+    if backend not in ("memory", "cosmos"):
+        raise ValueError(f"Unknown ANALYTICS_ROLLUP_STORE: {backend}")
+    return backend
+
+
+def empty_rollup(rollup_id):
+    """A rollup document with every counter at zero"""
+    document = {"id": rollup_id, "month": rollup_id[:7] if rollup_id != TOTAL_ID else TOTAL_ID}
+    if rollup_id != TOTAL_ID:
+        document["day"] = rollup_id
+    document.update(dict.fromkeys(ROLLUP_COUNTERS, 0))
+    document.update({name: {} for name in ROLLUP_MAPS})
+    return document
+
+
+def _apply_increments(document, increments):
+    for path, value in increments.items():
+        if "/" in path:
+            name, key = path.split("/", 1)
+            counters = document.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + value
+        else:
+            document[path] = document.get(path, 0) + value
+    return document
+
+
+def _failed_status(error):
+    """Status code of a failed request, or of the operation that failed a transactional batch"""
+    if isinstance(error, exceptions.CosmosBatchOperationError) and error.error_index is not None \
+            and error.operation_responses:
+        return error.operation_responses[error.error_index].get('statusCode')
+    return error.status_code
+
+
+class InMemoryRollups:
+    """Per-process rollups for local development and the non-Cosmos backends"""
+
+    def __init__(self):
+        self._documents = {}
+        self._lock = threading.Lock()
+
+    def increment(self, rollup_id, increments):
+        with self._lock:
+            document = self._documents.setdefault(rollup_id, empty_rollup(rollup_id))
+            _apply_increments(document, increments)
+
+    def read(self, rollup_ids):
+        with self._lock:
+            return [copy.deepcopy(self._documents[rollup_id]) for rollup_id in rollup_ids if rollup_id in self._documents]
+
+    def replace_all(self, documents):
+        with self._lock:
+            self._documents = {document["id"]: document for document in documents}
+
+
+class CosmosRollups:
+    """Rollups in Cosmos DB, updated with atomic increment patches"""
+
+    # Cosmos DB accepts at most this many operations in a single patch request
+    MAX_PATCH_OPERATIONS = 10
+
+    @property
+    def container(self):
+        return get_container(os.environ.get('COSMOS_ROLLUPS_CONTAINER_NAME', 'rollups'))
+
+    def _patch(self, rollup_id, month, operations):
+        """Apply the operations atomically: one patch, or one transactional batch of patches"""
+        chunks = [operations[i:i + self.MAX_PATCH_OPERATIONS]
+                  for i in range(0, len(operations), self.MAX_PATCH_OPERATIONS)]
+        if len(chunks) == 1:
+            self.container.patch_item(item=rollup_id, partition_key=month, patch_operations=chunks[0])
+        else:
+            self.container.execute_item_batch(batch_operations=[("patch", (rollup_id, chunk)) for chunk in chunks],
+                                              partition_key=month)
+
+    def _add_missing_maps(self, rollup_id, month):
+        """Add the counter maps a document written before they existed lacks; concurrent adds are no-ops"""
+        for name in ROLLUP_MAPS:
+            try:
+                self.container.patch_item(item=rollup_id, partition_key=month,
+                                          patch_operations=[{"op": "add", "path": f"/{name}", "value": {}}],
+                                          filter_predicate=f"FROM c WHERE NOT IS_DEFINED(c.{name})")
+            except exceptions.CosmosAccessConditionFailedError:
+                pass
+
+    def increment(self, rollup_id, increments):
+        month = empty_rollup(rollup_id)["month"]
+        operations = [{"op": "incr", "path": f"/{path}", "value": value} for path, value in increments.items()]
+        try:
+            self._patch(rollup_id, month, operations)
+            return
+        except (exceptions.CosmosHttpResponseError, exceptions.CosmosBatchOperationError) as e:
+            status = _failed_status(e)
+            if status == 400:
+                # Incrementing into a map the document does not have yet
+                self._add_missing_maps(rollup_id, month)
+            elif status == 404:
+                # First event of the day: create the document with the increments applied
+                try:
+                    self.container.create_item(_apply_increments(empty_rollup(rollup_id), increments))
+                    return
+                except exceptions.CosmosResourceExistsError:
+                    # Another instance created it first; increment the document it created
+                    pass
+            else:
+                raise
+        self._patch(rollup_id, month, operations)
+
+    def read(self, rollup_ids):
+        by_month = defaultdict(list)
+        for rollup_id in rollup_ids:
+            by_month[empty_rollup(rollup_id)["month"]].append(rollup_id)
+        documents = []
+        for month, ids in by_month.items():
+            # One single-partition query per month touched by the period
+            documents.extend(self.container.query_items(
+                query="SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.id)",
+                parameters=[{"name": "@ids", "value": ids}],
+                partition_key=month
+            ))
+        return documents
+
+    def replace_all(self, documents):
+        for document in documents:
+            self.container.upsert_item(document)
+
+
+ROLLUP_BACKENDS = {
+    "memory": InMemoryRollups,
+    "cosmos": CosmosRollups,
+}
+
+_rollups = {}
+
+
+def get_rollups():
+    """Return the process-wide rollup store for the configured backend"""
+    backend = get_rollup_backend()
+    if backend not in _rollups:
+        _rollups[backend] = ROLLUP_BACKENDS[backend]()
+    return _rollups[backend]
+
+
+def _creation_day(session):
+    created_at = session.get('createdAt') or ''
+    try:
+        return datetime.fromisoformat(created_at.replace('Z', '+00:00')).astimezone(timezone.utc).strftime('%Y-%m-%d')
+    except ValueError:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+def _event_hour(timestamp):
+    """(UTC day, two-digit hour) an ISO timestamp falls in, or None if it is missing or malformed"""
+    try:
+        moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00')).astimezone(timezone.utc)
+    except (AttributeError, ValueError):
+        return None
+    return moment.strftime('%Y-%m-%d'), moment.strftime('%H')
+
+
+def _activity_increments(events):
+    """Increments per day document for (event, timestamp, count) activity events"""
+    by_day = defaultdict(Counter)
+    for event, timestamp, count in events:
+        hour = _event_hour(timestamp)
+        if hour:
+            by_day[hour[0]][f"{ACTIVITY_MAPS[event]}/{hour[1]}"] += count
+    return by_day
+
+
+def _document_increments(session, increments, events=()):
+    """Increments per rollup document: the session's creation day and the total, and each event's own day"""
+    increments = {path: value for path, value in increments.items() if value}
+    by_document = defaultdict(dict)
+    if increments:
+        by_document[_creation_day(session)].update(increments)
+        by_document[TOTAL_ID].update(increments)
+    # A start, and usually a completion, falls on the creation day, so it shares that document's write
+    for day, activity in _activity_increments(events).items():
+        by_document[day].update(activity)
+    return by_document
+
+
+def _apply_document_increments(by_document, subject):
+    try:
+        rollups = get_rollups()
+        for rollup_id, document_increments in by_document.items():
+            document_increments = {path: value for path, value in document_increments.items() if value}
+            if document_increments:
+                rollups.increment(rollup_id, document_increments)
+    except Exception as e:
+        logging.error(f"Error updating analytics rollups for {subject}: {str(e)}")
+
+
+def _record(session, increments, events=()):
+    """Add increments to the session's creation day and the total, and each event to its own day and hour"""
+    _apply_document_increments(_document_increments(session, increments, events), f"session {session.get('id')}")
+
+
+def record_session_started(session):
+    """Count a newly created session"""
+    _record(session, {"started": 1}, [("started", session.get('createdAt'), 1)])
+
+
+def answer_latencies_ms(session, completed_at):
+    """Milliseconds each answer took, from the previous answer (or the start) to its submission
+
+    The last answer is timed to completed_at, which is known the same way when the
+    session completes, is reset and is rebuilt. Answers submitted together in one
+    request (under a millisecond apart) are not counted.
+    """
+    answers = sorted((answer for answer in session.get('answers') or []
+                      if (answer.get('questionNumber') or 0) < TOTAL_QUESTIONS),
+                     key=lambda answer: answer['questionNumber'])
+    if not answers:
+        return []
+    timestamps = []
+    for value in [session.get('createdAt')] + [answer.get('submittedAt') for answer in answers] + [completed_at]:
+        try:
+            timestamps.append(datetime.fromisoformat(value.replace('Z', '+00:00')))
+        except (AttributeError, ValueError):
+            return []
+    latencies = (round((later - earlier).total_seconds() * 1000) for earlier, later in zip(timestamps, timestamps[1:]))
+    return [latency for latency in latencies if latency >= 1]
+
+
+def _sketch_increments(session, completed_at, duration, sign=1):
+    """Sketch bucket increments for a completed session's completion time and answer latencies"""
+    increments = Counter()
+    if duration is not None:
+        increments[f"completionSketch/{bucket_key(duration)}"] += sign
+    for latency in answer_latencies_ms(session, completed_at):
+        increments[f"answerLatencySketch/{bucket_key(latency)}"] += sign
+    return increments
+
+
+def record_session_completed(session, completed_at):
+    """Count a completed session, its completion time and how long each answer took"""
+    duration = completion_duration_seconds(session.get('createdAt'), completed_at)
+    _record(session, {
+        "completed": 1,
+        "durationSum": duration or 0,
+        "durationCount": 1 if duration is not None else 0,
+        **_sketch_increments(session, completed_at, duration)
+    }, [("completed", completed_at, 1)])
+
+
+def record_report_generated(session, result):
+    """Count a generated (and therefore viewed) report and its primary archetype"""
+    increments = {"reportsGenerated": 1, "reportsViewed": 1}
+    if result.get('primaryArchetype'):
+        increments[f"archetypes/{result['primaryArchetype']}"] = 1
+    viewed_at = session.get('reportFirstViewedAt') or datetime.now(timezone.utc).isoformat()
+    _record(session, increments, [("reportsViewed", viewed_at, 1)])
+
+
+def record_archetype_changed(session, previous, current):
+    """Move a session between archetypes, e.g. after re-scoring"""
+    if previous == current:
+        return
+    increments = {}
+    if previous:
+        increments[f"archetypes/{previous}"] = -1
+    if current:
+        increments[f"archetypes/{current}"] = 1
+    _record(session, increments)
+
+
+def _progress_decrements(session):
+    """Increments and events taking back everything a session contributed beyond being started"""
+    increments = {}
+    events = []
+    if session.get('status') == 'Completed':
+        duration = session.get('completionDurationSeconds')
+        if duration is None:
+            duration = completion_duration_seconds(session.get('createdAt'), session.get('completedAt'))
+        increments.update({"completed": -1, "durationSum": -(duration or 0),
+                           "durationCount": -1 if duration is not None else 0})
+        increments.update(_sketch_increments(session, session.get('completedAt'), duration, sign=-1))
+        events.append(("completed", session.get('completedAt'), -1))
+    result = session.get('result') or {}
+    if result.get('reportContent'):
+        increments["reportsGenerated"] = -1
+    if session.get('reportFirstViewedAt'):
+        increments["reportsViewed"] = -1
+        events.append(("reportsViewed", session['reportFirstViewedAt'], -1))
+    if result.get('primaryArchetype'):
+        increments[f"archetypes/{result['primaryArchetype']}"] = -1
+    return increments, events
+
+
+def record_session_reset(session):
+    """Take back everything a session contributed beyond being started"""
+    _record(session, *_progress_decrements(session))
+
+
+def record_sessions_deleted(sessions):
+    """Take deleted sessions out of the rollups entirely, with one write per rollup document touched"""
+    by_document = defaultdict(Counter)
+    count = 0
+    for session in sessions:
+        increments, events = _progress_decrements(session)
+        increments["started"] = -1
+        events.append(("started", session.get('createdAt'), -1))
+        for rollup_id, document_increments in _document_increments(session, increments, events).items():
+            by_document[rollup_id].update(document_increments)
+        count += 1
+    _apply_document_increments(by_document, f"{count} deleted sessions")
+
+
+def _sum_rollups(documents):
+    summed = empty_rollup(TOTAL_ID)
+    documents = list(documents)
+    for document in documents:
+        for counter in ROLLUP_COUNTERS:
+            summed[counter] += document.get(counter, 0)
+    for name in ROLLUP_MAPS:
+        summed[name] = merge(document.get(name) for document in documents)
+    return summed
+
+
+def _percentiles(sketch, unit_seconds, per):
+    """p50/p90/p99 of a sketch, converted from its unit into `per` seconds (60 for minutes)"""
+    return {name: round(value * unit_seconds / per, 1) if value is not None else None
+            for name, value in quantiles(sketch).items()}
+
+
+def _period_days(period, today, at_least=0):
+    return [(today - timedelta(days=i)).strftime('%Y-%m-%d')
+            for i in range(max(PERIOD_DAYS.get(period) or 0, at_least))]
+
+
+def _period_totals(period, documents, days):
+    """The summed rollup for a period from the documents read for it"""
+    period_days = PERIOD_DAYS.get(period)
+    if period_days:
+        return _sum_rollups(documents[day] for day in days[:period_days] if day in documents)
+    return documents.get(TOTAL_ID) or empty_rollup(TOTAL_ID)
+
+
+def _read_period(period, days):
+    ids = days + ([TOTAL_ID] if not PERIOD_DAYS.get(period) else [])
+    return {document['id']: document for document in get_rollups().read(ids)}
+
+
+def _period_start(period, today):
+    period_days = PERIOD_DAYS.get(period)
+    return (today - timedelta(days=period_days - 1)).isoformat() if period_days else "all time"
+
+
+def _timings(totals):
+    average = totals['durationSum'] / totals['durationCount'] / 60 if totals['durationCount'] else 0
+    return {
+        "averageCompletionTimeMinutes": round(average, 1),
+        "completionTimeMinutes": _percentiles(totals.get('completionSketch'), 1, 60),
+        "answerLatencySeconds": _percentiles(totals.get('answerLatencySketch'), 0.001, 1)
+    }
+
+
+def get_rollup_timings(period, now=None):
+    """Average and p50/p90/p99 completion time and answer latency for a period from the rollups
+
+    Only the period's day documents (or the all-time total) are read, so the
+    cost does not grow with the number of sessions. Day documents cover whole
+    UTC days by creation date, so the figures start at startDate, midnight of
+    the period's first day.
+    """
+    today = (now or datetime.now(timezone.utc)).replace(hour=0, minute=0, second=0, microsecond=0)
+    days = _period_days(period, today)
+    timings = _timings(_period_totals(period, _read_period(period, days), days))
+    timings["startDate"] = _period_start(period, today)
+    return timings
+
+
+def get_rollup_metrics(period, now=None):
+    """Build the /api/analytics metrics for a period from rollup documents"""
+    now = now or datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    period_days = PERIOD_DAYS.get(period)
+    days = _period_days(period, today, ACTIVITY_DAYS)
+
+    documents = _read_period(period, days)
+    totals = _period_totals(period, documents, days)
+    start_date = _period_start(period, today)
+
+    total_sessions = totals['started']
+    completed_sessions = totals['completed']
+    reports_generated = totals['reportsGenerated']
+    reports_viewed = totals['reportsViewed']
+
+    # Daily activity (last 7 days), limited to the requested period like the live query
+    activity_days = days[:min(period_days or ACTIVITY_DAYS, ACTIVITY_DAYS)]
+    daily_activity = {
+        day: documents[day]['started'] if day in documents and day in activity_days else 0
+        for day in days[:ACTIVITY_DAYS]
+    }
+
+    return {
+        "sessions": {
+            "total": total_sessions,
+            "completed": completed_sessions,
+            "inProgress": max(0, total_sessions - completed_sessions),
+            "completionRate": round((completed_sessions / total_sessions * 100) if total_sessions > 0 else 0, 1)
+        },
+        "performance": {
+            **_timings(totals),
+            "reportsGenerated": reports_generated,
+            "reportsViewed": reports_viewed,
+            "reportViewRate": round((reports_viewed / reports_generated * 100) if reports_generated > 0 else 0, 1)
+        },
+        "archetypeDistribution": {name: count for name, count in totals['archetypes'].items() if count},
+        "dailyActivity": daily_activity,
+        "periodStats": {
+            "startDate": start_date,
+            "endDate": now.isoformat()
+        }
+    }
+
+
+def get_activity(start, end, granularity="day"):
+    """Histogram of starts, completions and report views over [start, end) in hour or day buckets
+
+    start and end are UTC datetimes, widened to whole buckets. Only the day
+    documents inside the range are read. Raises ValueError for an unknown
+    granularity or a range longer than MAX_ACTIVITY_DAYS.
+    """
+    if granularity not in ACTIVITY_GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(ACTIVITY_GRANULARITIES)}")
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    start = start.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        start = start.replace(hour=0)
+    end = end.astimezone(timezone.utc)
+    if end - start > timedelta(days=MAX_ACTIVITY_DAYS):
+        raise ValueError(f"Activity ranges cannot exceed {MAX_ACTIVITY_DAYS} days")
+    bucket_starts = []
+    while start < end:
+        bucket_starts.append(start)
+        start += step
+    days = sorted({bucket_start.strftime('%Y-%m-%d') for bucket_start in bucket_starts})
+
+    documents = {document['id']: document for document in get_rollups().read(days)}
+    buckets = []
+    for bucket_start in bucket_starts:
+        document = documents.get(bucket_start.strftime('%Y-%m-%d')) or {}
+        hours = [bucket_start.strftime('%H')] if granularity == "hour" else [f"{hour:02d}" for hour in range(24)]
+        bucket = {"start": bucket_start.isoformat()}
+        for event, map_name in ACTIVITY_MAPS.items():
+            counts = document.get(map_name) or {}
+            bucket[event] = sum(counts.get(hour, 0) for hour in hours)
+        buckets.append(bucket)
+
+    return {
+        "granularity": granularity,
+        "from": bucket_starts[0].isoformat() if bucket_starts else None,
+        "to": (bucket_starts[-1] + step).isoformat() if bucket_starts else None,
+        "buckets": buckets,
+        "totals": {event: sum(bucket[event] for bucket in buckets) for event in ACTIVITY_MAPS}
+    }
+
+
+def rebuild_rollups(store=None, page_size=500):
+    """Recompute every rollup from the stored sessions and replace the existing documents"""
+    store = store or get_session_store()
+    documents = {}
+    for page, _ in store.iter_session_pages(page_size=page_size):
+        # Pages hold documents as stored; expand packed answers to time them
+        for session in map(from_stored, page):
+            day = _creation_day(session)
+            for rollup_id in (day, TOTAL_ID):
+                document = documents.setdefault(rollup_id, empty_rollup(rollup_id))
+                document['started'] += 1
+                if session.get('status') == 'Completed':
+                    document['completed'] += 1
+                    duration = session.get('completionDurationSeconds')
+                    if duration is None:
+                        duration = completion_duration_seconds(session.get('createdAt'), session.get('completedAt'))
+                    if duration is not None:
+                        document['durationSum'] += duration
+                        document['durationCount'] += 1
+                    _apply_increments(document, _sketch_increments(session, session.get('completedAt'), duration))
+                result = session.get('result') or {}
+                if result.get('reportContent'):
+                    document['reportsGenerated'] += 1
+                if session.get('reportFirstViewedAt'):
+                    document['reportsViewed'] += 1
+                if result.get('primaryArchetype'):
+                    archetypes = document['archetypes']
+                    archetypes[result['primaryArchetype']] = archetypes.get(result['primaryArchetype'], 0) + 1
+            events = [("started", session.get('createdAt'), 1)]
+            if session.get('status') == 'Completed':
+                events.append(("completed", session.get('completedAt'), 1))
+            if session.get('reportFirstViewedAt'):
+                events.append(("reportsViewed", session['reportFirstViewedAt'], 1))
+            for event_day, activity in _activity_increments(events).items():
+                _apply_increments(documents.setdefault(event_day, empty_rollup(event_day)), activity)
+    get_rollups().replace_all(list(documents.values()))
+    return len(documents)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain analytics rollup documents")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all rollups from stored sessions")
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Rebuilt {rebuild_rollups()} rollup documents")
+    else:
+        parser.print_help()
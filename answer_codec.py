@@ -0,0 +1,151 @@
+# Compact storage encoding for session answers
+# Every answer can be rebuilt from the fixed item bank, so persistent stores can
+# keep only which statement was chosen for each question:
+#   {"v": 1, "n": 40, "mask": 733007751850, "latUs": [5210413, 3184027, ...]}
+# "mask" has bit (questionNumber - 1) set when statement B was chosen, "v" is the
+# item bank version the mask refers to, and the optional "latUs" array holds
+# per-answer latencies in microseconds, each relative to the previous answer
+# (the first one relative to the session's createdAt), so submittedAt comes
+# back exactly. Documents packed before that hold whole milliseconds in "lat".
+# Set ANSWER_STORAGE_FORMAT=compact to store answers this way; documents in
+# either format are always readable. A mask packed against another item bank
+# version cannot be expanded, so such documents keep their stored answers.
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+from item_bank import ITEM_BANK_VERSION, get_question_pair, get_construct_for_statement_id
+
+
+def get_storage_format():
+    """Get the answer storage format from environment or use default"""
+    storage_format = os.environ.get('ANSWER_STORAGE_FORMAT', 'json').lower()
+    if storage_format not in ('json', 'compact'):
+        raise ValueError(f"Unknown ANSWER_STORAGE_FORMAT: {storage_format}")
+    return storage_format
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def can_pack(answers):
+    """Answers can be packed only if they are questions 1..n in order with A/B choices"""
+    for index, answer in enumerate(answers):
+        if answer.get('questionNumber') != index + 1 or answer.get('chosenStatementId') not in ('A', 'B'):
+            return False
+    return True
+
+
+def encode_answers(answers, created_at=None):
+    """Pack answer records into a choice mask plus optional latency deltas"""
+    mask = 0
+    for answer in answers:
+        if answer['chosenStatementId'] == 'B':
+            mask |= 1 << (answer['questionNumber'] - 1)
+
+    packed = {"v": ITEM_BANK_VERSION, "n": len(answers), "mask": mask}
+
+    # Latencies are optional: keep them only if every timestamp can be recovered
+    previous = _parse_timestamp(created_at)
+    latencies = []
+    for answer in answers:
+        submitted = _parse_timestamp(answer.get('submittedAt'))
+        if previous is None or submitted is None:
+            latencies = None
+            break
+        latencies.append((submitted - previous) // timedelta(microseconds=1))
+        previous = submitted
+    if latencies is not None:
+        packed["latUs"] = latencies
+
+    return packed
+
+
+def can_decode(packed):
+    """Whether a packed value refers to the item bank this build can expand it with"""
+    return packed.get("v") == ITEM_BANK_VERSION
+
+
+def decode_answers(packed, created_at=None):
+    """Expand a packed value back into the answer records returned by the API"""
+    if not can_decode(packed):
+        raise ValueError(f"Unsupported item bank version: {packed.get('v')}")
+
+    mask = packed.get("mask", 0)
+    latencies, unit = (packed["latUs"], timedelta(microseconds=1)) if "latUs" in packed \
+        else (packed.get("lat"), timedelta(milliseconds=1))
+    timestamp = _parse_timestamp(created_at) if latencies is not None else None
+
+    answers = []
+    for index in range(packed.get("n", 0)):
+        question_number = index + 1
+        chosen_statement_id = 'B' if mask >> index & 1 else 'A'
+        chosen_statement = get_question_pair(question_number)[chosen_statement_id]
+
+        submitted_at = None
+        if timestamp is not None and index < len(latencies):
+            timestamp = timestamp + unit * latencies[index]
+            submitted_at = timestamp.isoformat()
+
+        answers.append({
+            "questionNumber": question_number,
+            "chosenStatementId": chosen_statement_id,
+            "chosenStatement": chosen_statement,
+            "constructId": get_construct_for_statement_id(chosen_statement['id']),
+            "submittedAt": submitted_at
+        })
+    return answers
+
+
+def count_answers(document):
+    """Number of answers in a stored document of either format"""
+    packed = document.get('answersPacked')
+    packed_count = packed.get('n', 0) if isinstance(packed, dict) else 0
+    return max(packed_count, len(document.get('answers') or []))
+
+
+# count_answers as a Cosmos DB SQL expression, for queries that project the count instead of reading answers
+_ANSWERS_LENGTH_SQL = "(IS_ARRAY(c.answers) ? ARRAY_LENGTH(c.answers) : 0)"
+ANSWERS_COUNT_SQL = (f"((IS_NUMBER(c.answersPacked.n) AND c.answersPacked.n > {_ANSWERS_LENGTH_SQL}) "
+                     f"? c.answersPacked.n : {_ANSWERS_LENGTH_SQL})")
+
+
+def to_stored(session):
+    """Return the document to persist, packing answers when compact storage is enabled"""
+    answers = session.get('answers')
+    if get_storage_format() != 'compact' or answers is None or not can_pack(answers):
+        return session
+    # Answers packed against another item bank were never expanded; keep them as they are
+    if session.get('answersPacked') and not can_decode(session['answersPacked']):
+        return session
+
+    document = {key: value for key, value in session.items() if key != 'answers'}
+    document['answersPacked'] = encode_answers(answers, session.get('createdAt'))
+    return document
+
+
+def from_stored(document):
+    """Return the session as handlers expect it, expanding packed answers"""
+    if document is None or 'answersPacked' not in document:
+        return document
+
+    packed = document['answersPacked']
+    if packed and not can_decode(packed):
+        # Reading with the wrong item bank would invent answers; serve any unpacked ones and keep
+        # the packed copy in the document so a later write does not lose it
+        logging.warning(f"Session {document.get('id')} holds answers for item bank version {packed.get('v')}")
+        return document
+    session = {key: value for key, value in document.items() if key != 'answersPacked'}
+    # A document may hold both shapes if the storage format changed mid-session;
+    # the one with more answers is the one that was written last. A patch that
+    # replaced the answers leaves the packed copy cleared (None).
+    if packed and packed.get('n', 0) >= len(session.get('answers') or []):
+        session['answers'] = decode_answers(packed, document.get('createdAt'))
+    return session
@@ -0,0 +1,219 @@
+# Bulk deletes for Cosmos DB
+# Documents are grouped by partition key: several in one partition go out as
+# transactional batches of up to 100 delete operations, single ones as point
+# deletes. Groups run on a bounded thread pool whose effective concurrency
+# adapts to throttling. A 429 halves it and waits the retry-after the service
+# asked for; every run of successful requests raises it by one again. An
+# optional RequestUnitBudget caps the sustained rate, so throughput follows the
+# request units given to the job rather than round-trip latency; it is told
+# about every 429, so an adaptive budget can lower its rate too.
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+import azure.cosmos.exceptions as exceptions
+
+from ru_budget import RequestUnitBudget
+
+# Cosmos DB caps a transactional batch at 100 operations
+MAX_BATCH_OPERATIONS = 100
+# Items are grouped by partition this many at a time, so memory stays bounded; a partition
+# whose items straddle two chunks costs at most one extra, smaller batch
+GROUPING_CHUNK_ITEMS = 5000
+OUTCOMES = ("deleted", "missing", "failed")
+
+
+def get_bulk_delete_settings():
+    """Get concurrency, RU budget, throttling retries and progress interval from environment or use defaults"""
+    return {
+        "concurrency": int(os.environ.get('BULK_DELETE_CONCURRENCY', 16)),
+        "ru_per_second": float(os.environ.get('BULK_DELETE_RU_PER_SECOND', 0)),
+        "max_retries": int(os.environ.get('BULK_DELETE_MAX_RETRIES', 8)),
+        "progress_every": int(os.environ.get('BULK_DELETE_PROGRESS_EVERY', 1000))
+    }
+
+
+def _status(error):
+    # A failed batch reports the operation that failed; the rest only say they were not applied
+    responses = getattr(error, 'operation_responses', None)
+    if responses and error.error_index is not None and error.error_index < len(responses):
+        return responses[error.error_index].get('statusCode')
+    return getattr(error, 'status_code', None)
+
+
+def _retry_after_seconds(error, attempt):
+    headers = getattr(error, 'headers', None) or {}
+    retry_after_ms = headers.get('x-ms-retry-after-ms')
+    if retry_after_ms:
+        return float(retry_after_ms) / 1000
+    return min(0.1 * 2 ** attempt, 10.0)
+
+
+class AdaptiveConcurrency:
+    """Limit on requests in flight: halved on throttling, raised by one after each limit's worth of successes"""
+
+    def __init__(self, maximum):
+        self.maximum = max(1, maximum)
+        self.limit = self.maximum
+        self.throttled = 0
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+
+    def release(self, throttled=False):
+        with self._condition:
+            self._active -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(1, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class BulkDeleter:
+    """Parallel, batched, throttling-aware deletion of documents from one container"""
+
+    def __init__(self, container, concurrency=None, ru_per_second=None, max_retries=None,
+                 progress=None, progress_every=None, budget=None):
+        settings = get_bulk_delete_settings()
+        self.container = container
+        self.concurrency = AdaptiveConcurrency(concurrency or settings["concurrency"])
+        self.budget = budget or RequestUnitBudget(settings["ru_per_second"] if ru_per_second is None else ru_per_second)
+        self.max_retries = settings["max_retries"] if max_retries is None else max_retries
+        self.progress = progress
+        self.progress_every = progress_every or settings["progress_every"]
+        self._local = threading.local()
+
+    def _record_charge(self, headers, *_):
+        self._local.charge = getattr(self._local, 'charge', 0.0) + float(headers.get('x-ms-request-charge') or 0)
+
+    def _charge(self):
+        self.budget.spend(getattr(self._local, 'charge', 0.0))
+        self._local.charge = 0.0
+
+    def _attempt(self, partition_key, ids):
+        """One request for a group; returns outcome counts, or None if the group must be split"""
+        if len(ids) == 1:
+            try:
+                self.container.delete_item(item=ids[0], partition_key=partition_key,
+                                           response_hook=self._record_charge)
+                return Counter(deleted=1)
+            except exceptions.CosmosResourceNotFoundError:
+                return Counter(missing=1)
+        try:
+            self.container.execute_item_batch(batch_operations=[("delete", (item_id,)) for item_id in ids],
+                                              partition_key=partition_key, response_hook=self._record_charge)
+            return Counter(deleted=len(ids))
+        except exceptions.CosmosBatchOperationError as e:
+            if _status(e) == 429:
+                raise
+            # A document already gone fails the whole batch; delete the others one by one
+            return None
+
+    def _delete_group(self, group, on_deleted=None):
+        partition_key, ids = group
+        for attempt in range(self.max_retries + 1):
+            self.concurrency.acquire()
+            self.budget.wait()
+            throttled = False
+            try:
+                outcomes = self._attempt(partition_key, ids)
+                if outcomes is not None:
+                    # A request deletes all of its documents or, for a single missing one, none
+                    if on_deleted and outcomes["deleted"]:
+                        on_deleted(ids)
+                    return outcomes
+            except (exceptions.CosmosHttpResponseError, exceptions.CosmosBatchOperationError) as e:
+                if _status(e) != 429:
+                    logging.error(f"Error deleting {len(ids)} documents in partition {partition_key}: {str(e)}")
+                    return Counter(failed=len(ids))
+                throttled = True
+                self.budget.throttled()
+                delay = _retry_after_seconds(e, attempt)
+            finally:
+                self.concurrency.release(throttled)
+                self._charge()
+            if not throttled:
+                return sum((self._delete_group((partition_key, [item_id]), on_deleted) for item_id in ids), Counter())
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        logging.error(f"Giving up on {len(ids)} documents in partition {partition_key} after repeated throttling")
+        return Counter(failed=len(ids))
+
+    def _stats(self, counts, started, throttled_before=0):
+        elapsed = time.monotonic() - started
+        stats = {outcome: counts[outcome] for outcome in OUTCOMES}
+        stats.update({
+            "throttled": self.concurrency.throttled - throttled_before,
+            "concurrency": self.concurrency.limit,
+            "elapsedSeconds": round(elapsed, 2),
+            "deletedPerSecond": round(counts["deleted"] / elapsed, 1) if elapsed > 0 else 0.0
+        })
+        stats.update(self.budget.stats())
+        return stats
+
+    def _report(self, counts, started, throttled_before=0):
+        stats = self._stats(counts, started, throttled_before)
+        logging.info(f"Bulk delete: {stats['deleted']} deleted, {stats['missing']} already gone, "
+                     f"{stats['failed']} failed, {stats['deletedPerSecond']}/s at concurrency {stats['concurrency']}")
+        if self.progress:
+            self.progress(stats)
+
+    @staticmethod
+    def _groups(items):
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, GROUPING_CHUNK_ITEMS))
+            if not chunk:
+                return
+            partitions = defaultdict(list)
+            for item_id, partition_key in chunk:
+                partitions[partition_key].append(item_id)
+            for partition_key, ids in partitions.items():
+                for start in range(0, len(ids), MAX_BATCH_OPERATIONS):
+                    yield partition_key, ids[start:start + MAX_BATCH_OPERATIONS]
+
+    def delete(self, items, on_deleted=None):
+        """Delete (id, partition key) pairs; returns deleted, missing and failed counts with throughput stats
+
+        on_deleted, if given, is called from the worker threads with each list of IDs actually deleted.
+        """
+        started = time.monotonic()
+        throttled_before = self.concurrency.throttled
+        counts = Counter()
+        reported = 0
+        groups = self._groups(items)
+        with ThreadPoolExecutor(max_workers=self.concurrency.maximum) as executor:
+            # Items are grouped a chunk at a time and a bounded number of groups is queued,
+            # so memory stays flat however many items there are
+            pending = set()
+            for group in groups:
+                pending.add(executor.submit(self._delete_group, group, on_deleted))
+                if len(pending) < 2 * self.concurrency.maximum:
+                    continue
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    counts.update(future.result())
+                if sum(counts.values()) - reported >= self.progress_every:
+                    reported = sum(counts.values())
+                    self._report(counts, started, throttled_before)
+            for future in pending:
+                counts.update(future.result())
+        self._report(counts, started, throttled_before)
+        return self._stats(counts, started, throttled_before)
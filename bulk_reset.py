@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Reset sessions to their initial state, one at a time or in bulk.
+
+A reset is a point read followed by a conditional partial-document update of
+the fields an assessment fills in (a single Cosmos DB patch), rather than a
+rewrite of the whole document. The read supplies the version the rollups take
+their counts back from; if the session changes in between, it is read again and
+the reset re-applied. Bulk resets run these on a bounded thread pool and report
+an outcome per session ID, so load-test fixtures can be reset between runs in
+seconds.
+
+Usage:
+    python bulk_reset.py [ID ...] [--ids-file fixtures.txt] [--status Completed] [--id-prefix loadtest-]
+                         [--limit 10000] [--concurrency 32]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics_rollups import record_session_reset
+from session_store import get_session_store, ConcurrencyConflict, get_max_conflict_retries, record_conflict, session_ttl
+from session_writer import discard_pending
+
+OUTCOMES = ("reset", "notFound", "failed")
+
+
+def get_bulk_reset_settings():
+    """Get concurrency and the largest number of sessions one bulk reset may touch from environment or use defaults"""
+    return {
+        "concurrency": int(os.environ.get('BULK_RESET_CONCURRENCY', 32)),
+        "max_sessions": int(os.environ.get('BULK_RESET_MAX_SESSIONS', 10000))
+    }
+
+
+def reset_fields():
+    """Top-level fields a reset sets: everything an assessment fills in, back to a new session's values"""
+    return {
+        "status": "InProgress",
+        "answers": [],
+        "result": None,
+        "completedAt": None,
+        "completionDurationSeconds": None,
+        "reportFirstViewedAt": None,
+        "ttl": session_ttl("InProgress")
+    }
+
+
+def reset_session(store, session_id, session=None):
+    """Reset one session; returns the updated document, or None if it does not exist
+
+    session is the document as the caller last read it, if available.
+    Raises ConcurrencyConflict if it keeps changing.
+    """
+    # Drop answers still waiting in the write-behind buffer
+    discard_pending(session_id)
+    max_retries = get_max_conflict_retries()
+    for attempt in range(max_retries + 1):
+        if session is None:
+            session = store.get_session(session_id)
+        if session is None:
+            return None
+        try:
+            updated = store.update_fields(session_id, reset_fields(), session=session)
+        except ConcurrencyConflict:
+            record_conflict(retrying=attempt < max_retries)
+            session = None
+            continue
+        if updated is not None:
+            # Take the replaced version's counts back out of the rollups
+            record_session_reset(session)
+        return updated
+    raise ConcurrencyConflict(f"Session {session_id} kept changing after {max_retries} retries")
+
+
+def iter_matching_ids(store, status=None, id_prefix=None, limit=None):
+    """IDs of stored sessions with the given status and ID prefix, page by page
+
+    With a limit, no further page is read once that many IDs have been found.
+    """
+    if limit is not None and limit <= 0:
+        return
+    found = 0
+    for documents, _ in store.iter_session_pages(status=status):
+        for document in documents:
+            if not id_prefix or document['id'].startswith(id_prefix):
+                yield document['id']
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+
+def _reset_one(store, session_id):
+    try:
+        if reset_session(store, session_id) is None:
+            return {"sessionId": session_id, "result": "notFound"}
+        return {"sessionId": session_id, "result": "reset"}
+    except Exception as e:
+        logging.error(f"Error resetting session {session_id}: {str(e)}")
+        return {"sessionId": session_id, "result": "failed", "error": str(e)}
+
+
+def reset_sessions(session_ids, store=None, concurrency=None):
+    """Reset every session ID in parallel; returns counts, timing and one result per ID in request order"""
+    settings = get_bulk_reset_settings()
+    store = store or get_session_store()
+    session_ids = list(dict.fromkeys(session_ids))
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or settings["concurrency"])) as executor:
+        results = list(executor.map(lambda session_id: _reset_one(store, session_id), session_ids))
+    counts = Counter(result["result"] for result in results)
+    summary = {outcome: counts[outcome] for outcome in OUTCOMES}
+    summary.update({"requested": len(session_ids), "elapsedSeconds": round(time.monotonic() - started, 2),
+                    "results": results})
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reset sessions to their initial state, e.g. load-test fixtures")
+    parser.add_argument("ids", nargs="*", help="Session IDs to reset")
+    parser.add_argument("--ids-file", help="File with one session ID per line ('-' for stdin)")
+    parser.add_argument("--status", choices=("InProgress", "Completed"), help="Reset sessions with this status")
+    parser.add_argument("--id-prefix", help="Reset sessions whose ID starts with this prefix")
+    parser.add_argument("--limit", type=int, help="Reset at most this many sessions (default BULK_RESET_MAX_SESSIONS)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent resets (default BULK_RESET_CONCURRENCY or 32)")
+    parser.add_argument("--results", action="store_true", help="Print the result for every session as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    session_ids = list(args.ids)
+    if args.ids_file:
+        with (sys.stdin if args.ids_file == '-' else open(args.ids_file, 'r', encoding='utf-8')) as f:
+            session_ids.extend(line.strip() for line in f if line.strip())
+    if not (session_ids or args.status or args.id_prefix):
+        parser.error("give session IDs, --ids-file, --status or --id-prefix")
+    limit = args.limit or get_bulk_reset_settings()["max_sessions"]
+    session_ids = session_ids[:limit]
+    store = get_session_store()
+    if args.status or args.id_prefix:
+        session_ids.extend(iter_matching_ids(store, args.status, args.id_prefix, limit - len(session_ids)))
+
+    summary = reset_sessions(session_ids, store=store, concurrency=args.concurrency)
+    if args.results:
+        print(json.dumps(summary["results"], indent=2))
+    print(f"{summary['reset']} reset, {summary['notFound']} not found, {summary['failed']} failed "
+          f"of {summary['requested']} in {summary['elapsedSeconds']}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+Change-feed projections of sessions and contacts into read models.
+
+Every session or contact write is projected into small read-model documents so
+admin reads never scan the write-hot sessions container:
+
+    session rows - the slim admin listing (id, nickname, status, dates, answer
+                   count, archetypes), one per session
+    contact rows - the contact inbox, one per submission
+    counters     - status counts, reports viewed, archetype distribution and
+                   contact count, maintained as deltas between a row's old and
+                   new version
+
+In Azure the projector is the session_change_feed Cosmos DB trigger: the
+Functions runtime delivers inserts and updates in batches of
+CHANGE_FEED_BATCH_SIZE and keeps leases and checkpoints in the "leases"
+container. The feed never delivers deletes, so whatever deletes sessions
+(the store, cleanup) removes their rows through publish_deletes. Projections
+live in COSMOS_PROJECTIONS_CONTAINER_NAME (default "projections", partitioned
+on /bucket); a session row and its bucket's counters are written in one
+transactional batch, so a redelivered change is never counted twice. A deleted
+row leaves a tombstone for CHANGE_FEED_TOMBSTONE_TTL_SECONDS (default a day),
+so a change delivered after the delete cannot bring it back.
+
+Locally (memory, file and sqlite session stores) CHANGE_FEED_ENABLED=true makes
+every write append an event to CHANGE_FEED_LOG_PATH (default
+.sessions/changes.jsonl), and an in-process consumer tails it. The consumer
+holds a lease so only one worker process applies events, and it commits each
+batch together with its log offset into the SQLite projections database
+(PROJECTION_SQLITE_PATH, default .sessions/projections.db).
+
+Projection lag (source write to projection) is reported with every read and
+under changeFeed in /api/health.
+
+Usage:
+    python change_feed.py --backfill    # publish every stored session to the local log
+    python change_feed.py --catch-up    # apply everything pending in the local log, then exit
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+
+import azure.cosmos.exceptions as exceptions
+
+from answer_codec import count_answers
+from continuation import split_page
+from cosmos_connection import get_container
+
+# Session rows and counters are spread over this many logical partitions; changing
+# it requires rebuilding the projections
+PROJECTION_BUCKETS = 16
+META_BUCKET = "meta"
+# Kind of the Cosmos DB row left behind by a delete
+TOMBSTONE_KIND = "deleted"
+
+_feed_stats = {"batches": 0, "changes": 0, "skipped": 0, "retries": 0,
+               "lastLagSeconds": None, "maxLagSeconds": None, "lastAppliedAt": None}
+_stats_lock = threading.Lock()
+
+
+def is_enabled():
+    """Whether writes are projected and admin reads are served from the projections"""
+    return os.environ.get('CHANGE_FEED_ENABLED', 'false').lower() == 'true'
+
+
+def get_batch_size():
+    """Maximum number of changes applied per batch"""
+    return int(os.environ.get('CHANGE_FEED_BATCH_SIZE', 100))
+
+
+def get_tombstone_ttl():
+    """Seconds a deleted session's tombstone keeps dropping late changes to it"""
+    return int(os.environ.get('CHANGE_FEED_TOMBSTONE_TTL_SECONDS', 86400))
+
+
+def get_projection_backend():
+    """Resolve where projections are stored"""
+    backend = os.environ.get('PROJECTION_STORE', '').strip().lower()
+    if not backend:
+        from session_store import COSMOS_BACKENDS, get_store_backend_name
+        backend = "cosmos" if get_store_backend_name() in COSMOS_BACKENDS else "sqlite"
+    if backend not in ("sqlite", "cosmos"):
+        raise ValueError(f"Unknown PROJECTION_STORE: {backend}")
+    return backend
+
+
+def bucket_for(document_id):
+    """Stable bucket (logical partition) for a row"""
+    return str(zlib.crc32(document_id.encode('utf-8')) % PROJECTION_BUCKETS)
+
+
+def is_contact(document):
+    # Contacts share the Cosmos sessions container and are the only documents with a sessionId
+    return 'sessionId' in document
+
+
+def project(document, version, source_ts):
+    """Build the read-model row for a changed session or contact document"""
+    if is_contact(document):
+        row = {
+            "kind": "contact",
+            "sessionId": document.get('sessionId'),
+            "nickname": document.get('nickname'),
+            "name": document.get('name'),
+            "email": document.get('email'),
+            "message": document.get('message'),
+            "submittedAt": document.get('submittedAt'),
+            "status": document.get('status')
+        }
+    else:
+        result = document.get('result') or {}
+        row = {
+            "kind": "session",
+            "nickname": document.get('nickname'),
+            "status": document.get('status'),
+            "createdAt": document.get('createdAt'),
+            "completedAt": document.get('completedAt'),
+            "reportFirstViewedAt": document.get('reportFirstViewedAt'),
+            "answersCount": count_answers(document),
+            "hasResult": 'result' in document,
+            "primaryArchetype": result.get('primaryArchetype'),
+            "secondaryArchetype": result.get('secondaryArchetype')
+        }
+    row.update({"id": document['id'], "bucket": bucket_for(document['id']),
+                "version": version, "sourceTs": source_ts})
+    return row
+
+
+def tombstone(document_id):
+    """Row kept in place of a deleted one; it expires through the container's TTL and counts towards nothing"""
+    return {"id": document_id, "bucket": bucket_for(document_id), "kind": TOMBSTONE_KIND,
+            "ttl": get_tombstone_ttl()}
+
+
+def row_counters(row):
+    """Counters a row contributes to; names use ':' so they stay single JSON pointer segments"""
+    if row is None:
+        return Counter()
+    if row.get('kind') == 'contact':
+        return Counter({"contacts": 1})
+    counters = Counter({"total": 1, f"status:{row.get('status')}": 1})
+    if row.get('reportFirstViewedAt'):
+        counters["reportsViewed"] += 1
+    if row.get('status') == 'Completed' and row.get('primaryArchetype'):
+        counters[f"archetypes:{row['primaryArchetype']}"] += 1
+    return counters
+
+
+def counter_delta(previous, row):
+    """Counter increments that replace previous's contribution with row's"""
+    delta = Counter(row_counters(row))
+    delta.subtract(row_counters(previous))
+    return {name: value for name, value in delta.items() if value}
+
+
+def summary_from_counters(counters):
+    """Turn raw counters into the admin summary shape"""
+    total = counters.get("total", 0)
+    completed = counters.get("status:Completed", 0)
+    archetypes = {name[len("archetypes:"):]: value for name, value in counters.items()
+                  if name.startswith("archetypes:") and value}
+    return {
+        "totalSessions": total,
+        "completedSessions": completed,
+        "inProgressSessions": counters.get("status:InProgress", 0),
+        "reportsViewed": counters.get("reportsViewed", 0),
+        "completionRate": round((completed / total * 100) if total > 0 else 0, 1),
+        "archetypeDistribution": archetypes,
+        "contacts": counters.get("contacts", 0)
+    }
+
+
+def _lag_status(source_ts, applied_at):
+    return {
+        "lastSourceAt": source_ts,
+        "lastAppliedAt": applied_at,
+        "lagSeconds": round(applied_at - source_ts, 3) if source_ts and applied_at else None,
+        "stalenessSeconds": round(time.time() - applied_at, 3) if applied_at else None
+    }
+
+
+def _record_batch(changes, skipped, source_ts):
+    applied_at = time.time()
+    with _stats_lock:
+        _feed_stats["batches"] += 1
+        _feed_stats["changes"] += changes
+        _feed_stats["skipped"] += skipped
+        _feed_stats["lastAppliedAt"] = applied_at
+        if source_ts:
+            lag = round(applied_at - source_ts, 3)
+            _feed_stats["lastLagSeconds"] = lag
+            _feed_stats["maxLagSeconds"] = max(lag, _feed_stats["maxLagSeconds"] or 0)
+    return applied_at
+
+
+def get_change_feed_stats():
+    """Per-process projector counters for the health endpoint"""
+    with _stats_lock:
+        stats = dict(_feed_stats)
+    stats["enabled"] = is_enabled()
+    return stats
+
+
+# Local projections: SQLite database shared by every worker process on the host
+SQLITE_PROJECTION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    status TEXT,
+    sortKey TEXT,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS idx_rows_kind_sort ON rows (kind, sortKey, id);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feed (
+    name TEXT PRIMARY KEY,
+    owner TEXT,
+    leaseExpiresAt REAL,
+    checkpoint INTEGER NOT NULL DEFAULT 0,
+    sourceTs REAL,
+    appliedAt REAL
+);
+"""
+SQL_GET_ROW = "SELECT doc FROM rows WHERE kind = ? AND id = ?"
+SQL_UPSERT_ROW = "INSERT OR REPLACE INTO rows (kind, id, version, status, sortKey, doc) VALUES (?, ?, ?, ?, ?, ?)"
+SQL_DELETE_ROW = "DELETE FROM rows WHERE kind = ? AND id = ?"
+SQL_ADD_COUNTER = (
+    "INSERT INTO counters (name, value) VALUES (?, ?) "
+    "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value"
+)
+SQL_LIST_ROWS = (
+    "SELECT doc FROM rows WHERE kind = ?1 AND (?2 IS NULL OR status = ?2) "
+    "AND (?3 IS NULL OR (sortKey, id) < (?3, ?4)) ORDER BY sortKey DESC, id DESC LIMIT ?5"
+)
+SQL_ENSURE_FEED = "INSERT OR IGNORE INTO feed (name, checkpoint) VALUES (?, 0)"
+SQL_ACQUIRE_LEASE = (
+    "UPDATE feed SET owner = ?1, leaseExpiresAt = ?2 "
+    "WHERE name = ?3 AND (owner IS NULL OR owner = ?1 OR leaseExpiresAt < ?4)"
+)
+SQL_ADVANCE_FEED = (
+    "UPDATE feed SET checkpoint = ?1, sourceTs = COALESCE(?2, sourceTs), appliedAt = ?3 "
+    "WHERE name = ?4 AND owner = ?5"
+)
+
+
+class LeaseLost(Exception):
+    """Raised when another consumer took over the feed lease mid-batch"""
+
+
+class SqliteProjections:
+    """Read models in a local SQLite database, updated in the same transaction as the feed checkpoint"""
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('PROJECTION_SQLITE_PATH', os.path.join('.sessions', 'projections.db'))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(SQLITE_PROJECTION_SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def acquire_lease(self, feed, owner, lease_seconds):
+        """Take or renew the feed lease; returns False while another live consumer holds it"""
+        connection = self._connect()
+        connection.execute(SQL_ENSURE_FEED, (feed,))
+        now = time.time()
+        return connection.execute(SQL_ACQUIRE_LEASE, (owner, now + lease_seconds, feed, now)).rowcount > 0
+
+    def get_checkpoint(self, feed):
+        row = self._connect().execute("SELECT checkpoint FROM feed WHERE name = ?", (feed,)).fetchone()
+        return row[0] if row else 0
+
+    def apply(self, changes, feed=None, owner=None, checkpoint=None):
+        """Apply (op, document, version, source_ts) changes atomically; returns (applied, skipped)
+
+        With feed/owner/checkpoint the feed offset advances in the same transaction,
+        and the batch is rolled back if the lease was lost.
+        """
+        connection = self._connect()
+        applied = skipped = 0
+        latest_source_ts = None
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for op, document, version, source_ts in changes:
+                kind = "contact" if is_contact(document) else "session"
+                stored = connection.execute(SQL_GET_ROW, (kind, document['id'])).fetchone()
+                previous = json.loads(stored[0]) if stored else None
+                # Redelivered or out-of-order changes never move a row backwards
+                if previous is not None and previous['version'] >= version:
+                    skipped += 1
+                    continue
+                row = project(document, version, source_ts) if op != "delete" else None
+                for name, value in counter_delta(previous, row).items():
+                    connection.execute(SQL_ADD_COUNTER, (name, value))
+                if row is None:
+                    connection.execute(SQL_DELETE_ROW, (kind, document['id']))
+                else:
+                    connection.execute(SQL_UPSERT_ROW, (kind, row['id'], version, row.get('status'),
+                                                        row.get(SORT_FIELDS[kind]) or '', json.dumps(row)))
+                applied += 1
+                latest_source_ts = max(latest_source_ts or 0, source_ts or 0) or None
+            applied_at = time.time()
+            if feed is not None:
+                if connection.execute(SQL_ADVANCE_FEED, (checkpoint, latest_source_ts, applied_at,
+                                                         feed, owner)).rowcount == 0:
+                    raise LeaseLost(f"Lease on {feed} lost before the batch committed")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        _record_batch(applied, skipped, latest_source_ts)
+        return applied, skipped
+
+    def list_rows(self, kind, status=None, limit=100, after=None):
+        after_sort, after_id = after if after else (None, None)
+        rows = self._connect().execute(SQL_LIST_ROWS, (kind, status, None if after is None else after_sort or '',
+                                                       after_id, limit)).fetchall()
+        return [json.loads(doc) for doc, in rows]
+
+    def get_counters(self):
+        return dict(self._connect().execute("SELECT name, value FROM counters").fetchall())
+
+    def get_status(self):
+        row = self._connect().execute("SELECT MAX(sourceTs), MAX(appliedAt) FROM feed").fetchone()
+        return _lag_status(*row)
+
+
+class CosmosProjections:
+    """Read models in Cosmos DB; each change is one transactional batch in its row's bucket"""
+
+    name = "cosmos"
+
+    # Cosmos DB accepts at most this many operations in a single patch request
+    MAX_PATCH_OPERATIONS = 10
+
+    @property
+    def container(self):
+        return get_container(os.environ.get('COSMOS_PROJECTIONS_CONTAINER_NAME', 'projections'))
+
+    def _ensure_summary(self, bucket):
+        try:
+            self.container.create_item({"id": f"summary-{bucket}", "bucket": bucket, "kind": "summary",
+                                        "counters": {}})
+        except exceptions.CosmosResourceExistsError:
+            pass
+
+    def _apply_one(self, op, document, version, source_ts):
+        bucket = bucket_for(document['id'])
+        for attempt in range(3):
+            try:
+                previous = self.container.read_item(item=document['id'], partition_key=bucket)
+            except exceptions.CosmosResourceNotFoundError:
+                previous = None
+            # Session IDs are never reused, so a delete applies to whatever version the row holds,
+            # and anything arriving after it is a late change the tombstone drops
+            if previous is not None and previous.get('kind') == TOMBSTONE_KIND:
+                return False
+            if previous is not None and op != "delete" and previous['version'] >= version:
+                return False
+            row = project(document, version, source_ts) if op != "delete" else None
+
+            if row is None and previous is None:
+                # Deleted before its row was projected; the tombstone still stops the row appearing later
+                operations = [("create", (tombstone(document['id']),))]
+            elif previous is None:
+                operations = [("create", (row,))]
+            elif row is None:
+                operations = [("replace", (previous['id'], tombstone(document['id'])),
+                               {"if_match_etag": previous['_etag']})]
+            else:
+                operations = [("replace", (row['id'], row), {"if_match_etag": previous['_etag']})]
+            increments = [{"op": "incr", "path": f"/counters/{name}", "value": value}
+                          for name, value in counter_delta(previous, row).items()]
+            operations.extend(("patch", (f"summary-{bucket}", increments[i:i + self.MAX_PATCH_OPERATIONS]))
+                              for i in range(0, len(increments), self.MAX_PATCH_OPERATIONS))
+            try:
+                self.container.execute_item_batch(batch_operations=operations, partition_key=bucket)
+                return True
+            except exceptions.CosmosBatchOperationError as e:
+                status = e.operation_responses[e.error_index].get('statusCode') \
+                    if e.error_index is not None and e.operation_responses else None
+                if status == 404 and e.error_index > 0:
+                    self._ensure_summary(bucket)
+                elif status not in (409, 412):
+                    raise
+                # Another consumer changed the row first; re-read and recompute the delta
+                with _stats_lock:
+                    _feed_stats["retries"] += 1
+        raise RuntimeError(f"Could not project change to {document['id']} after retries")
+
+    def apply(self, changes):
+        applied = skipped = 0
+        latest_source_ts = None
+        for op, document, version, source_ts in changes:
+            if self._apply_one(op, document, version, source_ts):
+                applied += 1
+                latest_source_ts = max(latest_source_ts or 0, source_ts or 0) or None
+            else:
+                skipped += 1
+        applied_at = _record_batch(applied, skipped, latest_source_ts)
+        if latest_source_ts:
+            self.container.upsert_item({"id": "feed", "bucket": META_BUCKET, "kind": "feed",
+                                        "sourceTs": latest_source_ts, "appliedAt": applied_at})
+        return applied, skipped
+
+    def list_rows(self, kind, status=None, limit=100, after=None):
+        sort_key = f"c.{SORT_FIELDS[kind]}"
+        conditions = ["c.kind = @kind"]
+        parameters = [{"name": "@kind", "value": kind}, {"name": "@limit", "value": limit}]
+        if status:
+            conditions.append("c.status = @status")
+            parameters.append({"name": "@status", "value": status})
+        if after:
+            conditions.append(f"({sort_key} < @afterSort OR ({sort_key} = @afterSort AND c.id < @afterId))")
+            parameters.extend([{"name": "@afterSort", "value": after[0]}, {"name": "@afterId", "value": after[1]}])
+        return list(self.container.query_items(
+            query=f"SELECT TOP @limit * FROM c WHERE {' AND '.join(conditions)} ORDER BY {sort_key} DESC, c.id DESC",
+            parameters=parameters,
+            enable_cross_partition_query=True
+        ))
+
+    def get_counters(self):
+        counters = Counter()
+        for summary in self.container.query_items(
+                query="SELECT VALUE c.counters FROM c WHERE c.kind = 'summary'",
+                enable_cross_partition_query=True):
+            counters.update(summary)
+        return dict(counters)
+
+    def get_status(self):
+        try:
+            feed = self.container.read_item(item="feed", partition_key=META_BUCKET)
+        except exceptions.CosmosResourceNotFoundError:
+            return _lag_status(None, None)
+        return _lag_status(feed.get('sourceTs'), feed.get('appliedAt'))
+
+
+PROJECTION_BACKENDS = {
+    "sqlite": SqliteProjections,
+    "cosmos": CosmosProjections,
+}
+
+_projections = {}
+
+
+def get_projections():
+    """Return the process-wide projection store for the configured backend"""
+    backend = get_projection_backend()
+    if backend not in _projections:
+        _projections[backend] = PROJECTION_BACKENDS[backend]()
+    return _projections[backend]
+
+
+def list_sessions(status=None, limit=100, after=None):
+    """One page of admin listing rows from the projection, newest first; returns (rows, next key)"""
+    rows, next_key = split_page(get_projections().list_rows("session", status, limit + 1, after),
+                                limit, SORT_FIELDS["session"])
+    return [{key: value for key, value in row.items() if key in SESSION_LISTING_FIELDS} for row in rows], next_key
+
+
+def list_contacts(limit=100, after=None):
+    """One page of contact inbox rows from the projection, newest first; returns (rows, next key)"""
+    rows, next_key = split_page(get_projections().list_rows("contact", None, limit + 1, after),
+                                limit, SORT_FIELDS["contact"])
+    return [{key: value for key, value in row.items() if key in CONTACT_FIELDS} for row in rows], next_key
+
+
+def count_sessions(status=None):
+    """Number of projected sessions, optionally with one status, from the counters"""
+    counters = get_projections().get_counters()
+    return counters.get(f"status:{status}" if status else "total", 0)
+
+
+def get_summary():
+    """Status counts and archetype distribution from the projection counters"""
+    return summary_from_counters(get_projections().get_counters())
+
+
+def get_projection_status():
+    """When the projection last caught up and how far behind the source it was"""
+    return get_projections().get_status()
+
+
+SESSION_LISTING_FIELDS = ("id", "nickname", "status", "createdAt", "completedAt", "reportFirstViewedAt",
+                          "answersCount", "hasResult", "primaryArchetype", "secondaryArchetype")
+CONTACT_FIELDS = ("id", "sessionId", "nickname", "name", "email", "message", "submittedAt", "status")
+# Listings are newest first on (sort field, id)
+SORT_FIELDS = {"session": "createdAt", "contact": "submittedAt"}
+
+
+# Cosmos DB trigger entry point
+def apply_cosmos_changes(documents):
+    """Project a batch delivered by the Cosmos DB change feed trigger"""
+    changes = [
+        ("upsert", document, int(document.get('_lsn') or document.get('_ts') or 0), document.get('_ts'))
+        for document in documents
+    ]
+    return get_projections().apply(changes)
+
+
+# Local event log and its in-process consumer
+LOCAL_FEED = "sessions"
+
+
+def get_log_path():
+    return os.environ.get('CHANGE_FEED_LOG_PATH', os.path.join('.sessions', 'changes.jsonl'))
+
+
+def publish_change(document, op="upsert"):
+    """Append a session or contact change to the local event log (no-op unless enabled)"""
+    if not is_enabled():
+        return
+    try:
+        log_path = get_log_path()
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps({"op": op, "ts": time.time(), "document": document}) + "\n"
+        # One O_APPEND write per event keeps lines whole when several processes append
+        fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode('utf-8'))
+        finally:
+            os.close(fd)
+        ensure_local_consumer()
+    except Exception as e:
+        logging.error(f"Error publishing change for {document.get('id')}: {str(e)}")
+
+
+def publish_deletes(document_ids):
+    """Remove deleted sessions from the read models (no-op unless enabled)
+
+    The Cosmos DB change feed never delivers deletes, so with Cosmos projections
+    the rows are replaced by tombstones directly; locally the deletes go through
+    the event log.
+    """
+    if not is_enabled():
+        return
+    document_ids = list(document_ids)
+    if get_projection_backend() != "cosmos":
+        for document_id in document_ids:
+            publish_change({"id": document_id}, op="delete")
+        return
+    try:
+        # No source timestamp: a delete says nothing about how far the feed has been read
+        get_projections().apply([("delete", {"id": document_id}, None, None) for document_id in document_ids])
+    except Exception as e:
+        logging.error(f"Error removing {len(document_ids)} deleted sessions from the projections: {str(e)}")
+
+
+class LocalChangeFeed:
+    """Tails the local event log into the projections under a lease"""
+
+    def __init__(self, projections=None, log_path=None, batch_size=None, lease_seconds=None):
+        self.projections = projections or get_projections()
+        self.log_path = log_path or get_log_path()
+        self.batch_size = batch_size or get_batch_size()
+        self.lease_seconds = lease_seconds or float(os.environ.get('CHANGE_FEED_LEASE_SECONDS', 15))
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def _read_batch(self, offset):
+        changes = []
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(offset)
+                while len(changes) < self.batch_size:
+                    line = f.readline()
+                    # A line without its newline is still being written; pick it up next poll
+                    if not line.endswith(b"\n"):
+                        break
+                    event = json.loads(line)
+                    # The event's offset orders every change to a document
+                    changes.append((event["op"], event["document"], offset, event.get("ts")))
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        return changes, offset
+
+    def backlog_bytes(self):
+        try:
+            return max(0, os.path.getsize(self.log_path) - self.projections.get_checkpoint(LOCAL_FEED))
+        except FileNotFoundError:
+            return 0
+
+    def poll(self):
+        """Apply the next batch if this consumer holds the lease; returns the number of changes read"""
+        if not self.projections.acquire_lease(LOCAL_FEED, self.owner, self.lease_seconds):
+            return 0
+        changes, offset = self._read_batch(self.projections.get_checkpoint(LOCAL_FEED))
+        if changes:
+            self.projections.apply(changes, feed=LOCAL_FEED, owner=self.owner, checkpoint=offset)
+        return len(changes)
+
+    def catch_up(self):
+        """Apply batches until the log is drained; returns the number of changes read"""
+        total = 0
+        while True:
+            read = self.poll()
+            total += read
+            if read < self.batch_size:
+                return total
+
+    def run(self, stop_event, poll_seconds):
+        while not stop_event.is_set():
+            try:
+                if self.poll() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logging.error(f"Error applying local change feed: {str(e)}")
+            stop_event.wait(poll_seconds)
+
+
+_consumer_lock = threading.Lock()
+_consumer = None
+
+
+def ensure_local_consumer():
+    """Start this process's background consumer of the local event log once"""
+    global _consumer
+    if _consumer is not None or not is_enabled():
+        return _consumer
+    with _consumer_lock:
+        if _consumer is None:
+            feed = LocalChangeFeed()
+            stop_event = threading.Event()
+            thread = threading.Thread(target=feed.run, args=(stop_event, float(os.environ.get(
+                'CHANGE_FEED_POLL_SECONDS', 0.5))), name="local-change-feed", daemon=True)
+            thread.start()
+            _consumer = (feed, stop_event, thread)
+    return _consumer
+
+
+def stop_local_consumer():
+    """Stop the background consumer (used by tests)"""
+    global _consumer
+    with _consumer_lock:
+        if _consumer is not None:
+            _, stop_event, thread = _consumer
+            stop_event.set()
+            thread.join()
+            _consumer = None
+
+
+def backfill(store=None, page_size=500):
+    """Publish every stored session to the local event log; returns the number published"""
+    from session_store import get_session_store
+    store = store or get_session_store()
+    published = 0
+    for page, _ in store.iter_session_pages(page_size=page_size):
+        for document in page:
+            publish_change(document)
+            published += 1
+    return published
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the change-feed read models")
+    parser.add_argument("--backfill", action="store_true", help="Publish every stored session to the local log")
+    parser.add_argument("--catch-up", action="store_true", help="Apply everything pending in the local log")
+    args = parser.parse_args()
+    if not is_enabled():
+        parser.error("Set CHANGE_FEED_ENABLED=true first")
+    if args.backfill:
+        print(f"Published {backfill()} sessions")
+    if args.catch_up or args.backfill:
+        stop_local_consumer()
+        feed = LocalChangeFeed()
+        print(f"Applied {feed.catch_up()} changes, {feed.backlog_bytes()} bytes pending")
+    if not (args.backfill or args.catch_up):
+        parser.print_help()
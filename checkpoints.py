@@ -0,0 +1,85 @@
+# Checkpoints for resumable admin jobs
+# A checkpoint is a small JSON document per job ID holding the job's continuation
+# token and counters. CHECKPOINT_STORE selects where they live:
+#   file   - one JSON file per job under CHECKPOINT_PATH (default .checkpoints)
+#   cosmos - documents in COSMOS_JOBS_CONTAINER_NAME (default "jobs", partitioned on /id)
+# When it is not set, cosmos is used if the session store is a Cosmos DB one, file otherwise.
+
+import json
+import os
+import tempfile
+
+import azure.cosmos.exceptions as exceptions
+
+from cosmos_connection import get_container
+
+
+def get_checkpoint_backend():
+    """Resolve where checkpoints are stored"""
+    backend = os.environ.get('CHECKPOINT_STORE', '').strip().lower()
+    if not backend:
+        from session_store import COSMOS_BACKENDS, get_store_backend_name
+        backend = "cosmos" if get_store_backend_name() in COSMOS_BACKENDS else "file"
+    if backend not in ("file", "cosmos"):
+        raise ValueError(f"Unknown CHECKPOINT_STORE: {backend}")
+    return backend
+
+
+def _jobs_container():
+    return get_container(os.environ.get('COSMOS_JOBS_CONTAINER_NAME', 'jobs'))
+
+
+def _checkpoint_file(job_id):
+    if not job_id or os.sep in job_id or '/' in job_id or job_id.startswith('.'):
+        raise ValueError(f"Invalid job ID: {job_id!r}")
+    return os.path.join(os.environ.get('CHECKPOINT_PATH', '.checkpoints'), f"{job_id}.json")
+
+
+def load_checkpoint(job_id):
+    """Return the saved state for a job, or None if it has no checkpoint"""
+    if get_checkpoint_backend() == "cosmos":
+        try:
+            return _jobs_container().read_item(item=job_id, partition_key=job_id).get('state')
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+    try:
+        with open(_checkpoint_file(job_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(job_id, state):
+    """Persist a job's state, replacing any previous checkpoint"""
+    if get_checkpoint_backend() == "cosmos":
+        _jobs_container().upsert_item({"id": job_id, "state": state})
+        return state
+    file_path = _checkpoint_file(job_id)
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    # Write to a temporary file first so an interrupted save never corrupts the checkpoint
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temp_path, file_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return state
+
+
+def clear_checkpoint(job_id):
+    """Remove a job's checkpoint; returns True if there was one"""
+    if get_checkpoint_backend() == "cosmos":
+        try:
+            _jobs_container().delete_item(item=job_id, partition_key=job_id)
+            return True
+        except exceptions.CosmosResourceNotFoundError:
+            return False
+    try:
+        os.remove(_checkpoint_file(job_id))
+        return True
+    except FileNotFoundError:
+        return False
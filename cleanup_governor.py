@@ -0,0 +1,147 @@
+# Scheduled background cleanup
+# With SCHEDULED_CLEANUP_ENABLED=true, a timer trigger (cleanup_timer) runs the
+# cleanup job in short slices instead of one burst. Each slice is bounded by
+# SCHEDULED_CLEANUP_SLICE_SECONDS and resumes from the job's checkpoint. Once a
+# pass completes, the next slice starts a new pass with a fresh cutoff.
+#
+# The governor keeps that work out of the way of live candidates:
+#   - deletes and page reads spend from an AdaptiveRequestUnitBudget, measured
+#     from the request charges Cosmos DB reports. The ceiling is
+#     SCHEDULED_CLEANUP_RU_PER_SECOND, every 429 halves the rate and it climbs
+#     back while nothing is throttled. The budget lives for the worker process,
+#     so what one slice learns carries into the next.
+#   - before each slice and between pages it reads the hourly start histogram
+#     from the analytics rollups. While assessments are starting at
+#     SCHEDULED_CLEANUP_PEAK_STARTS_PER_HOUR or more, cleanup pauses until the
+#     next slice.
+#
+# With SESSION_EXPIRY_SWEEP_ENABLED=true and sessions in Cosmos DB, the same
+# timer also runs the expiry sweep (cleanup_job.ExpirySweep). It deletes
+# sessions once their lifetime runs out, ahead of the TTL backstop, so the
+# rollups and read models see them go. It spends from the same budget and
+# pauses at peak traffic like cleanup; the grace period the stored ttls carry
+# past the lifetime leaves room for a paused sweep to catch up.
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+
+from analytics_rollups import get_activity
+from bulk_delete import BulkDeleter
+from cleanup_job import CleanupJob, ExpirySweep
+from cosmos_connection import get_container
+from ru_budget import AdaptiveRequestUnitBudget
+from session_store import is_expiry_sweep_enabled
+
+JOB_ID = "scheduled-cleanup"
+
+
+def is_enabled():
+    """Whether the timer trigger cleans up sessions"""
+    return os.environ.get('SCHEDULED_CLEANUP_ENABLED', 'false').lower() == 'true'
+
+
+def get_scheduled_cleanup_settings():
+    """Get the cleanup scope, slice length and governor limits from environment or use defaults"""
+    return {
+        "days": int(os.environ.get('SCHEDULED_CLEANUP_DAYS', 30)),
+        "status": os.environ.get('SCHEDULED_CLEANUP_STATUS') or None,
+        "slice_seconds": float(os.environ.get('SCHEDULED_CLEANUP_SLICE_SECONDS', 60)),
+        "ru_per_second": float(os.environ.get('SCHEDULED_CLEANUP_RU_PER_SECOND', 100)),
+        "concurrency": int(os.environ.get('SCHEDULED_CLEANUP_CONCURRENCY', 4)),
+        "peak_starts_per_hour": int(os.environ.get('SCHEDULED_CLEANUP_PEAK_STARTS_PER_HOUR', 30)),
+        "peak_check_seconds": float(os.environ.get('SCHEDULED_CLEANUP_PEAK_CHECK_SECONDS', 60))
+    }
+
+
+def recent_starts_per_hour(now=None):
+    """Assessments started in the current or the previous hour, whichever is busier"""
+    now = now or datetime.now(timezone.utc)
+    activity = get_activity(now - timedelta(hours=1), now, "hour")
+    return max((bucket["started"] for bucket in activity["buckets"]), default=0)
+
+
+class CleanupGovernor:
+    """Adaptive RU budget plus a peak-traffic check shared by every cleanup slice in the process"""
+
+    def __init__(self, ru_per_second, peak_starts_per_hour, peak_check_seconds=60):
+        self.budget = AdaptiveRequestUnitBudget(ru_per_second)
+        self.peak_starts_per_hour = peak_starts_per_hour
+        self.peak_check_seconds = peak_check_seconds
+        self.pauses = 0
+        self._starts = 0
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def is_peak(self):
+        """Whether candidate traffic is at or above the peak threshold (re-read at most every peak_check_seconds)"""
+        if not self.peak_starts_per_hour:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is None or now - self._checked >= self.peak_check_seconds:
+                try:
+                    self._starts = recent_starts_per_hour()
+                except Exception as e:
+                    # Without traffic figures, assume the worst rather than compete with candidates
+                    logging.warning(f"Could not read recent activity, pausing cleanup: {str(e)}")
+                    self._starts = self.peak_starts_per_hour
+                self._checked = now
+            peak = self._starts >= self.peak_starts_per_hour
+        if peak:
+            self.pauses += 1
+        return peak
+
+    def stats(self):
+        stats = self.budget.stats()
+        stats.update({"recentStartsPerHour": self._starts, "peakStartsPerHour": self.peak_starts_per_hour,
+                      "pauses": self.pauses})
+        return stats
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor():
+    """The process-wide governor, created on first use"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            settings = get_scheduled_cleanup_settings()
+            _governor = CleanupGovernor(settings["ru_per_second"], settings["peak_starts_per_hour"],
+                                        settings["peak_check_seconds"])
+        return _governor
+
+
+def run_cleanup_slice(container=None, governor=None):
+    """Run one governed slice of the scheduled cleanup; returns the job state, or None if paused"""
+    settings = get_scheduled_cleanup_settings()
+    governor = governor or get_governor()
+    if governor.is_peak():
+        logging.info(f"Scheduled cleanup paused: {governor.stats()['recentStartsPerHour']} starts in the last hour")
+        return None
+
+    container = container if container is not None else get_container()
+    deleter = BulkDeleter(container, concurrency=settings["concurrency"], budget=governor.budget)
+    job = CleanupJob(days=settings["days"], status=settings["status"], container=container,
+                     deleter=deleter, job_id=JOB_ID)
+    state = job.run(max_seconds=settings["slice_seconds"], should_stop=governor.is_peak)
+    state.update(governor.stats())
+    return state
+
+
+def run_expiry_sweep(container=None, governor=None):
+    """Run one governed expiry sweep; returns its counts, or None if paused"""
+    settings = get_scheduled_cleanup_settings()
+    governor = governor or get_governor()
+    if governor.is_peak():
+        logging.info(f"Expiry sweep paused: {governor.stats()['recentStartsPerHour']} starts in the last hour")
+        return None
+
+    container = container if container is not None else get_container()
+    deleter = BulkDeleter(container, concurrency=settings["concurrency"], budget=governor.budget)
+    return ExpirySweep(container, deleter=deleter).run(max_seconds=settings["slice_seconds"],
+                                                       should_stop=governor.is_peak)
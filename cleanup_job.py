@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Resumable cleanup of old sessions.
+
+Sessions created before a cutoff (optionally with one status) are read one
+continuation page at a time, projecting only the id, partition key and the
+fields the analytics rollups count, and each page is deleted through
+bulk_delete. The sessions actually deleted are then taken out of the rollups
+and the change-feed projections, which never see a delete otherwise. The
+continuation token and counters are checkpointed after every page, together
+with the cutoff, so a run stopped by the function timeout resumes on the same
+set of sessions. Memory stays bounded by the page size whatever the backlog.
+Dry runs never read the matching documents in full: they return a count and a
+capped sample.
+
+Usage:
+    python cleanup_job.py [--days 30] [--status InProgress] [--dry-run] [--page-size 500]
+                          [--max-pages N] [--restart]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone, timedelta
+
+from analytics_rollups import record_sessions_deleted
+from answer_codec import from_stored
+from bulk_delete import BulkDeleter
+from change_feed import publish_deletes
+from checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from cosmos_connection import get_container
+from session_store import check_single_layout, get_expiry_settings, get_session_ttl_settings
+
+JOB_ID = "session-cleanup"
+COUNTERS = ("processed", "deleted", "missing", "failed", "throttled")
+CLEANUP_STATUSES = ("InProgress", "Completed")
+
+# Enough to show a session in a preview; contacts have no createdAt and never match
+PREVIEW_SELECT = "c.id, c.pk, c.status, c.createdAt, c.completedAt"
+# Enough to delete a session and take it back out of the rollups (answers time the latency sketch)
+CLEANUP_SELECT = (PREVIEW_SELECT + ", c.completionDurationSeconds, c.reportFirstViewedAt, "
+                  "{\"primaryArchetype\": c.result.primaryArchetype, "
+                  "\"reportContent\": IS_STRING(c.result.reportContent)} AS result, c.answers, c.answersPacked")
+
+
+def get_cleanup_settings():
+    """Get page size, time budget per run and dry-run sample size from environment or use defaults"""
+    return {
+        "page_size": int(os.environ.get('CLEANUP_PAGE_SIZE', 500)),
+        "max_seconds": float(os.environ.get('CLEANUP_MAX_SECONDS', 240)),
+        "sample_size": int(os.environ.get('CLEANUP_SAMPLE_SIZE', 20)),
+        "max_sample_size": int(os.environ.get('CLEANUP_MAX_SAMPLE_SIZE', 100))
+    }
+
+
+def build_cleanup_query(select, cutoff, status=None):
+    """Query and parameters selecting sessions created before cutoff, optionally with one status"""
+    conditions = ["c.createdAt < @cutoff_date"]
+    parameters = [{"name": "@cutoff_date", "value": cutoff}]
+    if status:
+        conditions.append("c.status = @status")
+        parameters.append({"name": "@status", "value": status})
+    return f"SELECT {select} FROM c WHERE {' AND '.join(conditions)}", parameters
+
+
+def build_expiry_query(select, now, lifetimes, grace_seconds):
+    """Query and parameters selecting sessions whose configured lifetime has run out by now (epoch seconds)
+
+    Each status's lifetime turns into an indexed range on _ts. The stored ttl is
+    checked too: it must run out within grace_seconds, in case it was written
+    under a longer setting. Returns (None, None) if no status expires.
+    """
+    conditions = []
+    parameters = [{"name": "@horizon", "value": now + grace_seconds}]
+    for index, (status, lifetime) in enumerate(sorted((status, lifetime) for status, lifetime in lifetimes.items()
+                                                      if lifetime > 0)):
+        conditions.append(f"(c.status = @status{index} AND c._ts < @before{index})")
+        parameters.extend([{"name": f"@status{index}", "value": status},
+                           {"name": f"@before{index}", "value": now - lifetime}])
+    if not conditions:
+        return None, None
+    return (f"SELECT {select} FROM c WHERE IS_NUMBER(c.ttl) AND c.ttl > 0 AND c._ts + c.ttl < @horizon "
+            f"AND ({' OR '.join(conditions)})", parameters)
+
+
+def forget_deleted(items, deleted_ids):
+    """Take deleted sessions (as read with CLEANUP_SELECT) out of the rollups and the read models"""
+    deleted_ids = set(deleted_ids)
+    if deleted_ids:
+        record_sessions_deleted(from_stored(item) for item in items if item['id'] in deleted_ids)
+        publish_deletes(deleted_ids)
+
+
+class CleanupJob:
+    """Paged, checkpointed deletion of the sessions matching one cutoff and status"""
+
+    def __init__(self, days=30, status=None, container=None, page_size=None, deleter=None,
+                 job_id=JOB_ID, progress=None):
+        if days < 1:
+            raise ValueError("Days must be at least 1")
+        if status and status not in CLEANUP_STATUSES:
+            raise ValueError("Status must be 'InProgress' or 'Completed'")
+        check_single_layout("Session cleanup")
+        settings = get_cleanup_settings()
+        self.days = days
+        self.status = status
+        self.container = container if container is not None else get_container()
+        self.page_size = page_size or settings["page_size"]
+        self.deleter = deleter or BulkDeleter(self.container)
+        self.job_id = job_id
+        self.progress = progress
+
+    def cutoff(self):
+        return (datetime.now(timezone.utc) - timedelta(days=self.days)).isoformat()
+
+    def preview(self, sample_size=None):
+        """Count the matching sessions and return the first sample_size of them, without deleting anything"""
+        settings = get_cleanup_settings()
+        sample_size = settings["sample_size"] if sample_size is None else sample_size
+        if sample_size < 0 or sample_size > settings["max_sample_size"]:
+            raise ValueError(f"sample must be between 0 and {settings['max_sample_size']}")
+        cutoff = self.cutoff()
+        query, parameters = build_cleanup_query("VALUE COUNT(1)", cutoff, self.status)
+        found = next(iter(self.container.query_items(query=query, parameters=parameters,
+                                                     enable_cross_partition_query=True)), 0)
+        sample = []
+        if sample_size:
+            query, parameters = build_cleanup_query(f"TOP {int(sample_size)} {PREVIEW_SELECT}", cutoff, self.status)
+            sample = list(self.container.query_items(query=query, parameters=parameters,
+                                                     enable_cross_partition_query=True))
+        return {"cutoff": cutoff, "found": found, "sample": sample}
+
+    def _load_state(self, restart):
+        state = None if restart else load_checkpoint(self.job_id)
+        # A checkpoint for other parameters belongs to a different cleanup; start this one afresh
+        if state is not None and (state.get("days"), state.get("status")) == (self.days, self.status):
+            return state
+        state = dict.fromkeys(COUNTERS, 0)
+        state.update({"days": self.days, "status": self.status, "cutoff": self.cutoff(), "continuation": None,
+                      "startedAt": datetime.now(timezone.utc).isoformat()})
+        return state
+
+    def _report(self, state, started):
+        state["elapsedSeconds"] = round(time.monotonic() - started, 2)
+        logging.info(f"Session cleanup {self.job_id}: {state['processed']} processed, {state['deleted']} deleted, "
+                     f"{state['failed']} failed")
+        if self.progress:
+            self.progress(dict(state))
+
+    def _charge_page(self):
+        # Page reads count against the same budget as the deletes
+        headers = self.container.client_connection.last_response_headers or {}
+        self.deleter.budget.spend(float(headers.get('x-ms-request-charge') or 0))
+
+    def run(self, max_pages=None, max_seconds=None, restart=False, should_stop=None):
+        """Delete page by page until done, max_pages, max_seconds or should_stop(); returns the job state"""
+        max_seconds = get_cleanup_settings()["max_seconds"] if max_seconds is None else max_seconds
+        state = self._load_state(restart)
+        query, parameters = build_cleanup_query(CLEANUP_SELECT, state["cutoff"], self.status)
+
+        started = time.monotonic()
+        pages_done = 0
+        state["completed"] = False
+        pages = self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True,
+                                           max_item_count=self.page_size).by_page(state["continuation"])
+        for page in pages:
+            items = list(page)
+            self._charge_page()
+            deleted_ids = []
+            result = self.deleter.delete(((item['id'], item.get('pk', item['id'])) for item in items),
+                                         on_deleted=deleted_ids.extend)
+            forget_deleted(items, deleted_ids)
+            for counter in COUNTERS[1:]:
+                state[counter] += result[counter]
+            state["processed"] += len(items)
+            state["continuation"] = pages.continuation_token
+            state["updatedAt"] = datetime.now(timezone.utc).isoformat()
+            pages_done += 1
+
+            if pages.continuation_token is None:
+                state["completed"] = True
+                break
+            save_checkpoint(self.job_id, state)
+            if (max_pages and pages_done >= max_pages) or (max_seconds and time.monotonic() - started >= max_seconds):
+                break
+            if should_stop and should_stop():
+                break
+            self._report(state, started)
+            self.deleter.budget.wait()
+        else:
+            state["completed"] = True
+
+        self._report(state, started)
+        if state["completed"]:
+            clear_checkpoint(self.job_id)
+        return state
+
+
+class ExpirySweep:
+    """Deletes sessions once their configured lifetime runs out, so the rollups and read models see them go
+
+    Documents removed by Cosmos DB TTL leave no trace in the change feed. With
+    the sweep on, stored ttls run grace_seconds past the lifetime, so the sweep
+    deletes sessions through the same path as cleanup and TTL stays the
+    backstop for anything it misses. A session never goes before its lifetime.
+    """
+
+    def __init__(self, container=None, page_size=None, deleter=None, grace_seconds=None):
+        check_single_layout("The expiry sweep")
+        self.container = container if container is not None else get_container()
+        self.page_size = page_size or get_cleanup_settings()["page_size"]
+        self.deleter = deleter or BulkDeleter(self.container)
+        self.grace_seconds = get_expiry_settings()["grace_seconds"] if grace_seconds is None else grace_seconds
+
+    def run(self, max_seconds=None, now=None, should_stop=None):
+        """Delete expired sessions a page at a time until none are left, max_seconds or should_stop(); returns counts"""
+        max_seconds = get_cleanup_settings()["max_seconds"] if max_seconds is None else max_seconds
+        state = dict.fromkeys(COUNTERS, 0)
+        state["completed"] = True
+        query, parameters = build_expiry_query(f"TOP {int(self.page_size)} {CLEANUP_SELECT}", int(now or time.time()),
+                                               get_session_ttl_settings(), self.grace_seconds)
+        if query is None:
+            return state
+        started = time.monotonic()
+        while True:
+            # Deleted sessions drop out of the query, so every page starts from the top
+            items = list(self.container.query_items(query=query, parameters=parameters,
+                                                    enable_cross_partition_query=True))
+            if not items:
+                break
+            deleted_ids = []
+            result = self.deleter.delete(((item['id'], item.get('pk', item['id'])) for item in items),
+                                         on_deleted=deleted_ids.extend)
+            forget_deleted(items, deleted_ids)
+            for counter in COUNTERS[1:]:
+                state[counter] += result[counter]
+            state["processed"] += len(items)
+            # A page that deleted nothing would be read again unchanged
+            if not result["deleted"] or (max_seconds and time.monotonic() - started >= max_seconds) \
+                    or (should_stop and should_stop()):
+                state["completed"] = False
+                break
+            self.deleter.budget.wait()
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete sessions older than a number of days")
+    parser.add_argument("--days", type=int, default=30, help="Sessions created more than this many days ago")
+    parser.add_argument("--status", choices=CLEANUP_STATUSES, help="Only sessions with this status")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the sessions and show a sample")
+    parser.add_argument("--page-size", type=int, help="Sessions read per page (default CLEANUP_PAGE_SIZE or 500)")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages; rerun to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    job = CleanupJob(days=args.days, status=args.status, page_size=args.page_size)
+    if args.dry_run:
+        print(json.dumps(job.preview(), indent=2))
+        return
+    # From the command line there is no function timeout to stay under
+    state = job.run(max_pages=args.max_pages, max_seconds=0, restart=args.restart)
+    print(f"{'Completed' if state['completed'] else 'Paused'}: {state['processed']} processed, "
+          f"{state['deleted']} deleted, {state['missing']} already gone, {state['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
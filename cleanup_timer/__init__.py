@@ -0,0 +1,41 @@
+import azure.functions as func
+import logging
+from cleanup_governor import is_enabled, is_expiry_sweep_enabled, run_cleanup_slice, run_expiry_sweep
+from session_store import LayoutCutoverInProgress
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Cleanup Timer - Scheduled expiry sweep and slice of the background session cleanup
+
+    Runs on CLEANUP_SCHEDULE. With SESSION_EXPIRY_SWEEP_ENABLED=true and
+    sessions in Cosmos DB it first deletes the sessions whose lifetime ran out,
+    so the rollups and read models see them go. When
+    SCHEDULED_CLEANUP_ENABLED=true, each run then resumes the
+    checkpointed cleanup job under the adaptive RU budget, skipping the slice
+    while candidate traffic is at its peak.
+    """
+    if timer.past_due:
+        logging.info("Cleanup timer is past due")
+
+    if is_expiry_sweep_enabled():
+        try:
+            state = run_expiry_sweep()
+            if state is not None:
+                logging.info(f"Expiry sweep: {state['deleted']} deleted, {state['failed']} failed")
+        except Exception as e:
+            # The cleanup slice below does not depend on the sweep
+            logging.error(f"Error in expiry sweep: {str(e)}")
+
+    if not is_enabled():
+        return
+
+    try:
+        state = run_cleanup_slice()
+    except LayoutCutoverInProgress as e:
+        logging.warning(f"Scheduled cleanup skipped: {str(e)}")
+        return
+    if state is None:
+        return
+    logging.info(f"Scheduled cleanup slice: {state['deleted']} deleted, {state['failed']} failed, "
+                 f"{'pass completed' if state['completed'] else 'resuming next slice'}; "
+                 f"RU/s {state['ruPerSecond']} of {state['ruCeiling']}, {state['throttles']} throttles")
@@ -4,13 +4,7 @@ import json
 import os
 from datetime import datetime, timezone
 from typing import Dict, Any
-
-# Azure SDK imports
-import azure.cosmos.cosmos_client as cosmos_client
-import azure.cosmos.exceptions as exceptions
-
-# Import shared storage for fallback
-from shared_session_storage import get_session as get_session_memory
+from session_store import get_session_store
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -61,20 +55,9 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
         
-        # Check if we should use in-memory storage
-        use_in_memory = os.environ.get('USE_IN_MEMORY_STORAGE', 'false').lower() == 'true'
-        
-        if use_in_memory:
-            # Use in-memory storage
-            session = get_session_memory(session_id)
-            # For in-memory, we'll just log the contact submission
-            logging.info(f"Contact submission (in-memory): {name} ({email}) - {message}")
-        else:
-            # Initialize Cosmos DB client
-            cosmos_client_instance = get_cosmos_client()
-            # Get session from database
-            session = get_session(cosmos_client_instance, session_id)
-            
+        # Get session from the session store
+        store = get_session_store()
+        session = store.get_session(session_id)
         if not session:
             return func.HttpResponse(
                 json.dumps({"error": "Session not found"}),
@@ -95,8 +78,7 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         }
         
         # Store contact submission
-        if not use_in_memory:
-            store_contact_submission(cosmos_client_instance, contact_submission)
+        store_contact_submission(store, contact_submission)
         
         return func.HttpResponse(
             json.dumps({"message": "Contact submission received successfully"}),
@@ -112,64 +94,10 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             mimetype="application/json"
         )
 
-def get_cosmos_client():
-    """Initialize and return Cosmos DB client"""
-    cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
-    cosmos_key = os.environ.get('COSMOS_KEY')
-    
-    if not cosmos_endpoint or not cosmos_key:
-        raise ValueError("Cosmos DB credentials not configured")
-    
-    return cosmos_client.CosmosClient(cosmos_endpoint, cosmos_key)
-
-def get_database_name():
-    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
-
-def get_container_name():
-    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
-
-def get_session(cosmos_client_instance, session_id):
-    """Retrieve session from Cosmos DB"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Query for the session
-        query = "SELECT * FROM c WHERE c.id = @session_id"
-        parameters = [{"name": "@session_id", "value": session_id}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        
-        if items:
-            return items[0]
-        else:
-            return None
-            
-    except exceptions.CosmosResourceNotFoundError:
-        logging.warning(f"Database or container not found for session {session_id}")
-        return None
-    except Exception as e:
-        logging.error(f"Error retrieving session {session_id}: {str(e)}")
-        return None
-
-def store_contact_submission(cosmos_client_instance, contact_submission):
-    """Store contact submission in Cosmos DB"""
+def store_contact_submission(store, contact_submission):
+    """Store contact submission in the session store"""
     try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Upsert the contact submission
-        container.upsert_item(contact_submission)
-        
-        logging.info(f"Contact submission stored successfully: {contact_submission['id']}")
+        store.save_contact(contact_submission)
         
     except Exception as e:
         logging.error(f"Error storing contact submission: {str(e)}")
@@ -0,0 +1,38 @@
+# Opaque continuation tokens for keyset paging
+# Listings are ordered newest first on (createdAt, id), and a token is the
+# (createdAt, id) of the last row returned, base64url-encoded so clients treat
+# it as opaque. The next page seeks straight past that key instead of skipping
+# rows with OFFSET, so every page costs the same however deep it is.
+
+import base64
+import json
+
+
+def encode_continuation(key):
+    """Encode a (sort value, id) key as an opaque token; None stays None"""
+    if key is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_continuation(token):
+    """Decode a token back into a (sort value, id) key; raises ValueError if it is malformed"""
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid continuation token")
+    if not isinstance(key, list) or len(key) != 2 or not isinstance(key[1], str) \
+            or not (key[0] is None or isinstance(key[0], str)):
+        raise ValueError("Invalid continuation token")
+    return key[0], key[1]
+
+
+def split_page(rows, limit, sort_field):
+    """Split limit + 1 fetched rows into the page and the key the next page starts after"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    last = rows[limit - 1]
+    return rows[:limit], (last.get(sort_field), last['id'])
@@ -0,0 +1,131 @@
+# Process-wide Cosmos DB connection shared by every handler
+# The client is created lazily on first use and reused for the lifetime of the
+# worker process, so each request skips the TLS handshake, the account metadata
+# read and the connection pool setup. Container proxies are cached by name.
+
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
+import azure.cosmos.cosmos_client as cosmos_client
+
+_lock = threading.Lock()
+_client = None
+_http_session = None
+_containers = {}
+_stats = {
+    "clientsCreated": 0,
+    "clientRequests": 0,
+    "containerCacheHits": 0,
+    "containerCacheMisses": 0
+}
+
+
+def get_database_name():
+    """Get database name from environment or use default"""
+    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
+
+
+def get_container_name():
+    """Get container name from environment or use default"""
+    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
+
+
+def get_pool_size():
+    """Maximum number of pooled HTTP connections to the Cosmos DB endpoint"""
+    return int(os.environ.get('COSMOS_CONNECTION_POOL_SIZE', 100))
+
+
+def get_cosmos_client():
+    """Return the shared Cosmos DB client, creating it on first use"""
+    global _client, _http_session
+
+    _stats["clientRequests"] += 1
+    if _client is not None:
+        return _client
+
+    with _lock:
+        if _client is None:
+            cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
+            cosmos_key = os.environ.get('COSMOS_KEY')
+
+            if not cosmos_endpoint or not cosmos_key:
+                raise ValueError("Cosmos DB credentials not configured")
+
+            # Own the HTTP session so the pool size is explicit and its stats are observable
+            pool_size = get_pool_size()
+            _http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _http_session.mount('https://', adapter)
+            _http_session.mount('http://', adapter)
+
+            _client = cosmos_client.CosmosClient(
+                cosmos_endpoint,
+                cosmos_key,
+                transport=RequestsTransport(session=_http_session, session_owner=False)
+            )
+            _stats["clientsCreated"] += 1
+    return _client
+
+
+def get_container(container_name=None, database_name=None):
+    """Return a cached container proxy from the shared client"""
+    container_name = container_name or get_container_name()
+    database_name = database_name or get_database_name()
+    cache_key = (database_name, container_name)
+
+    container = _containers.get(cache_key)
+    if container is not None:
+        _stats["containerCacheHits"] += 1
+        return container
+
+    client = get_cosmos_client()
+    with _lock:
+        container = _containers.get(cache_key)
+        if container is None:
+            _stats["containerCacheMisses"] += 1
+            container = client.get_database_client(database_name).get_container_client(container_name)
+            _containers[cache_key] = container
+        else:
+            _stats["containerCacheHits"] += 1
+    return container
+
+
+def get_connection_stats():
+    """Report pool size and how often connections and proxies were reused"""
+    connections_opened = 0
+    requests_sent = 0
+    if _http_session is not None:
+        for adapter in set(_http_session.adapters.values()):
+            for pool_key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(pool_key)
+                if pool is None:
+                    continue
+                connections_opened += pool.num_connections
+                requests_sent += pool.num_requests
+
+    return {
+        "initialized": _client is not None,
+        "poolSize": get_pool_size(),
+        "clientsCreated": _stats["clientsCreated"],
+        "clientRequests": _stats["clientRequests"],
+        "cachedContainers": len(_containers),
+        "containerCacheHits": _stats["containerCacheHits"],
+        "containerCacheMisses": _stats["containerCacheMisses"],
+        "connectionsOpened": connections_opened,
+        "requestsSent": requests_sent,
+        "connectionsReused": max(0, requests_sent - connections_opened)
+    }
+
+
+def reset_connection():
+    """Drop the shared client and cached proxies (used by tests and after credential rotation)"""
+    global _client, _http_session
+    with _lock:
+        if _http_session is not None:
+            _http_session.close()
+        _client = None
+        _http_session = None
+        _containers.clear()
@@ -4,7 +4,7 @@ import json
 import os
 from datetime import datetime, timezone
 from typing import Dict, Any
-from shared_session_storage import get_session
+from session_store import get_session_store
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -25,8 +25,8 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # Get session from shared storage
-        session = get_session(session_id)
+        # Get session from the session store
+        session = get_session_store().get_session(session_id)
         if not session:
             return func.HttpResponse(
                 json.dumps({"error": "Session not found"}),
@@ -1,4 +1,5 @@
 import azure.functions as func
+import os
 
 # Import all function modules
 from start_assessment import main as start_assessment_main
@@ -11,8 +12,18 @@ from download_report import main as download_report_main
 from health import main as health_main
 from session_status import main as session_status_main
 from analytics import main as analytics_main
+from analytics_activity import main as analytics_activity_main
 from session_cleanup import main as session_cleanup_main
+from cleanup_timer import main as cleanup_timer_main
 from session_reset import main as session_reset_main
+from session_bulk_reset import main as session_bulk_reset_main
+from session_rescore import main as session_rescore_main
+from session_change_feed import main as session_change_feed_main
+from admin_contacts import main as admin_contacts_main
+from admin_export import main as admin_export_main
+from change_feed import get_batch_size, is_enabled as change_feed_enabled
+from cosmos_connection import get_database_name, get_container_name
+from session_store import COSMOS_BACKENDS, PARTITIONED_BACKENDS, get_store_backend_name
 
 app = func.FunctionApp()
 
@@ -87,6 +98,13 @@ def analytics(req: func.HttpRequest) -> func.HttpResponse:
     response = analytics_main(req)
     return add_cors_headers(response)
 
+# Register the analytics_activity function
+@app.function_name(name="analytics_activity")
+@app.route(route="analytics/activity", methods=["GET"])
+def analytics_activity(req: func.HttpRequest) -> func.HttpResponse:
+    response = analytics_activity_main(req)
+    return add_cors_headers(response)
+
 # Register the contact function
 @app.function_name(name="contact")
 @app.route(route="assessment/{sessionId}/contact", methods=["POST"])
@@ -108,9 +126,71 @@ def session_cleanup(req: func.HttpRequest) -> func.HttpResponse:
     response = session_cleanup_main(req)
     return add_cors_headers(response)
 
+# Register the scheduled expiry sweep and cleanup (default every 5 minutes; the sweep runs with Cosmos DB sessions,
+# the cleanup only with SCHEDULED_CLEANUP_ENABLED=true)
+@app.function_name(name="cleanup_timer")
+@app.timer_trigger(arg_name="timer", schedule=os.environ.get('CLEANUP_SCHEDULE', '0 */5 * * * *'),
+                   run_on_startup=False, use_monitor=True)
+def cleanup_timer(timer: func.TimerRequest) -> None:
+    cleanup_timer_main(timer)
+
 # Register the session_reset function
 @app.function_name(name="session_reset")
 @app.route(route="api/admin/sessions/{sessionId}/reset", methods=["POST"])
 def session_reset(req: func.HttpRequest) -> func.HttpResponse:
     response = session_reset_main(req)
-    return add_cors_headers(response)
\ No newline at end of file
+    return add_cors_headers(response)
+
+# Register the session_bulk_reset function
+@app.function_name(name="session_bulk_reset")
+@app.route(route="api/admin/sessions/reset", methods=["POST"])
+def session_bulk_reset(req: func.HttpRequest) -> func.HttpResponse:
+    response = session_bulk_reset_main(req)
+    return add_cors_headers(response)
+
+# Register the session_rescore function
+@app.function_name(name="session_rescore")
+@app.route(route="api/admin/sessions/rescore", methods=["POST"])
+def session_rescore(req: func.HttpRequest) -> func.HttpResponse:
+    response = session_rescore_main(req)
+    return add_cors_headers(response)
+
+# Register the admin_contacts function
+@app.function_name(name="admin_contacts")
+@app.route(route="api/admin/contacts", methods=["GET"])
+def admin_contacts(req: func.HttpRequest) -> func.HttpResponse:
+    response = admin_contacts_main(req)
+    return add_cors_headers(response)
+
+# Register the admin_export function
+@app.function_name(name="admin_export")
+@app.route(route="api/admin/sessions/export", methods=["GET"])
+def admin_export(req: func.HttpRequest) -> func.HttpResponse:
+    response = admin_export_main(req)
+    # Let browser clients read the next page's token
+    response.headers["Access-Control-Expose-Headers"] = "X-Continuation-Token, X-Export-Rows"
+    return add_cors_headers(response)
+
+# Register the change feed projectors only when projections are on and sessions live in Cosmos DB,
+# so other deployments bind no COSMOS_CONNECTION and create no leases container
+# (COSMOS_CONNECTION holds the account connection string)
+if change_feed_enabled() and get_store_backend_name() in COSMOS_BACKENDS:
+    @app.function_name(name="session_change_feed")
+    @app.cosmos_db_trigger(arg_name="documents", connection="COSMOS_CONNECTION",
+                           database_name=get_database_name(), container_name=get_container_name(),
+                           lease_container_name="leases", create_lease_container_if_not_exists=True,
+                           max_items_per_invocation=get_batch_size())
+    def session_change_feed(documents: func.DocumentList) -> None:
+        session_change_feed_main(documents)
+
+    # The partitioned layout keeps contact submissions in their own container; project them too
+    if get_store_backend_name() in PARTITIONED_BACKENDS:
+        @app.function_name(name="contact_change_feed")
+        @app.cosmos_db_trigger(arg_name="documents", connection="COSMOS_CONNECTION",
+                               database_name=get_database_name(),
+                               container_name=os.environ.get('COSMOS_CONTACTS_CONTAINER_NAME', 'contacts'),
+                               lease_container_name="leases", lease_container_prefix="contacts-",
+                               create_lease_container_if_not_exists=True,
+                               max_items_per_invocation=get_batch_size())
+        def contact_change_feed(documents: func.DocumentList) -> None:
+            session_change_feed_main(documents)
@@ -4,7 +4,9 @@ import json
 import os
 from datetime import datetime, timezone
 from typing import Dict, Any, List
-from shared_session_storage import get_session, update_session
+from session_store import get_session_store, ConcurrencyConflict
+from scoring import score_session
+from analytics_rollups import record_report_generated
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -43,8 +45,9 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 }
             )
         
-        # Get session from shared storage
-        session = get_session(session_id)
+        # Get session from the session store
+        store = get_session_store()
+        session = store.get_session(session_id)
         if not session:
             return func.HttpResponse(
                 json.dumps({"error": "Session not found"}),
@@ -86,10 +89,43 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         # Calculate scores and generate report
         result = calculate_scores_and_generate_report(session)
         
-        # Update session with report data and mark as viewed
-        session['result'] = result
-        session['reportFirstViewedAt'] = datetime.now(timezone.utc).isoformat()
-        update_session(session)
+        # Update session with report data and mark as viewed, unless a concurrent request already did
+        viewed_at = datetime.now(timezone.utc).isoformat()
+        
+        def mark_report_viewed(current):
+            if current.get('status') != 'Completed' or current.get('reportFirstViewedAt'):
+                return False
+            current['result'] = result
+            current['reportFirstViewedAt'] = viewed_at
+            return True
+        
+        try:
+            updated = store.mutate_session(session_id, mark_report_viewed, session=session)
+        except ConcurrencyConflict:
+            return func.HttpResponse(
+                json.dumps({"error": "Session is being updated by another request, please retry"}),
+                status_code=409,
+                mimetype="application/json",
+                headers={
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization"
+                }
+            )
+        
+        if not updated or updated.get('reportFirstViewedAt') != viewed_at:
+            return func.HttpResponse(
+                json.dumps({"error": "Report already viewed"}),
+                status_code=410,
+                mimetype="application/json",
+                headers={
+                    "Access-Control-Allow-Origin": "*",
+                    "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization"
+                }
+            )
+        
+        record_report_generated(updated, result)
         
         return func.HttpResponse(
             json.dumps(result),
@@ -115,18 +151,19 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             }
         )
 
-def calculate_scores_and_generate_report(session):
-    """Calculate scores from answers and generate personalized report"""
+def calculate_scores_and_generate_report(session, scores=None):
+    """Calculate scores from answers and generate personalized report
+
+    scores is an optional precomputed (construct_scores, archetype_scores) pair,
+    e.g. from a batch re-scoring run.
+    """
     
     # Get answers from session
     answers = session.get('answers', [])
     nickname = session.get('nickname', 'Unknown')
     
-    # Calculate construct scores
-    construct_scores = calculate_construct_scores(answers)
-    
-    # Calculate archetype scores
-    archetype_scores = calculate_archetype_scores(construct_scores)
+    # Calculate construct and archetype scores
+    construct_scores, archetype_scores = scores or score_session(answers)
     
     # Determine primary and secondary archetypes
     sorted_archetypes = sorted(archetype_scores, key=lambda x: x['score'], reverse=True)
@@ -149,163 +186,6 @@ def calculate_scores_and_generate_report(session):
     
     return result
 
-def calculate_construct_scores(answers):
-    """Calculate scores for each of the 11 constructs"""
-    
-    # Initialize construct counters
-    construct_counts = {
-        "Need for Cognition": 0,
-        "Actively Open-Minded Thinking": 0,
-        "Epistemic Curiosity": 0,
-        "Tolerance for Ambiguity": 0,
-        "Intellectual Humility": 0,
-        "Trait Emotional Intelligence": 0,
-        "Holistic Thinking Preference": 0,
-        "Experimental Drive": 0,
-        "Deliberative Stance": 0,
-        "Principled Ethics Orientation": 0,
-        "General Trust Propensity": 0
-    }
-    
-    # Map statement IDs to constructs
-    statement_to_construct = get_statement_to_construct_mapping()
-    
-    # Count choices for each construct
-    for answer in answers:
-        chosen_statement_id = answer.get('chosenStatementId')
-        if chosen_statement_id in statement_to_construct:
-            construct = statement_to_construct[chosen_statement_id]
-            construct_counts[construct] += 1
-    
-    # Convert to percentile scores (simplified for MVP)
-    # In a real implementation, these would be based on norm group data
-    construct_scores = []
-    for construct, count in construct_counts.items():
-        # Simple percentile calculation based on max possible score
-        max_possible = 40  # Total questions
-        percentile = min(95, max(5, (count / max_possible) * 100))
-        
-        construct_scores.append({
-            "name": construct,
-            "score": count,
-            "percentile": round(percentile, 1)
-        })
-    
-    return construct_scores
-
-def calculate_archetype_scores(construct_scores):
-    """Calculate archetype scores based on construct scores"""
-    
-    # Create lookup for construct scores
-    construct_lookup = {score['name']: score['score'] for score in construct_scores}
-    
-    # Archetype formulas from the Knowledge Base
-    archetypes = [
-        {
-            "name": "The Critical Interrogator",
-            "formula": [
-                "Need for Cognition",
-                "Actively Open-Minded Thinking", 
-                "Epistemic Curiosity",
-                "Intellectual Humility",
-                "Deliberative Stance"
-            ]
-        },
-        {
-            "name": "The Human-Centric Strategist",
-            "formula": [
-                "Trait Emotional Intelligence",
-                "Holistic Thinking Preference",
-                "Principled Ethics Orientation",
-                "General Trust Propensity"
-            ]
-        },
-        {
-            "name": "The Curious Experimenter",
-            "formula": [
-                "Tolerance for Ambiguity",
-                "Experimental Drive",
-                "Epistemic Curiosity",
-                "Actively Open-Minded Thinking"
-            ]
-        }
-    ]
-    
-    archetype_scores = []
-    for archetype in archetypes:
-        score = sum(construct_lookup.get(construct, 0) for construct in archetype['formula'])
-        # Calculate percentile (simplified for MVP)
-        max_possible = 40  # Total questions
-        percentile = min(95, max(5, (score / max_possible) * 100))
-        
-        archetype_scores.append({
-            "name": archetype['name'],
-            "score": score,
-            "percentile": round(percentile, 1)
-        })
-    
-    return archetype_scores
-
-def get_statement_to_construct_mapping():
-    """Map statement IDs to their corresponding constructs"""
-    return {
-        101: "Need for Cognition",
-        102: "Need for Cognition", 
-        103: "Need for Cognition",
-        104: "Need for Cognition",
-        105: "Need for Cognition",
-        201: "Actively Open-Minded Thinking",
-        202: "Actively Open-Minded Thinking", 
-        203: "Actively Open-Minded Thinking",
-        204: "Actively Open-Minded Thinking",
-        205: "Actively Open-Minded Thinking",
-        301: "Epistemic Curiosity",
-        302: "Epistemic Curiosity",
-        303: "Epistemic Curiosity", 
-        304: "Epistemic Curiosity",
-        305: "Epistemic Curiosity",
-        401: "Tolerance for Ambiguity",
-        402: "Tolerance for Ambiguity",
-        403: "Tolerance for Ambiguity",
-        404: "Tolerance for Ambiguity", 
-        405: "Tolerance for Ambiguity",
-        501: "Intellectual Humility",
-        502: "Intellectual Humility",
-        503: "Intellectual Humility",
-        504: "Intellectual Humility",
-        505: "Intellectual Humility",
-        601: "Trait Emotional Intelligence",
-        602: "Trait Emotional Intelligence",
-        603: "Trait Emotional Intelligence",
-        604: "Trait Emotional Intelligence",
-        605: "Trait Emotional Intelligence",
-        701: "Holistic Thinking Preference",
-        702: "Holistic Thinking Preference",
-        703: "Holistic Thinking Preference",
-        704: "Holistic Thinking Preference",
-        705: "Holistic Thinking Preference",
-        801: "Experimental Drive",
-        802: "Experimental Drive",
-        803: "Experimental Drive",
-        804: "Experimental Drive",
-        805: "Experimental Drive",
-        901: "Deliberative Stance",
-        902: "Deliberative Stance",
-        903: "Deliberative Stance",
-        904: "Deliberative Stance",
-        905: "Deliberative Stance",
-        1001: "Principled Ethics Orientation",
-        1002: "Principled Ethics Orientation",
-        1003: "Principled Ethics Orientation",
-        1004: "Principled Ethics Orientation",
-        1005: "Principled Ethics Orientation",
-        1101: "General Trust Propensity",
-        1102: "General Trust Propensity",
-        1103: "General Trust Propensity",
-        1104: "General Trust Propensity",
-        1105: "General Trust Propensity"
-    }
-
 def create_fallback_report(nickname, primary_archetype, secondary_archetype):
     """Create a comprehensive report for testing"""
     
@@ -368,4 +248,4 @@ Your assessment measured 11 core constructs that contribute to effective AI navi
 **Remember:** This profile reflects your natural tendencies and preferences. Use these insights to understand your strengths and identify areas for growth. Every archetype brings valuable perspectives to AI navigation work.
 
 Your unique combination of traits makes you well-suited for AI navigation challenges that require both analytical rigor and practical application. Focus on leveraging your strengths while developing complementary skills to become a more well-rounded AI navigator.
-""" 
\ No newline at end of file
+""" 
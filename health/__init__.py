@@ -3,6 +3,11 @@ import logging
 import json
 import os
 from datetime import datetime, timezone
+from cosmos_connection import get_connection_stats
+from shared_session_storage import get_storage_stats
+from session_writer import get_writer_stats
+from session_store import get_concurrency_stats
+from change_feed import get_change_feed_stats
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -42,7 +47,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "version": "1.0.0",
             "service": "AI Navigator Profiler API",
-            "environment": os.environ.get('AZURE_FUNCTIONS_ENVIRONMENT', 'local')
+            "environment": os.environ.get('AZURE_FUNCTIONS_ENVIRONMENT', 'local'),
+            "cosmosConnection": get_connection_stats(),
+            "sessionCache": get_storage_stats(),
+            "answerWriter": get_writer_stats(),
+            "sessionConcurrency": get_concurrency_stats(),
+            "changeFeed": get_change_feed_stats()
         }
         
         # Return appropriate status code
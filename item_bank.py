@@ -0,0 +1,153 @@
+# Item bank for the 40-question assessment, compiled once at import
+# Statements and constructs come from section 7.2 of the Knowledge Base and the
+# question order from section 7.1. Everything here is immutable and shared by
+# every handler, so lookups are O(1) index operations with no per-request
+# allocation. Bump ITEM_BANK_VERSION whenever a pair or statement changes;
+# stored answer masks record the version they were encoded against.
+
+import json
+from types import MappingProxyType
+
+ITEM_BANK_VERSION = 1
+TOTAL_QUESTIONS = 40
+
+# Construct index is statement_id // 100 - 1
+CONSTRUCTS = (
+    "Need for Cognition",
+    "Actively Open-Minded Thinking",
+    "Epistemic Curiosity",
+    "Tolerance for Ambiguity",
+    "Intellectual Humility",
+    "Trait Emotional Intelligence",
+    "Holistic Thinking Preference",
+    "Experimental Drive",
+    "Deliberative Stance",
+    "Principled Ethics Orientation",
+    "General Trust Propensity",
+)
+
+# (statement_id, text, social_desirability_score)
+STATEMENTS = (
+    (101, "I enjoy the process of abstract or philosophical thinking.", 5.8),
+    (102, "I get more satisfaction from a challenging mental task than an easy one.", 5.9),
+    (103, "I like to analyze a problem from every angle before making a decision.", 6.4),
+    (104, "I am drawn to tasks that require me to think deeply and concentrate.", 6.2),
+    (105, "I would rather do something that requires a lot of thought than something that is simple.", 5.7),
+    (201, "I enjoy listening to arguments that challenge my current point of view.", 6.8),
+    (202, "I actively look for evidence that might contradict my existing beliefs.", 6.9),
+    (203, "I think it is important to expose myself to opinions I strongly disagree with.", 6.7),
+    (204, "I am willing to change my mind on an important issue when presented with a good argument.", 7.0),
+    (205, "I consider critiques of my ideas as a valuable opportunity to improve them.", 6.6),
+    (301, "When I find a topic interesting, I feel a strong desire to learn everything about it.", 6.4),
+    (302, "The feeling of 'not knowing' something motivates me to find an answer.", 6.2),
+    (303, "I love learning new things just for the sake of learning.", 6.5),
+    (304, "If I hear a new term or concept, I'll often look it up immediately.", 6.0),
+    (305, "I have a wide range of interests and am curious about many things.", 6.3),
+    (401, "I am comfortable moving forward on a project even if all the details aren't finalized.", 5.6),
+    (402, "I prefer jobs where my day-to-day tasks are varied and unpredictable.", 5.3),
+    (403, "Unexpected changes to a plan don't typically fluster me.", 6.1),
+    (404, "I can function well in situations where the rules are not clearly defined.", 5.9),
+    (405, "I find it energizing to work on problems where the final outcome is not yet clear.", 5.7),
+    (501, "I readily accept that my own beliefs could be wrong.", 6.7),
+    (502, "I'm quick to admit when a task is beyond my current expertise.", 6.6),
+    (503, "I am aware that my own knowledge is limited and incomplete.", 6.5),
+    (504, "I am comfortable saying 'I don't know' in a professional setting.", 6.8),
+    (505, "I can listen to criticism about my ideas without getting defensive.", 6.9),
+    (601, "I am good at sensing what others are feeling, even if they don't say it.", 6.3),
+    (602, "I'm good at staying calm under pressure.", 6.7),
+    (603, "I'm often the person others come to for emotional support or advice.", 6.1),
+    (604, "I find it easy to connect with people from different backgrounds.", 6.4),
+    (605, "I am sensitive to the emotional needs of my colleagues.", 6.5),
+    (701, "I like to understand the big picture before diving into the individual components.", 6.2),
+    (702, "I often think about how small changes can impact the entire system.", 6.0),
+    (703, "When planning, I think about the ripple effects of a decision.", 6.4),
+    (704, "To solve a problem, I first try to understand its context and relationships.", 6.3),
+    (705, "I naturally look for how different pieces of a project connect with each other.", 6.1),
+    (801, "My first instinct with a new tool is to start playing with it to see how it works.", 5.5),
+    (802, "I learn best by trying things out for myself.", 5.7),
+    (803, "I enjoy taking things apart to understand how they work.", 5.2),
+    (804, "I'd rather build a quick prototype than spend a long time on a theoretical design.", 5.6),
+    (805, "I like to experiment with different approaches to find the best one.", 6.0),
+    (901, "I tend to pause and think things through rather than relying on my gut instinct.", 6.3),
+    (902, "I double-check my reasoning before committing to a final answer.", 6.5),
+    (903, "I am more of a reflective person than an impulsive one.", 6.1),
+    (904, "My gut feelings are something I check with logic, not something I blindly follow.", 6.4),
+    (905, "I prefer to carefully consider all options before making a choice.", 6.6),
+    (1001, "I feel it's important to stick to principles of fairness, even if it makes things difficult.", 6.8),
+    (1002, "Doing the right thing is more important to me than being popular.", 6.9),
+    (1003, "I believe that rules of fairness should apply to everyone equally, without exception.", 7.0),
+    (1004, "I hold my ethical standards regardless of what others are doing.", 6.7),
+    (1005, "An unfair outcome for others is something I work hard to prevent.", 6.6),
+    (1101, "I tend to trust new colleagues until I have a reason not to.", 5.8),
+    (1102, "I generally assume people are telling the truth.", 5.4),
+    (1103, "I find it easy to place my trust in others on a team.", 5.9),
+    (1104, "I assume that my coworkers are competent and reliable.", 6.0),
+    (1105, "I prefer to rely on the goodwill of others rather than being suspicious.", 5.7),
+)
+
+# (statement A id, statement B id) for questions 1..40, in serving order
+QUESTION_PAIRS = (
+    (103, 604), (204, 1003), (303, 902), (401, 804), (505, 1002),
+    (602, 203), (704, 305), (1104, 805), (901, 601), (504, 1001),
+    (104, 302), (201, 504), (404, 102), (802, 1105), (701, 903),
+    (605, 503), (301, 703), (1004, 602), (202, 505), (403, 705),
+    (105, 405), (801, 1102), (905, 502), (1005, 205), (303, 605),
+    (702, 304), (103, 904), (501, 1004), (201, 504), (402, 803),
+    (1103, 102), (603, 903), (703, 604), (305, 901), (105, 1105),
+    (205, 905), (805, 1104), (405, 802), (1001, 201), (503, 303),
+)
+
+STATEMENT_TEXTS = MappingProxyType({statement_id: text for statement_id, text, _ in STATEMENTS})
+STATEMENT_CONSTRUCTS = MappingProxyType({
+    statement_id: CONSTRUCTS[statement_id // 100 - 1] for statement_id, _, _ in STATEMENTS
+})
+
+# (construct index of A, construct index of B) per question, for vectorised scoring
+QUESTION_CONSTRUCT_INDEX = tuple(
+    (statement_a // 100 - 1, statement_b // 100 - 1) for statement_a, statement_b in QUESTION_PAIRS
+)
+
+# Statement pairs in the shape the API returns; shared, so callers must not mutate them
+_QUESTIONS = tuple(
+    {
+        "A": {"id": statement_a, "text": STATEMENT_TEXTS[statement_a]},
+        "B": {"id": statement_b, "text": STATEMENT_TEXTS[statement_b]}
+    }
+    for statement_a, statement_b in QUESTION_PAIRS
+)
+
+# Pre-serialized get_question response bodies
+QUESTION_JSON = tuple(
+    json.dumps({
+        "questionNumber": index + 1,
+        "totalQuestions": TOTAL_QUESTIONS,
+        "statements": statements
+    }).encode('utf-8')
+    for index, statements in enumerate(_QUESTIONS)
+)
+
+
+def get_question_pair(question_number):
+    """Get the statement pair for a question number (1-based)"""
+    if question_number not in range(1, TOTAL_QUESTIONS + 1):
+        raise ValueError(f"Question number {question_number} not found")
+    return _QUESTIONS[question_number - 1]
+
+
+def get_question_json(question_number):
+    """Get the serialized get_question response body for a question number"""
+    if question_number not in range(1, TOTAL_QUESTIONS + 1):
+        raise ValueError(f"Question number {question_number} not found")
+    return QUESTION_JSON[question_number - 1]
+
+
+def get_construct_for_statement_id(statement_id):
+    """Get the construct name for a given statement ID"""
+    return STATEMENT_CONSTRUCTS.get(statement_id, "Unknown")
+
+
+def get_construct_index(statement_id):
+    """Get the index into CONSTRUCTS for a given statement ID"""
+    if statement_id not in STATEMENT_CONSTRUCTS:
+        raise ValueError(f"Statement {statement_id} not found")
+    return statement_id // 100 - 1
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Copy sessions and contact submissions into the partitioned Cosmos DB layout.
+
+The original layout keeps everything in one container partitioned on /id, so
+every listing, export and analytics query fans out across all partitions. The
+partitioned layout (see session_store.py) stores sessions on a synthetic /pk of
+"<tenant>|<creation month>|<ID bucket>" and moves contact submissions to their
+own container, partitioned on /sessionId.
+
+The source container is read in fixed-size pages. Each page is grouped by
+target partition key and written as transactional batches of create operations,
+with bounded concurrency under a request unit budget. The continuation token is
+checkpointed after every page, so an interrupted run resumes where it stopped.
+Creates never overwrite: a session that the cosmos-dual store already moved
+across on read, and may have changed since, is left as it is. Run it with the
+app on cosmos-dual, then compare the counts and switch to cosmos-partitioned.
+
+Usage:
+    python layout_migration.py [--source sessions] [--target sessions_v2] [--contacts contacts]
+                               [--page-size 500] [--concurrency 8] [--ru-per-second 1000]
+                               [--max-pages N] [--restart]
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import azure.cosmos.exceptions as exceptions
+
+from checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from cosmos_connection import get_container, get_container_name
+from ru_budget import RequestUnitBudget
+from session_store import session_partition_key
+
+JOB_ID = "layout-migration"
+COUNTERS = ("processed", "copied", "existing", "failed")
+
+# Cosmos DB caps a transactional batch at 100 operations
+MAX_BATCH_OPERATIONS = 100
+
+
+def get_migration_settings():
+    """Get containers, page size, concurrency and RU budget from environment or use defaults"""
+    return {
+        "source": os.environ.get('COSMOS_LEGACY_CONTAINER_NAME', 'sessions'),
+        "target": get_container_name(),
+        "contacts": os.environ.get('COSMOS_CONTACTS_CONTAINER_NAME', 'contacts'),
+        "page_size": int(os.environ.get('MIGRATION_PAGE_SIZE', 500)),
+        "concurrency": int(os.environ.get('MIGRATION_CONCURRENCY', 8)),
+        "ru_per_second": float(os.environ.get('MIGRATION_RU_PER_SECOND', 0))
+    }
+
+
+def is_contact(document):
+    # Contacts share the original container and are the only documents with a sessionId
+    return 'sessionId' in document
+
+
+def migrated_document(document):
+    """A source document as written to the partitioned layout: system properties dropped, pk stamped"""
+    migrated = {key: value for key, value in document.items() if not key.startswith('_')}
+    if not is_contact(migrated):
+        migrated['pk'] = session_partition_key(migrated)
+    return migrated
+
+
+class LayoutMigration:
+    """Resumable, rate-limited copy of the original container into the partitioned layout"""
+
+    def __init__(self, source=None, target=None, contacts=None, page_size=None, concurrency=None,
+                 ru_per_second=None, job_id=JOB_ID, progress=None):
+        settings = get_migration_settings()
+        self.source = source if source is not None else get_container(settings["source"])
+        self.target = target if target is not None else get_container(settings["target"])
+        self.contacts = contacts if contacts is not None else get_container(settings["contacts"])
+        if self.source is self.target:
+            raise ValueError("The target container must differ from the source; set COSMOS_CONTAINER_NAME")
+        self.page_size = page_size or settings["page_size"]
+        self.concurrency = max(1, concurrency or settings["concurrency"])
+        self.budget = RequestUnitBudget(settings["ru_per_second"] if ru_per_second is None else ru_per_second)
+        self.job_id = job_id
+        self.progress = progress
+        self._local = threading.local()
+
+    def _record_charge(self, headers, *_):
+        self._local.charge = getattr(self._local, 'charge', 0.0) + float(headers.get('x-ms-request-charge') or 0)
+
+    def _charge(self):
+        self.budget.spend(getattr(self._local, 'charge', 0.0))
+        self._local.charge = 0.0
+
+    def _create(self, container, document):
+        self.budget.wait()
+        try:
+            container.create_item(document, response_hook=self._record_charge)
+            return "copied"
+        except exceptions.CosmosResourceExistsError:
+            return "existing"
+        except Exception as e:
+            logging.error(f"Error copying document {document['id']}: {str(e)}")
+            return "failed"
+        finally:
+            self._charge()
+
+    def _write(self, group):
+        """Write one partition's documents as a transactional batch; returns outcome counts"""
+        container, partition_key, documents = group
+        self.budget.wait()
+        try:
+            container.execute_item_batch(batch_operations=[("create", (document,)) for document in documents],
+                                         partition_key=partition_key, response_hook=self._record_charge)
+            return Counter(copied=len(documents))
+        except exceptions.CosmosBatchOperationError:
+            # Some document is already there (moved across on read); the batch rolled back, so go one by one
+            return Counter(self._create(container, document) for document in documents)
+        except Exception as e:
+            logging.error(f"Error copying partition {partition_key}: {str(e)}")
+            return Counter(failed=len(documents))
+        finally:
+            self._charge()
+
+    def _groups(self, documents):
+        partitions = defaultdict(list)
+        # A transactional batch stays within one logical partition: one ID bucket of one month
+        for document in documents:
+            migrated = migrated_document(document)
+            if is_contact(migrated):
+                partitions[("contacts", migrated['sessionId'])].append(migrated)
+            else:
+                partitions[("sessions", migrated['pk'])].append(migrated)
+        groups = []
+        for (kind, partition_key), members in partitions.items():
+            container = self.contacts if kind == "contacts" else self.target
+            for start in range(0, len(members), MAX_BATCH_OPERATIONS):
+                groups.append((container, partition_key, members[start:start + MAX_BATCH_OPERATIONS]))
+        return groups
+
+    def _pages(self, continuation):
+        pages = self.source.query_items(query="SELECT * FROM c", enable_cross_partition_query=True,
+                                        max_item_count=self.page_size).by_page(continuation)
+        for page in pages:
+            documents = list(page)
+            self._record_charge(self.source.client_connection.last_response_headers or {})
+            yield documents, pages.continuation_token
+
+    def _count(self, container):
+        count = next(iter(container.query_items(query="SELECT VALUE COUNT(1) FROM c",
+                                                enable_cross_partition_query=True)), 0)
+        self._record_charge(container.client_connection.last_response_headers or {})
+        self._charge()
+        return count
+
+    def counts(self):
+        """Document counts of the source and of both target containers, to check before cutover"""
+        return {
+            "sourceCount": self._count(self.source),
+            "targetCount": self._count(self.target) + self._count(self.contacts)
+        }
+
+    def _report(self, state, run_processed, started):
+        elapsed = time.monotonic() - started
+        rate = run_processed / elapsed if elapsed > 0 else 0.0
+        state["throughputPerSecond"] = round(rate, 1)
+        state.update(self.budget.stats())
+        logging.info(f"Layout migration {self.job_id}: {state['processed']} processed, {state['copied']} copied, "
+                     f"{state['existing']} already there, {state['failed']} failed, {rate:.1f}/s")
+        if self.progress:
+            self.progress(dict(state))
+
+    def run(self, max_pages=None, restart=False):
+        """Copy pages until the source is exhausted or max_pages is reached; returns the job state"""
+        state = None if restart else load_checkpoint(self.job_id)
+        if state is None:
+            state = dict.fromkeys(COUNTERS, 0)
+            state.update({"continuation": None, "startedAt": datetime.now(timezone.utc).isoformat()})
+
+        started = time.monotonic()
+        run_processed = 0
+        pages_done = 0
+        state["completed"] = False
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for documents, continuation in self._pages(state["continuation"]):
+                self._charge()
+                for outcomes in executor.map(self._write, self._groups(documents)):
+                    for outcome, count in outcomes.items():
+                        state[outcome] += count
+                state["processed"] += len(documents)
+                run_processed += len(documents)
+                state["continuation"] = continuation
+                state["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                pages_done += 1
+
+                if continuation is None:
+                    state["completed"] = True
+                    break
+                save_checkpoint(self.job_id, state)
+                if max_pages and pages_done >= max_pages:
+                    break
+                self._report(state, run_processed, started)
+            else:
+                state["completed"] = True
+
+        if state["completed"]:
+            state.update(self.counts())
+            clear_checkpoint(self.job_id)
+        self._report(state, run_processed, started)
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy sessions and contacts into the partitioned container layout")
+    parser.add_argument("--source", help="Original container (default COSMOS_LEGACY_CONTAINER_NAME or sessions)")
+    parser.add_argument("--target", help="Partitioned sessions container (default COSMOS_CONTAINER_NAME)")
+    parser.add_argument("--contacts", help="Contacts container (default COSMOS_CONTACTS_CONTAINER_NAME or contacts)")
+    parser.add_argument("--page-size", type=int, help="Documents read per page (default MIGRATION_PAGE_SIZE or 500)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent batches (default MIGRATION_CONCURRENCY or 8)")
+    parser.add_argument("--ru-per-second", type=float, help="Request unit budget, 0 for unlimited")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages; rerun to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    migration = LayoutMigration(source=get_container(args.source) if args.source else None,
+                                target=get_container(args.target) if args.target else None,
+                                contacts=get_container(args.contacts) if args.contacts else None,
+                                page_size=args.page_size, concurrency=args.concurrency,
+                                ru_per_second=args.ru_per_second)
+    state = migration.run(max_pages=args.max_pages, restart=args.restart)
+    print(f"{'Completed' if state['completed'] else 'Paused'}: {state['processed']} processed, "
+          f"{state['copied']} copied, {state['existing']} already there, {state['failed']} failed")
+    if state["completed"]:
+        print(f"Source documents: {state['sourceCount']}, target documents: {state['targetCount']}")
+
+
+if __name__ == "__main__":
+    main()
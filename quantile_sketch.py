@@ -0,0 +1,63 @@
+# Mergeable quantile sketches (DDSketch)
+# A positive value x is counted in bucket ceil(log(x) / log(gamma)), with
+# gamma = (1 + a) / (1 - a) for relative accuracy a. A sketch is a plain
+# {bucket: count} map, so recording a value is one counter increment, sketches
+# merge by adding counts, and a value is taken back by decrementing its bucket.
+# Any quantile read from the counts is within a of the exact value, in memory
+# bounded by the number of buckets rather than the number of values.
+# Values are kept in whole units (seconds, milliseconds); anything up to one
+# unit shares bucket 0, so bucket keys are never negative.
+
+import math
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket_key(value):
+    """The bucket key (a string, usable as a document property name) counting value"""
+    if value is None or value <= 1:
+        return "0"
+    return str(math.ceil(math.log(value) / _LOG_GAMMA))
+
+
+def bucket_value(key):
+    """The representative value of a bucket: within RELATIVE_ACCURACY of every value in it"""
+    return 2 * GAMMA ** int(key) / (GAMMA + 1)
+
+
+def add(sketch, value, count=1):
+    """Count value in sketch, in place; a negative count takes values back"""
+    key = bucket_key(value)
+    sketch[key] = sketch.get(key, 0) + count
+    return sketch
+
+
+def merge(sketches):
+    """Sum any number of sketches into a new one"""
+    merged = {}
+    for sketch in sketches:
+        for key, count in (sketch or {}).items():
+            merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+def quantiles(sketch, qs=(0.5, 0.9, 0.99)):
+    """{"p50": value, ...} for each quantile in qs, or None values for an empty sketch"""
+    buckets = sorted((int(key), count) for key, count in (sketch or {}).items() if count > 0)
+    total = sum(count for _, count in buckets)
+    results = {}
+    for q in qs:
+        name = f"p{round(q * 100):d}"
+        if not total:
+            results[name] = None
+            continue
+        rank = q * (total - 1)
+        seen = 0
+        for index, count in buckets:
+            seen += count
+            if seen > rank:
+                results[name] = bucket_value(index)
+                break
+    return results
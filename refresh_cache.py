@@ -0,0 +1,115 @@
+# In-process cache for slow-changing, expensive results
+# Values are fresh for ttl_seconds. After that they are still served for up to
+# stale_seconds more while one background refresh recomputes them
+# (stale-while-revalidate), so a burst of readers never waits on, or multiplies,
+# the underlying query. A missing or expired value is computed once, and
+# concurrent callers for the same key wait for that single computation.
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Shared by every cache; refreshes are short queries, so a couple of threads suffice
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+
+class CachedValue:
+    """A cached value and when it was computed"""
+
+    __slots__ = ("value", "computed_at", "computed_at_wall")
+
+    def __init__(self, value):
+        self.value = value
+        self.computed_at = time.monotonic()
+        self.computed_at_wall = time.time()
+
+    @property
+    def age(self):
+        return time.monotonic() - self.computed_at
+
+
+class RefreshingCache:
+    """Per-process TTL cache with single-flight computation and background refresh"""
+
+    def __init__(self, name, ttl_seconds, stale_seconds=0.0):
+        self.name = name
+        self.ttl_seconds = float(ttl_seconds)
+        self.stale_seconds = float(stale_seconds)
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "staleHits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    def _compute(self, key, compute, future):
+        try:
+            entry = CachedValue(compute())
+            with self._lock:
+                self._entries[key] = entry
+                self._stats["refreshes"] += 1
+            future.set_result(entry)
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            logging.error(f"Error refreshing {self.name} cache for {key!r}: {str(e)}")
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _start(self, key, compute, background):
+        """Start computing key unless a computation is already running; returns its future"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = Future()
+            self._inflight[key] = future
+        if background:
+            _executor.submit(self._compute, key, compute, future)
+        else:
+            self._compute(key, compute, future)
+        return future
+
+    def get(self, key, compute, force=False):
+        """Return the CachedValue for key, computing or refreshing it as needed
+
+        force recomputes synchronously, but callers arriving while that refresh
+        runs share its result instead of starting their own.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and not force:
+            age = entry.age
+            if age < self.ttl_seconds:
+                with self._lock:
+                    self._stats["hits"] += 1
+                return entry
+            if age < self.ttl_seconds + self.stale_seconds:
+                with self._lock:
+                    self._stats["staleHits"] += 1
+                self._start(key, compute, background=True)
+                return entry
+        with self._lock:
+            self._stats["misses"] += 1
+        return self._start(key, compute, background=False).result()
+
+    def peek(self, key):
+        """The cached value for key without computing or refreshing it, or None"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when none is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        stats.update({"ttlSeconds": self.ttl_seconds, "staleSeconds": self.stale_seconds})
+        return stats
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Bulk re-scoring of completed sessions.
+
+Recomputes the report result stored by generate_report after scoring weights or
+norms change. Completed sessions are streamed from the session store in
+fixed-size pages, each page is scored in one matrix product, and changed
+results are written back with bounded concurrency under a request unit budget.
+The continuation token is checkpointed after every page, so an interrupted run
+resumes where it stopped and memory stays flat whatever the container size.
+
+Usage:
+    python rescoring.py [--page-size 100] [--concurrency 8] [--ru-per-second 400]
+                        [--max-pages N] [--restart]
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from analytics_rollups import record_archetype_changed
+from checkpoints import load_checkpoint, save_checkpoint, clear_checkpoint
+from generate_report import calculate_scores_and_generate_report
+from ru_budget import RequestUnitBudget
+from scoring import choices_from_documents, score_choices, format_scores, get_construct_weights, score_session
+from session_store import get_session_store, ConcurrencyConflict, get_max_conflict_retries, record_conflict
+
+JOB_ID = "rescore-sessions"
+COUNTERS = ("processed", "updated", "unchanged", "skipped", "failed")
+
+
+def get_rescore_settings():
+    """Get page size, concurrency and RU budget from environment or use defaults"""
+    return {
+        "page_size": int(os.environ.get('RESCORE_PAGE_SIZE', 100)),
+        "concurrency": int(os.environ.get('RESCORE_CONCURRENCY', 8)),
+        "ru_per_second": float(os.environ.get('RESCORE_RU_PER_SECOND', 0))
+    }
+
+
+class RescoringJob:
+    """Resumable, rate-limited re-scoring of every completed session with a report"""
+
+    def __init__(self, store=None, page_size=None, concurrency=None, ru_per_second=None,
+                 job_id=JOB_ID, progress=None):
+        settings = get_rescore_settings()
+        self.store = store or get_session_store()
+        self.page_size = page_size or settings["page_size"]
+        self.concurrency = max(1, concurrency or settings["concurrency"])
+        self.budget = RequestUnitBudget(settings["ru_per_second"] if ru_per_second is None else ru_per_second)
+        self.job_id = job_id
+        self.progress = progress
+        self.weights = None
+
+    def _charge(self):
+        self.budget.spend(self.store.consume_request_charge())
+
+    def _rescored_result(self, document, scores):
+        result = calculate_scores_and_generate_report(document, scores)
+        previous = document.get('result') or {}
+        if result['scores'] == previous.get('scores') and result['primaryArchetype'] == previous.get('primaryArchetype'):
+            return None
+        return result
+
+    def _write(self, item):
+        document, result = item
+        max_retries = get_max_conflict_retries()
+        for attempt in range(max_retries + 1):
+            if result is None:
+                return "unchanged"
+            self.budget.wait()
+            try:
+                updated = self.store.update_fields(
+                    document['id'], {"result": result, "rescoredAt": datetime.now(timezone.utc).isoformat()},
+                    session=document)
+                if updated is None:
+                    return "skipped"
+                record_archetype_changed(document, (document.get('result') or {}).get('primaryArchetype'),
+                                         result['primaryArchetype'])
+                return "updated"
+            except ConcurrencyConflict:
+                record_conflict(retrying=attempt < max_retries)
+                # Someone changed the session (e.g. reset it); score the latest version instead
+                document = self.store.get_session(document['id'])
+                if not document or document.get('status') != 'Completed' or not document.get('result'):
+                    return "skipped"
+                result = self._rescored_result(document, score_session(document.get('answers', []), self.weights))
+            except Exception as e:
+                logging.error(f"Error re-scoring session {document['id']}: {str(e)}")
+                return "failed"
+            finally:
+                self._charge()
+        return "failed"
+
+    def _score_page(self, documents):
+        documents = [document for document in documents if document.get('result')]
+        if not documents:
+            return []
+        construct_scores, archetype_scores = score_choices(choices_from_documents(documents), self.weights)
+        return [
+            (document, self._rescored_result(document, format_scores(construct_row, archetype_row)))
+            for document, construct_row, archetype_row in zip(documents, construct_scores, archetype_scores)
+        ]
+
+    def _report(self, state, run_processed, started):
+        elapsed = time.monotonic() - started
+        rate = run_processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, (state.get("total") or 0) - state["processed"])
+        state["throughputPerSecond"] = round(rate, 1)
+        state["etaSeconds"] = round(remaining / rate) if rate else None
+        state.update(self.budget.stats())
+        logging.info(f"Re-scoring {self.job_id}: {state['processed']}/{state.get('total')} processed, "
+                     f"{state['updated']} updated, {rate:.1f}/s, ETA {state['etaSeconds']}s")
+        if self.progress:
+            self.progress(dict(state))
+
+    def run(self, max_pages=None, restart=False):
+        """Process pages until the store is exhausted or max_pages is reached; returns the job state"""
+        self.weights = get_construct_weights()
+        state = None if restart else load_checkpoint(self.job_id)
+        if state is None:
+            state = dict.fromkeys(COUNTERS, 0)
+            state.update({"continuation": None, "startedAt": datetime.now(timezone.utc).isoformat()})
+            state["total"] = self.store.count_sessions(status='Completed')
+            self._charge()
+
+        started = time.monotonic()
+        run_processed = 0
+        pages_done = 0
+        state["completed"] = False
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for documents, continuation in self.store.iter_session_pages(
+                    status='Completed', page_size=self.page_size, continuation=state["continuation"]):
+                self._charge()
+                for outcome in executor.map(self._write, self._score_page(documents)):
+                    state[outcome] += 1
+                state["skipped"] += sum(1 for document in documents if not document.get('result'))
+                state["processed"] += len(documents)
+                run_processed += len(documents)
+                state["continuation"] = continuation
+                state["updatedAt"] = datetime.now(timezone.utc).isoformat()
+                pages_done += 1
+
+                if continuation is None:
+                    state["completed"] = True
+                    break
+                save_checkpoint(self.job_id, state)
+                if max_pages and pages_done >= max_pages:
+                    break
+                self._report(state, run_processed, started)
+            else:
+                state["completed"] = True
+
+        self._report(state, run_processed, started)
+        if state["completed"]:
+            clear_checkpoint(self.job_id)
+        return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score completed sessions with the current scoring weights")
+    parser.add_argument("--page-size", type=int, help="Sessions read per page (default RESCORE_PAGE_SIZE or 100)")
+    parser.add_argument("--concurrency", type=int, help="Concurrent writes (default RESCORE_CONCURRENCY or 8)")
+    parser.add_argument("--ru-per-second", type=float, help="Request unit budget, 0 for unlimited")
+    parser.add_argument("--max-pages", type=int, help="Stop after this many pages; rerun to resume")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    job = RescoringJob(page_size=args.page_size, concurrency=args.concurrency, ru_per_second=args.ru_per_second)
+    state = job.run(max_pages=args.max_pages, restart=args.restart)
+    print(f"{'Completed' if state['completed'] else 'Paused'}: {state['processed']} processed, "
+          f"{state['updated']} updated, {state['unchanged']} unchanged, {state['skipped']} skipped, "
+          f"{state['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Request unit budget for bulk jobs
+# A token bucket in Cosmos DB request units: workers call wait() before a request
+# and spend() with the charge the request actually reported, so a job never
+# sustains more than ru_per_second and leaves throughput for live traffic.
+# A budget of 0 (or None) never waits.
+# AdaptiveRequestUnitBudget treats its rate as a ceiling: a 429 halves the rate,
+# and it climbs back linearly, reaching the ceiling again after recovery_seconds
+# without throttling.
+
+import threading
+import time
+
+
+class RequestUnitBudget:
+    """Token bucket limiting the request units a job consumes per second"""
+
+    def __init__(self, ru_per_second=None, burst_seconds=1.0):
+        self.ru_per_second = float(ru_per_second or 0)
+        self.burst_seconds = burst_seconds
+        self.capacity = self.ru_per_second * burst_seconds
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.consumed = 0.0
+        self.waited_seconds = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.ru_per_second)
+        self._updated = now
+
+    def wait(self):
+        """Block until the budget is no longer overdrawn"""
+        if not self.ru_per_second:
+            return
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens > 0:
+                    return
+                delay = -self._tokens / self.ru_per_second
+                self.waited_seconds += delay
+            time.sleep(delay)
+
+    def spend(self, request_units):
+        """Charge the request units a completed request reported"""
+        with self._lock:
+            self.consumed += request_units
+            if self.ru_per_second:
+                self._refill()
+                self._tokens -= request_units
+
+    def throttled(self):
+        """Note a 429 from the service; a fixed budget leaves backing off to the caller"""
+
+    def stats(self):
+        return {
+            "ruPerSecond": self.ru_per_second or None,
+            "consumedRequestUnits": round(self.consumed, 2),
+            "throttledSeconds": round(self.waited_seconds, 2)
+        }
+
+
+class AdaptiveRequestUnitBudget(RequestUnitBudget):
+    """Token bucket whose rate halves on throttling and recovers linearly up to a ceiling"""
+
+    def __init__(self, ceiling, floor=None, recovery_seconds=60.0, burst_seconds=1.0):
+        super().__init__(ceiling, burst_seconds)
+        self.ceiling = float(ceiling)
+        self.floor = float(floor) if floor else self.ceiling / 20
+        self.recovery_seconds = recovery_seconds
+        self.throttles = 0
+        self._adjusted = time.monotonic()
+
+    def _set_rate(self, ru_per_second):
+        self.ru_per_second = ru_per_second
+        self.capacity = ru_per_second * self.burst_seconds
+        self._tokens = min(self._tokens, self.capacity)
+
+    def _recover(self):
+        now = time.monotonic()
+        if self.ru_per_second < self.ceiling:
+            recovered = (now - self._adjusted) * self.ceiling / self.recovery_seconds
+            self._set_rate(min(self.ceiling, self.ru_per_second + recovered))
+        self._adjusted = now
+
+    def wait(self):
+        with self._lock:
+            self._recover()
+        super().wait()
+
+    def throttled(self):
+        with self._lock:
+            self._refill()
+            self.throttles += 1
+            self._set_rate(max(self.floor, self.ru_per_second / 2))
+            self._adjusted = time.monotonic()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({"ruCeiling": self.ceiling, "throttles": self.throttles})
+        return stats
@@ -0,0 +1,172 @@
+# Vectorised scoring engine
+# Scoring is a chain of fixed incidence matrices built once from the item bank:
+#   choices (N x 80: question 1..40 picked A, then picked B)
+#     -> statements (80 x 55) -> constructs (55 x 11) -> archetypes (11 x 3)
+# so one session or a million are scored with the same matrix products.
+# Construct weights default to 1.0 (the MVP weights in the Knowledge Base) and
+# can be overridden with SCORING_CONSTRUCT_WEIGHTS, a JSON object mapping
+# construct name to weight.
+
+import json
+import os
+
+import numpy as np
+
+from item_bank import CONSTRUCTS, STATEMENTS, QUESTION_PAIRS, TOTAL_QUESTIONS
+
+UNANSWERED = -1
+
+# Archetype formulas from the Knowledge Base
+ARCHETYPES = (
+    ("The Critical Interrogator", (
+        "Need for Cognition",
+        "Actively Open-Minded Thinking",
+        "Epistemic Curiosity",
+        "Intellectual Humility",
+        "Deliberative Stance"
+    )),
+    ("The Human-Centric Strategist", (
+        "Trait Emotional Intelligence",
+        "Holistic Thinking Preference",
+        "Principled Ethics Orientation",
+        "General Trust Propensity"
+    )),
+    ("The Curious Experimenter", (
+        "Tolerance for Ambiguity",
+        "Experimental Drive",
+        "Epistemic Curiosity",
+        "Actively Open-Minded Thinking"
+    )),
+)
+ARCHETYPE_NAMES = tuple(name for name, _ in ARCHETYPES)
+
+_STATEMENT_INDEX = {statement_id: index for index, (statement_id, _, _) in enumerate(STATEMENTS)}
+
+
+def _build_matrices():
+    choice_statement = np.zeros((2 * TOTAL_QUESTIONS, len(STATEMENTS)), dtype=np.float64)
+    for question_index, (statement_a, statement_b) in enumerate(QUESTION_PAIRS):
+        choice_statement[question_index, _STATEMENT_INDEX[statement_a]] = 1.0
+        choice_statement[TOTAL_QUESTIONS + question_index, _STATEMENT_INDEX[statement_b]] = 1.0
+
+    statement_construct = np.zeros((len(STATEMENTS), len(CONSTRUCTS)), dtype=np.float64)
+    for index, (statement_id, _, _) in enumerate(STATEMENTS):
+        statement_construct[index, statement_id // 100 - 1] = 1.0
+
+    construct_archetype = np.zeros((len(CONSTRUCTS), len(ARCHETYPES)), dtype=np.float64)
+    for archetype_index, (_, formula) in enumerate(ARCHETYPES):
+        for construct in formula:
+            construct_archetype[CONSTRUCTS.index(construct), archetype_index] = 1.0
+
+    for matrix in (choice_statement, statement_construct, construct_archetype):
+        matrix.setflags(write=False)
+    return choice_statement, statement_construct, construct_archetype
+
+
+CHOICE_STATEMENT, STATEMENT_CONSTRUCT, CONSTRUCT_ARCHETYPE = _build_matrices()
+# Choices straight to constructs, the product used on the hot path
+CHOICE_CONSTRUCT = CHOICE_STATEMENT @ STATEMENT_CONSTRUCT
+CHOICE_CONSTRUCT.setflags(write=False)
+
+
+def get_construct_weights():
+    """Get per-construct weights from environment, defaulting every construct to 1.0"""
+    weights = np.ones(len(CONSTRUCTS), dtype=np.float64)
+    overrides = os.environ.get('SCORING_CONSTRUCT_WEIGHTS')
+    if overrides:
+        for construct, weight in json.loads(overrides).items():
+            if construct not in CONSTRUCTS:
+                raise ValueError(f"Unknown construct in SCORING_CONSTRUCT_WEIGHTS: {construct}")
+            weights[CONSTRUCTS.index(construct)] = float(weight)
+    return weights
+
+
+def choices_from_answers(answers):
+    """Turn answer records into a length-40 choice vector (0 = A, 1 = B, -1 = unanswered)"""
+    choices = np.full(TOTAL_QUESTIONS, UNANSWERED, dtype=np.int8)
+    for answer in answers:
+        question_number = answer.get('questionNumber')
+        chosen_statement_id = answer.get('chosenStatementId')
+        if question_number in range(1, TOTAL_QUESTIONS + 1) and chosen_statement_id in ('A', 'B'):
+            choices[question_number - 1] = 1 if chosen_statement_id == 'B' else 0
+    return choices
+
+
+def choices_from_masks(masks, counts):
+    """Build an N x 40 choice matrix from packed answer masks and answer counts"""
+    masks = np.asarray(masks, dtype=np.int64).reshape(-1, 1)
+    counts = np.asarray(counts, dtype=np.int64).reshape(-1, 1)
+    positions = np.arange(TOTAL_QUESTIONS, dtype=np.int64)
+    choices = ((masks >> positions) & 1).astype(np.int8)
+    choices[positions >= counts] = UNANSWERED
+    return choices
+
+
+def choices_from_documents(documents):
+    """Build an N x 40 choice matrix from stored session documents of either answer format"""
+    choices = np.full((len(documents), TOTAL_QUESTIONS), UNANSWERED, dtype=np.int8)
+    packed_rows, masks, counts = [], [], []
+    for row, document in enumerate(documents):
+        packed = document.get('answersPacked')
+        if isinstance(packed, dict) and packed.get('n', 0) >= len(document.get('answers') or []):
+            packed_rows.append(row)
+            masks.append(packed.get('mask', 0))
+            counts.append(packed.get('n', 0))
+        else:
+            choices[row] = choices_from_answers(document.get('answers') or [])
+    if packed_rows:
+        choices[packed_rows] = choices_from_masks(masks, counts)
+    return choices
+
+
+def score_choices(choices, weights=None):
+    """Score an N x 40 (or length-40) choice matrix
+
+    Returns (construct_scores, archetype_scores) as N x 11 and N x 3 arrays of
+    weighted scores.
+    """
+    choices = np.atleast_2d(np.asarray(choices, dtype=np.int8))
+    selected = np.concatenate((choices == 0, choices == 1), axis=1).astype(np.float64)
+    construct_scores = selected @ CHOICE_CONSTRUCT
+    construct_scores *= get_construct_weights() if weights is None else weights
+    archetype_scores = construct_scores @ CONSTRUCT_ARCHETYPE
+    return construct_scores, archetype_scores
+
+
+def percentiles(scores):
+    """Simplified MVP percentile: share of the 40 questions, clamped to 5..95
+
+    A real norm group will replace this once enough sessions are scored.
+    """
+    return np.clip(np.asarray(scores) / TOTAL_QUESTIONS * 100, 5, 95)
+
+
+def _as_number(value):
+    value = round(float(value), 2)
+    return int(value) if value.is_integer() else value
+
+
+def format_scores(construct_row, archetype_row):
+    """Turn one row of construct and archetype scores into the lists stored on the report"""
+    construct_percentiles, archetype_percentiles = percentiles(construct_row), percentiles(archetype_row)
+    return (
+        [
+            {"name": name, "score": _as_number(score), "percentile": round(float(percentile), 1)}
+            for name, score, percentile in zip(CONSTRUCTS, construct_row, construct_percentiles)
+        ],
+        [
+            {"name": name, "score": _as_number(score), "percentile": round(float(percentile), 1)}
+            for name, score, percentile in zip(ARCHETYPE_NAMES, archetype_row, archetype_percentiles)
+        ]
+    )
+
+
+def score_session(answers, weights=None):
+    """Score one session's answers into the construct and archetype lists stored on the report"""
+    construct_scores, archetype_scores = score_choices(choices_from_answers(answers), weights)
+    return format_scores(construct_scores[0], archetype_scores[0])
+
+
+def primary_archetypes(archetype_scores):
+    """Index of the highest archetype score per row; ties go to the first archetype"""
+    return np.argmax(np.atleast_2d(archetype_scores), axis=1)
@@ -0,0 +1,112 @@
+import azure.functions as func
+import logging
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any
+from bulk_reset import reset_sessions, iter_matching_ids, get_bulk_reset_settings
+from session_store import get_session_store
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Bulk Session Reset API - Development/testing endpoint to reset many sessions, e.g. load-test fixtures
+
+    POST /api/admin/sessions/reset
+    Body (JSON), either:
+    - sessionIds: List of session IDs to reset
+    or a filter:
+    - status (optional): Only sessions with this status ('InProgress' or 'Completed')
+    - idPrefix (optional): Only sessions whose ID starts with this prefix
+    - limit (optional): Reset at most this many matching sessions (default and maximum: BULK_RESET_MAX_SESSIONS)
+    Query Parameters:
+    - concurrency (optional): Concurrent resets, at most BULK_RESET_CONCURRENCY (default: BULK_RESET_CONCURRENCY or 32)
+    Returns: 200 OK with counts and a result per session ID
+    """
+    logging.info('Python HTTP trigger function processed a request.')
+
+    try:
+        try:
+            body = req.get_json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return func.HttpResponse(
+                json.dumps({"error": "Request body must be a JSON object"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        settings = get_bulk_reset_settings()
+        session_ids = body.get('sessionIds')
+        status = body.get('status')
+        id_prefix = body.get('idPrefix')
+        try:
+            limit = int(body.get('limit', settings["max_sessions"]))
+            concurrency = req.params.get('concurrency')
+            concurrency = int(concurrency) if concurrency else None
+        except (TypeError, ValueError):
+            return func.HttpResponse(
+                json.dumps({"error": "limit and concurrency must be integers"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        # Validate parameters
+        if session_ids is not None and (not isinstance(session_ids, list)
+                                        or not all(isinstance(session_id, str) and session_id
+                                                   for session_id in session_ids)):
+            return func.HttpResponse(
+                json.dumps({"error": "sessionIds must be a list of session IDs"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if session_ids is None and not (status or id_prefix):
+            return func.HttpResponse(
+                json.dumps({"error": "Give sessionIds, or a status and/or idPrefix filter"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if status and status not in ['InProgress', 'Completed']:
+            return func.HttpResponse(
+                json.dumps({"error": "Status must be 'InProgress' or 'Completed'"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if limit < 1 or limit > settings["max_sessions"] or (session_ids and len(session_ids) > settings["max_sessions"]):
+            return func.HttpResponse(
+                json.dumps({"error": f"At most {settings['max_sessions']} sessions can be reset per request"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if concurrency is not None and concurrency < 1:
+            return func.HttpResponse(
+                json.dumps({"error": "concurrency must be at least 1"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        store = get_session_store()
+        if session_ids is None:
+            session_ids = list(iter_matching_ids(store, status, id_prefix, limit))
+
+        # A request may lower the configured concurrency, never raise it
+        concurrency = min(concurrency or settings["concurrency"], settings["concurrency"])
+        summary = reset_sessions(session_ids, store=store, concurrency=concurrency)
+        logging.info(f"Bulk reset: {summary['reset']} reset, {summary['notFound']} not found, "
+                     f"{summary['failed']} failed in {summary['elapsedSeconds']}s")
+
+        response_data = dict(summary, timestamp=datetime.now(timezone.utc).isoformat())
+
+        return func.HttpResponse(
+            json.dumps(response_data, indent=2),
+            status_code=200,
+            mimetype="application/json"
+        )
+
+    except Exception as e:
+        logging.error(f"Error in session_bulk_reset: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal server error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
@@ -0,0 +1,18 @@
+import azure.functions as func
+import logging
+import json
+from change_feed import apply_cosmos_changes
+
+def main(documents: func.DocumentList) -> None:
+    """
+    Session Change Feed - Cosmos DB trigger projecting session and contact changes
+
+    Triggered by inserts and updates in the sessions container; the runtime keeps
+    leases and checkpoints in the leases container and redelivers a batch that fails.
+    """
+    if not documents:
+        return
+
+    changes = [json.loads(document.to_json()) for document in documents]
+    applied, skipped = apply_cosmos_changes(changes)
+    logging.info(f"Projected {applied} session changes ({skipped} already applied)")
@@ -4,10 +4,8 @@ import json
 import os
 from datetime import datetime, timezone, timedelta
 from typing import Dict, Any, List
-
-# Azure SDK imports
-import azure.cosmos.cosmos_client as cosmos_client
-import azure.cosmos.exceptions as exceptions
+from cleanup_job import CleanupJob, CLEANUP_STATUSES
+from session_store import LayoutCutoverInProgress
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -17,8 +15,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
     Query Parameters:
     - days (optional): Sessions older than this many days (default: 30)
     - status (optional): Only clean sessions with this status (InProgress, Completed)
-    - dry_run (optional): If true, only return what would be deleted (default: false)
-    Returns: 200 OK with cleanup results
+    - dry_run (optional): If true, only count what would be deleted and return a sample (default: false)
+    - sample (optional): Sessions in the dry-run sample (default: CLEANUP_SAMPLE_SIZE or 20)
+    - pages (optional): Stop after this many pages (default: run until CLEANUP_MAX_SECONDS)
+    - restart (optional): If true, ignore the saved checkpoint and start over (default: false)
+    Returns: 200 OK with cleanup results; while "completed" is false, call again to resume.
+    409 during the cosmos-dual layout cutover, when sessions span two containers
     """
     logging.info('Python HTTP trigger function processed a request.')
     
@@ -27,6 +29,11 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         days = int(req.params.get('days', 30))
         status_filter = req.params.get('status')
         dry_run = req.params.get('dry_run', 'false').lower() == 'true'
+        pages = req.params.get('pages')
+        pages = int(pages) if pages else None
+        sample = req.params.get('sample')
+        sample = int(sample) if sample else None
+        restart = req.params.get('restart', 'false').lower() == 'true'
         
         # Validate parameters
         if days < 1:
@@ -36,38 +43,58 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
         
-        if status_filter and status_filter not in ['InProgress', 'Completed']:
+        if status_filter and status_filter not in CLEANUP_STATUSES:
             return func.HttpResponse(
                 json.dumps({"error": "Status must be 'InProgress' or 'Completed'"}),
                 status_code=400,
                 mimetype="application/json"
             )
-
-        # Initialize Cosmos DB client
-        cosmos_client_instance = get_cosmos_client()
-
-        # Calculate cutoff date
-        cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
         
-        # Find sessions to clean up
-        sessions_to_cleanup = find_sessions_to_cleanup(cosmos_client_instance, cutoff_date, status_filter)
+        if pages is not None and pages < 1:
+            return func.HttpResponse(
+                json.dumps({"error": "pages must be at least 1"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+
+        try:
+            job = CleanupJob(days=days, status=status_filter)
+        except LayoutCutoverInProgress as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e)}),
+                status_code=409,
+                mimetype="application/json"
+            )
         
         if dry_run:
-            # Return what would be deleted
+            # Return a count and a bounded sample of what would be deleted
+            try:
+                preview = job.preview(sample)
+            except ValueError as e:
+                return func.HttpResponse(
+                    json.dumps({"error": str(e)}),
+                    status_code=400,
+                    mimetype="application/json"
+                )
             response_data = {
                 "dry_run": True,
-                "sessions_found": len(sessions_to_cleanup),
-                "cutoff_date": cutoff_date.isoformat(),
-                "sessions": sessions_to_cleanup
+                "sessions_found": preview["found"],
+                "cutoff_date": preview["cutoff"],
+                "sample": preview["sample"]
             }
         else:
-            # Actually delete the sessions
-            deleted_count = delete_sessions(cosmos_client_instance, sessions_to_cleanup)
+            # Run a bounded slice of the job so the request stays within the function timeout
+            state = job.run(max_pages=pages, restart=restart)
             
             response_data = {
                 "dry_run": False,
-                "sessions_deleted": deleted_count,
-                "cutoff_date": cutoff_date.isoformat(),
+                "completed": state["completed"],
+                "sessions_processed": state["processed"],
+                "sessions_deleted": state["deleted"],
+                "sessions_failed": state["failed"],
+                "throttled_requests": state["throttled"],
+                "elapsed_seconds": state["elapsedSeconds"],
+                "cutoff_date": state["cutoff"],
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
 
@@ -84,86 +111,3 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             status_code=500,
             mimetype="application/json"
         )
-
-def get_cosmos_client():
-    """Initialize and return Cosmos DB client"""
-    cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
-    cosmos_key = os.environ.get('COSMOS_KEY')
-    
-    if not cosmos_endpoint or not cosmos_key:
-        raise ValueError("Cosmos DB credentials not configured")
-    
-    return cosmos_client.CosmosClient(cosmos_endpoint, cosmos_key)
-
-def get_database_name():
-    """Get database name from environment or use default"""
-    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
-
-def get_container_name():
-    """Get container name from environment or use default"""
-    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
-
-def find_sessions_to_cleanup(cosmos_client_instance, cutoff_date, status_filter=None):
-    """Find sessions that should be cleaned up"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Build query based on filters
-        if status_filter:
-            query = "SELECT * FROM c WHERE c.createdAt < @cutoff_date AND c.status = @status"
-            parameters = [
-                {"name": "@cutoff_date", "value": cutoff_date.isoformat()},
-                {"name": "@status", "value": status_filter}
-            ]
-        else:
-            query = "SELECT * FROM c WHERE c.createdAt < @cutoff_date"
-            parameters = [{"name": "@cutoff_date", "value": cutoff_date.isoformat()}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        
-        # Format sessions for response
-        sessions = []
-        for item in items:
-            sessions.append({
-                "id": item.get('id'),
-                "nickname": item.get('nickname'),
-                "status": item.get('status'),
-                "createdAt": item.get('createdAt'),
-                "completedAt": item.get('completedAt'),
-                "answersCount": len(item.get('answers', []))
-            })
-        
-        return sessions
-        
-    except Exception as e:
-        logging.error(f"Error finding sessions to cleanup: {str(e)}")
-        return []
-
-def delete_sessions(cosmos_client_instance, sessions):
-    """Delete sessions from Cosmos DB"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        deleted_count = 0
-        for session in sessions:
-            try:
-                container.delete_item(item=session['id'], partition_key=session['id'])
-                deleted_count += 1
-                logging.info(f"Deleted session {session['id']} ({session['nickname']})")
-            except Exception as e:
-                logging.error(f"Error deleting session {session['id']}: {str(e)}")
-                continue
-        
-        return deleted_count
-        
-    except Exception as e:
-        logging.error(f"Error deleting sessions: {str(e)}")
-        return 0 
\ No newline at end of file
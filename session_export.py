@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Streaming export of session rows as NDJSON or CSV.
+
+Sessions are read from the session store one page at a time and flow through
+generators, from the page query to the encoded output line, so memory stays at
+one page whatever the number of sessions. On Cosmos DB the filters and the
+projection of the exported fields run in the query itself. The other backends
+walk their own pages and filter in process.
+
+A continuation token names the page to resume from. The HTTP endpoint serves
+one bounded page per request and returns the token in X-Continuation-Token.
+The CLI follows the tokens itself and writes every page as it arrives.
+
+Usage:
+    python session_export.py [--format ndjson|csv] [--output FILE] [--gzip]
+                             [--status STATUS] [--from DATE] [--to DATE]
+                             [--archetype NAME] [--page-size 1000]
+"""
+
+import argparse
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from answer_codec import ANSWERS_COUNT_SQL, count_answers
+from session_store import CosmosSessionStore, DualReadCosmosSessionStore, get_session_store
+
+EXPORT_FIELDS = ("id", "nickname", "status", "createdAt", "completedAt", "completionDurationSeconds",
+                 "reportFirstViewedAt", "answersCount", "primaryArchetype", "secondaryArchetype")
+EXPORT_SELECT = (
+    "c.id, c.nickname, c.status, c.createdAt, c.completedAt, c.completionDurationSeconds, c.reportFirstViewedAt, "
+    f"{ANSWERS_COUNT_SQL} AS answersCount, "
+    "c.result.primaryArchetype AS primaryArchetype, c.result.secondaryArchetype AS secondaryArchetype"
+)
+
+
+def get_export_settings():
+    """Get page size limits and the per-request time budget from environment or use defaults"""
+    return {
+        "page_size": int(os.environ.get('EXPORT_PAGE_SIZE', 1000)),
+        "max_page_size": int(os.environ.get('EXPORT_MAX_PAGE_SIZE', 5000)),
+        "request_seconds": float(os.environ.get('EXPORT_REQUEST_SECONDS', 10))
+    }
+
+
+def _normalize_timestamp(value):
+    """ISO date or timestamp as a UTC isoformat string comparable with createdAt"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+
+def parse_filters(status=None, date_from=None, date_to=None, archetype=None):
+    """Validated export filters; dates select createdAt >= from and < to. Raises ValueError"""
+    try:
+        filters = {
+            "status": status or None,
+            "from": _normalize_timestamp(date_from) if date_from else None,
+            "to": _normalize_timestamp(date_to) if date_to else None,
+            "archetype": archetype or None
+        }
+    except ValueError:
+        raise ValueError("from and to must be ISO dates or timestamps")
+    if filters["from"] and filters["to"] and filters["from"] >= filters["to"]:
+        raise ValueError("from must be earlier than to")
+    return filters
+
+
+def build_export_query(filters):
+    """Cosmos DB query and parameters projecting the export fields of matching sessions"""
+    conditions = [CosmosSessionStore.SESSIONS_FILTER]
+    parameters = []
+    for name, condition in (("status", "c.status = @status"), ("from", "c.createdAt >= @from"),
+                            ("to", "c.createdAt < @to"), ("archetype", "c.result.primaryArchetype = @archetype")):
+        if filters.get(name):
+            conditions.append(condition)
+            parameters.append({"name": f"@{name}", "value": filters[name]})
+    return f"SELECT {EXPORT_SELECT} FROM c WHERE {' AND '.join(conditions)}", parameters
+
+
+def matches(document, filters):
+    """Whether a stored session document passes the filters"""
+    created_at = document.get('createdAt') or ''
+    result = document.get('result') or {}
+    return ((not filters.get("status") or document.get('status') == filters["status"])
+            and (not filters.get("from") or created_at >= filters["from"])
+            and (not filters.get("to") or created_at < filters["to"])
+            and (not filters.get("archetype") or result.get('primaryArchetype') == filters["archetype"]))
+
+
+def export_row(document):
+    """The exported fields of a stored session document"""
+    result = document.get('result') or {}
+    row = {field: document.get(field) for field in EXPORT_FIELDS}
+    row.update({"answersCount": count_answers(document),
+                "primaryArchetype": result.get('primaryArchetype'),
+                "secondaryArchetype": result.get('secondaryArchetype')})
+    return row
+
+
+def iter_export_pages(filters, page_size=1000, continuation=None, store=None):
+    """Yield (rows, continuation) pages of matching sessions; continuation is None after the last page"""
+    store = store or get_session_store()
+    # During the cutover sessions span two containers, so the store's own page scan covers both
+    if isinstance(store, CosmosSessionStore) and not isinstance(store, DualReadCosmosSessionStore):
+        query, parameters = build_export_query(filters)
+        pages = store.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True,
+                                            max_item_count=page_size).by_page(continuation)
+        for page in pages:
+            # Undefined properties are left out of a projection, so fill every exported field
+            rows = [{field: item.get(field) for field in EXPORT_FIELDS} for item in page]
+            yield rows, pages.continuation_token
+        return
+    for documents, next_continuation in store.iter_session_pages(filters.get("status"), page_size, continuation):
+        yield [export_row(document) for document in documents if matches(document, filters)], next_continuation
+
+
+def iter_export_rows(filters, page_size=1000, continuation=None, store=None):
+    """Yield every matching session row, one page in memory at a time"""
+    for rows, _ in iter_export_pages(filters, page_size, continuation, store):
+        yield from rows
+
+
+def read_export_page(filters, limit, continuation=None, store=None, max_seconds=None):
+    """Read at least limit rows, or as many as max_seconds allows; returns (rows, continuation)
+
+    Stops on a store page boundary, so the continuation resumes exactly after the
+    rows returned. Local backends filter in process, where a selective filter can
+    need many store pages to fill one export page.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    collected = []
+    next_continuation = None
+    for rows, next_continuation in iter_export_pages(filters, limit, continuation, store):
+        collected.extend(rows)
+        if len(collected) >= limit or (deadline and time.monotonic() >= deadline):
+            break
+    return collected, next_continuation
+
+
+def ndjson_lines(rows, header=True):
+    """Encode rows as newline-delimited JSON; NDJSON has no header"""
+    for row in rows:
+        yield json.dumps(row, separators=(',', ':')) + "\n"
+
+
+def csv_lines(rows, header=True):
+    """Encode rows as CSV lines, starting with the header line unless header is False"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore', lineterminator="\n")
+    if header:
+        writer.writeheader()
+        yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+    "csv": (csv_lines, "text/csv")
+}
+
+
+def _filters_fingerprint(filters):
+    return hashlib.sha256(json.dumps(filters, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_export_token(continuation, filters):
+    """Opaque, URL-safe export token; bound to the filters it was issued for"""
+    if continuation is None:
+        return None
+    payload = json.dumps([continuation, _filters_fingerprint(filters)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_export_token(token, filters):
+    """Store continuation from an export token; raises ValueError if malformed or issued for other filters"""
+    if not token:
+        return None
+    try:
+        continuation, fingerprint = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except Exception:
+        raise ValueError("Invalid continuation token")
+    if fingerprint != _filters_fingerprint(filters):
+        raise ValueError("Continuation token was issued for different filters")
+    return continuation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export sessions as NDJSON or CSV")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="ndjson", help="Output format")
+    parser.add_argument("--output", help="Output file (default stdout); a .gz suffix implies --gzip")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+    parser.add_argument("--status", help="Only sessions with this status")
+    parser.add_argument("--from", dest="date_from", help="Only sessions created at or after this ISO date")
+    parser.add_argument("--to", dest="date_to", help="Only sessions created before this ISO date")
+    parser.add_argument("--archetype", help="Only sessions with this primary archetype")
+    parser.add_argument("--page-size", type=int, help="Sessions read per page (default EXPORT_PAGE_SIZE or 1000)")
+    args = parser.parse_args()
+
+    try:
+        filters = parse_filters(args.status, args.date_from, args.date_to, args.archetype)
+    except ValueError as e:
+        parser.error(str(e))
+    page_size = args.page_size or get_export_settings()["page_size"]
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    if args.output:
+        output = gzip.open(args.output, "wt", encoding="utf-8", newline="") if compress \
+            else open(args.output, "w", encoding="utf-8", newline="")
+    else:
+        output = gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", newline="") if compress else sys.stdout
+
+    encode = EXPORT_FORMATS[args.format][0]
+    exported = 0
+    try:
+        for line in encode(iter_export_rows(filters, page_size)):
+            output.write(line)
+            exported += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    if args.format == "csv":
+        exported -= 1
+    print(f"Exported {exported} sessions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
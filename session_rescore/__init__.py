@@ -0,0 +1,66 @@
+import azure.functions as func
+import logging
+import json
+import os
+from datetime import datetime, timezone
+from typing import Dict, Any
+from rescoring import RescoringJob
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Session Rescore API - Admin endpoint to re-score completed sessions
+    
+    POST /api/admin/sessions/rescore
+    Query Parameters:
+    - pages (optional): Pages to process in this call (default: 10); call again to resume
+    - page_size (optional): Sessions per page (default: RESCORE_PAGE_SIZE or 100)
+    - restart (optional): If true, ignore the saved checkpoint and start over (default: false)
+    Returns: 200 OK with job progress
+    """
+    logging.info('Python HTTP trigger function processed a request.')
+    
+    try:
+        # Get query parameters
+        pages = int(req.params.get('pages', 10))
+        page_size = req.params.get('page_size')
+        page_size = int(page_size) if page_size else None
+        restart = req.params.get('restart', 'false').lower() == 'true'
+        
+        # Validate parameters
+        if pages < 1 or (page_size is not None and page_size < 1):
+            return func.HttpResponse(
+                json.dumps({"error": "pages and page_size must be at least 1"}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        # Run a bounded slice of the job so the request stays within the function timeout
+        state = RescoringJob(page_size=page_size).run(max_pages=pages, restart=restart)
+        
+        response_data = {
+            "completed": state["completed"],
+            "processed": state["processed"],
+            "total": state.get("total"),
+            "updated": state["updated"],
+            "unchanged": state["unchanged"],
+            "skipped": state["skipped"],
+            "failed": state["failed"],
+            "throughputPerSecond": state.get("throughputPerSecond"),
+            "etaSeconds": state.get("etaSeconds"),
+            "consumedRequestUnits": state.get("consumedRequestUnits"),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        
+        return func.HttpResponse(
+            json.dumps(response_data, indent=2),
+            status_code=200,
+            mimetype="application/json"
+        )
+    
+    except Exception as e:
+        logging.error(f"Error in session_rescore: {str(e)}")
+        return func.HttpResponse(
+            json.dumps({"error": "Internal server error"}),
+            status_code=500,
+            mimetype="application/json"
+        )
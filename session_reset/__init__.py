@@ -4,10 +4,8 @@ import json
 import os
 from datetime import datetime, timezone
 from typing import Dict, Any
-
-# Azure SDK imports
-import azure.cosmos.cosmos_client as cosmos_client
-import azure.cosmos.exceptions as exceptions
+from session_store import get_session_store
+from bulk_reset import reset_session
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -28,11 +26,9 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # Initialize Cosmos DB client
-        cosmos_client_instance = get_cosmos_client()
-
-        # Get session from database
-        session = get_session(cosmos_client_instance, session_id)
+        # Get session from the session store
+        store = get_session_store()
+        session = store.get_session(session_id)
         if not session:
             return func.HttpResponse(
                 json.dumps({"error": "Session not found"}),
@@ -40,8 +36,13 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 mimetype="application/json"
             )
 
-        # Reset session to initial state
-        reset_session(cosmos_client_instance, session_id, session)
+        # Reset session to initial state with a partial-document update
+        if not reset_session(store, session_id, session):
+            return func.HttpResponse(
+                json.dumps({"error": "Session not found"}),
+                status_code=404,
+                mimetype="application/json"
+            )
 
         # Build response
         response_data = {
@@ -65,67 +66,3 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             status_code=500,
             mimetype="application/json"
         )
-
-def get_cosmos_client():
-    """Initialize and return Cosmos DB client"""
-    cosmos_endpoint = os.environ.get('COSMOS_ENDPOINT')
-    cosmos_key = os.environ.get('COSMOS_KEY')
-    
-    if not cosmos_endpoint or not cosmos_key:
-        raise ValueError("Cosmos DB credentials not configured")
-    
-    return cosmos_client.CosmosClient(cosmos_endpoint, cosmos_key)
-
-def get_database_name():
-    """Get database name from environment or use default"""
-    return os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
-
-def get_container_name():
-    """Get container name from environment or use default"""
-    return os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
-
-def get_session(cosmos_client_instance, session_id):
-    """Retrieve session from Cosmos DB"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Query for session by ID
-        query = "SELECT * FROM c WHERE c.id = @session_id"
-        parameters = [{"name": "@session_id", "value": session_id}]
-        
-        items = list(container.query_items(
-            query=query,
-            parameters=parameters,
-            enable_cross_partition_query=True
-        ))
-        
-        return items[0] if items else None
-        
-    except Exception as e:
-        logging.error(f"Error retrieving session: {str(e)}")
-        return None
-
-def reset_session(cosmos_client_instance, session_id, session):
-    """Reset session to initial state"""
-    try:
-        database_name = get_database_name()
-        container_name = get_container_name()
-        container = cosmos_client_instance.get_database_client(database_name).get_container_client(container_name)
-        
-        # Reset session data
-        session['status'] = 'InProgress'
-        session['answers'] = []
-        session['result'] = None
-        session['completedAt'] = None
-        session['reportFirstViewedAt'] = None
-        
-        # Update the session
-        container.replace_item(item=session_id, body=session)
-        
-        logging.info(f"Session {session_id} reset successfully")
-        
-    except Exception as e:
-        logging.error(f"Error resetting session: {str(e)}")
-        raise e 
\ No newline at end of file
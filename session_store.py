@@ -0,0 +1,906 @@
+# Session storage backends shared by every handler
+# Select the backend with SESSION_STORE=memory|cosmos|file|sqlite. When it is not set,
+# USE_IN_MEMORY_STORAGE=true selects memory, configured Cosmos credentials
+# select cosmos, and anything else falls back to memory.
+#
+# Mutations are guarded by optimistic concurrency: every document carries an
+# _etag, conditional writes fail with ConcurrencyConflict when another instance
+# changed the document first, and mutate_session() re-reads and re-applies the
+# change up to SESSION_CONFLICT_RETRIES times.
+#
+# With CHANGE_FEED_ENABLED=true the local backends publish every write to the
+# change_feed event log; Cosmos DB has its own change feed.
+#
+# Sessions carry a ttl property set from their status (session_ttl). Cosmos DB
+# expires a document ttl seconds after its last write, so every write renews
+# it; the in-memory store does the same with lazy and periodic expiry.
+#
+# Cosmos DB has two container layouts. The original one (cosmos) partitions
+# sessions on /id and keeps contact submissions in the same container. The
+# partitioned one (cosmos-partitioned) partitions on a synthetic /pk of
+# "<tenant>|<creation month>|<ID bucket>", so queries over a month target
+# SESSION_PARTITION_BUCKETS (16) logical partitions, and a month's writes are
+# spread over as many instead of all landing in one (with its 20 GB limit).
+# It keeps contacts in their own container, partitioned on /sessionId. On the partitioned layouts new session IDs are time-ordered UUIDv7
+# values, so the partition key of a session follows from its ID alone. cosmos-dual serves the cutover:
+# it writes the partitioned layout, reads fall back to the original container
+# and move a session across on first read, and layout_migration.py copies the
+# rest. Its page scans cover both containers; jobs that query one container
+# directly refuse to run (LayoutCutoverInProgress) until the switch to
+# cosmos-partitioned.
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from azure.core import MatchConditions
+import azure.cosmos.exceptions as exceptions
+
+import shared_session_storage
+from answer_codec import get_storage_format, can_pack, encode_answers, to_stored, from_stored
+from change_feed import publish_change, publish_deletes
+from cosmos_connection import get_container
+
+_concurrency_stats = {"conflicts": 0, "retries": 0, "exhausted": 0}
+
+
+class ConcurrencyConflict(Exception):
+    """Raised when a conditional write loses to a concurrent update"""
+
+
+class LayoutCutoverInProgress(Exception):
+    """Raised by container-level scans while cosmos-dual spreads sessions over two containers"""
+
+
+def get_max_conflict_retries():
+    """How many times a conflicting mutation is re-read and re-applied"""
+    return int(os.environ.get('SESSION_CONFLICT_RETRIES', 5))
+
+
+def get_session_ttl_settings():
+    """Seconds a session lives after its last write, per status; 0 keeps sessions with that status forever"""
+    return {
+        "InProgress": int(os.environ.get('SESSION_TTL_IN_PROGRESS_SECONDS', 7 * 86400)),
+        "Completed": int(os.environ.get('SESSION_TTL_COMPLETED_SECONDS', 365 * 86400))
+    }
+
+
+def get_expiry_settings():
+    """Get whether sessions are expired through the cleanup path, and how long TTL waits behind it, from environment or use defaults"""
+    return {
+        "enabled": os.environ.get('SESSION_EXPIRY_SWEEP_ENABLED', 'false').lower() == 'true',
+        "grace_seconds": int(os.environ.get('SESSION_EXPIRY_GRACE_SECONDS', 3600))
+    }
+
+
+def is_expiry_sweep_enabled():
+    """Whether the timer trigger expires Cosmos DB sessions itself, with TTL as the backstop"""
+    return get_expiry_settings()["enabled"] and get_store_backend_name() in COSMOS_BACKENDS
+
+
+def session_ttl(status):
+    """The ttl property for a session with this status (-1 never expires)
+
+    With the expiry sweep on, the ttl runs grace_seconds past the configured
+    lifetime, so the sweep deletes the session first and TTL is only the backstop.
+    """
+    lifetime = get_session_ttl_settings().get(status)
+    if not lifetime or lifetime < 0:
+        return -1
+    return lifetime + get_expiry_settings()["grace_seconds"] if is_expiry_sweep_enabled() else lifetime
+
+
+def record_conflict(retrying=True):
+    """Count a lost conditional write"""
+    _concurrency_stats["conflicts"] += 1
+    if retrying:
+        _concurrency_stats["retries"] += 1
+    else:
+        _concurrency_stats["exhausted"] += 1
+
+
+def get_concurrency_stats():
+    """Return conflict counters for monitoring"""
+    return dict(_concurrency_stats)
+
+
+def new_etag():
+    return uuid.uuid4().hex
+
+
+def new_session_id():
+    """A UUIDv7 session ID: 48 bits of Unix milliseconds, then random bits, so IDs sort by creation time"""
+    value = (int(time.time() * 1000) << 80) | (uuid.uuid4().int & ((1 << 80) - 1))
+    value = (value & ~(0xF << 76)) | (0x7 << 76)   # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)   # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+
+def issue_session_id():
+    """ID for a new session: UUIDv7 on the partitioned layouts, a random UUID otherwise
+
+    The cosmos-dual store derives a UUIDv7 ID's partition key without looking in
+    the original container, so sessions created there must keep random IDs.
+    """
+    if get_store_backend_name() in PARTITIONED_BACKENDS:
+        return new_session_id()
+    return str(uuid.uuid4())
+
+
+def session_id_month(session_id):
+    """The UTC creation month ("YYYY-MM") encoded in a UUIDv7 session ID, or None for other IDs"""
+    try:
+        parsed = uuid.UUID(session_id)
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.fromtimestamp((parsed.int >> 80) / 1000, tz=timezone.utc).strftime('%Y-%m')
+
+
+def get_tenant_id():
+    """Tenant prefix of partitioned-layout keys"""
+    return os.environ.get('TENANT_ID', 'default')
+
+
+def get_partition_buckets():
+    """ID-hash buckets each tenant's month is spread over; changing it requires migrating the layout again"""
+    return int(os.environ.get('SESSION_PARTITION_BUCKETS', 16))
+
+
+def partition_key_for(session_id, month):
+    """Partitioned-layout key "<tenant>|<YYYY-MM>|<bucket>" of a session created in month"""
+    # The bucket spreads a month's writes over several logical (and physical) partitions
+    bucket = zlib.crc32(session_id.encode('utf-8')) % get_partition_buckets()
+    return f"{get_tenant_id()}|{month}|{bucket:02d}"
+
+
+def session_partition_key(session):
+    """Partitioned-layout key from the ID, taking the month from createdAt for older IDs"""
+    month = session_id_month(session.get('id'))
+    if month is None:
+        try:
+            created_at = datetime.fromisoformat((session.get('createdAt') or '').replace('Z', '+00:00'))
+            month = created_at.astimezone(timezone.utc).strftime('%Y-%m')
+        except ValueError:
+            month = "unknown"
+    return partition_key_for(session['id'], month)
+
+
+def _pages_by_id(session_ids, load, status, page_size, continuation):
+    # Keyset pagination for the local backends: the continuation is the last ID returned
+    page = []
+    for session_id in sorted(session_id for session_id in session_ids if not continuation or session_id > continuation):
+        document = load(session_id)
+        if document is None or (status and document.get('status') != status):
+            continue
+        page.append(document)
+        if len(page) == page_size:
+            yield page, session_id
+            page = []
+    yield page, None
+
+
+class SessionStore:
+    """Interface implemented by every session storage backend"""
+
+    name = "base"
+
+    def get_session(self, session_id):
+        """Return the session document, or None if it does not exist"""
+        raise NotImplementedError
+
+    def save_session(self, session):
+        """Create or fully replace a session document"""
+        raise NotImplementedError
+
+    def delete_session(self, session_id):
+        """Delete a session document; returns True if it existed"""
+        raise NotImplementedError
+
+    def replace_session(self, session, etag=None):
+        """Replace a session only if its stored _etag still equals etag
+
+        Raises ConcurrencyConflict if the document changed since it was read.
+        Without an etag this is an unconditional save.
+        """
+        raise NotImplementedError
+
+    def mutate_session(self, session_id, mutate, session=None):
+        """Read-modify-write a session with a bounded retry-and-merge loop
+
+        mutate(session) edits the document in place and returns True to write it
+        or False to leave it untouched. On a conflict the latest version is read
+        and mutate is applied again, so it must decide from the document it is
+        given. Returns the final document, or None if the session does not exist.
+        """
+        max_retries = get_max_conflict_retries()
+        for attempt in range(max_retries + 1):
+            if session is None:
+                session = self.get_session(session_id)
+            if session is None:
+                return None
+            if not mutate(session):
+                return session
+            try:
+                return self.replace_session(session, etag=session.get('_etag'))
+            except ConcurrencyConflict:
+                record_conflict(retrying=attempt < max_retries)
+                session = None
+        raise ConcurrencyConflict(f"Session {session_id} kept changing after {max_retries} retries")
+
+    def append_answers(self, session_id, answers, status=None, completed_at=None, session=None, fields=None):
+        """Append answer records and optionally update status/completedAt and other top-level fields
+
+        session is the stored document as the caller last read it, if available;
+        its _etag makes the append conditional on nothing else having changed.
+        Returns the updated session, or None if the session does not exist.
+        """
+        expected_etag = session.get('_etag') if session else None
+        current = self.get_session(session_id)
+        if current is None:
+            return None
+        if expected_etag and current.get('_etag') != expected_etag:
+            raise ConcurrencyConflict(f"Session {session_id} changed since it was read")
+        current.setdefault('answers', []).extend(answers)
+        if status:
+            current['status'] = status
+        if completed_at:
+            current['completedAt'] = completed_at
+        current.update(fields or {})
+        return self.replace_session(current, etag=current.get('_etag'))
+
+    def update_fields(self, session_id, fields, session=None):
+        """Set top-level fields on a session without rewriting anything else
+
+        As with append_answers, session's _etag makes the update conditional.
+        Returns the updated document, or None if the session does not exist.
+        """
+        expected_etag = session.get('_etag') if session else None
+        current = self.get_session(session_id)
+        if current is None:
+            return None
+        if expected_etag and current.get('_etag') != expected_etag:
+            raise ConcurrencyConflict(f"Session {session_id} changed since it was read")
+        current.update(fields)
+        return self.replace_session(current, etag=current.get('_etag'))
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        """Yield (documents, continuation) pages of stored session documents
+
+        Documents are returned as stored (answers may still be packed). Passing a
+        yielded continuation back in resumes after that page; it is None after
+        the last page.
+        """
+        raise NotImplementedError
+
+    def count_sessions(self, status=None):
+        """Count stored sessions, optionally only those with the given status"""
+        raise NotImplementedError
+
+    def consume_request_charge(self):
+        """Request units used by this thread since the last call (0 for local backends)"""
+        return 0.0
+
+    def save_contact(self, contact_submission):
+        """Store a contact form submission"""
+        raise NotImplementedError
+
+
+def forget_expired_sessions(sessions):
+    """Take sessions that expired without a delete out of the rollups and the read models"""
+    # Imported here: the rollups read sessions through this module
+    from analytics_rollups import record_sessions_deleted
+    record_sessions_deleted(sessions)
+    publish_deletes(session['id'] for session in sessions)
+
+
+class InMemorySessionStore(SessionStore):
+    """Per-process store backed by shared_session_storage"""
+
+    name = "memory"
+
+    def __init__(self):
+        self.contacts = {}
+        self._write_lock = threading.Lock()
+        shared_session_storage.session_storage.on_expire = forget_expired_sessions
+
+    def get_session(self, session_id):
+        # Hand out copies so a handler's edits only land through a (conditional) write
+        session = shared_session_storage.get_session(session_id)
+        return copy.deepcopy(session) if session is not None else None
+
+    def save_session(self, session):
+        return self.replace_session(session)
+
+    def replace_session(self, session, etag=None):
+        with self._write_lock:
+            if etag is not None:
+                current = shared_session_storage.get_session(session["id"])
+                if current is None or current.get('_etag') != etag:
+                    raise ConcurrencyConflict(f"Session {session['id']} changed since it was read")
+            session['_etag'] = new_etag()
+            shared_session_storage.update_session(copy.deepcopy(session))
+            publish_change(session)
+        return session
+
+    def delete_session(self, session_id):
+        deleted = shared_session_storage.delete_session(session_id)
+        if deleted:
+            publish_change({"id": session_id}, op="delete")
+        return deleted
+
+    def _peek_session(self, session_id):
+        session = shared_session_storage.peek_session(session_id)
+        return copy.deepcopy(session) if session is not None else None
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        # A scan must not promote every session in the LRU order or skew the hit rate
+        return _pages_by_id(shared_session_storage.session_storage.keys(), self._peek_session,
+                            status, page_size, continuation)
+
+    def count_sessions(self, status=None):
+        return sum(len(page) for page, _ in self.iter_session_pages(status, page_size=1000))
+
+    def save_contact(self, contact_submission):
+        self.contacts[contact_submission["id"]] = contact_submission
+        publish_change(contact_submission)
+        logging.info(f"Contact submission (in-memory): {contact_submission['id']}")
+        return contact_submission
+
+
+class CosmosSessionStore(SessionStore):
+    """Cosmos DB store using point operations on the /id partition key"""
+
+    name = "cosmos"
+
+    # Cosmos DB accepts at most this many operations in a single patch request
+    MAX_PATCH_OPERATIONS = 10
+
+    # Stored sessions and contact submissions share the container; contacts carry a sessionId
+    SESSIONS_FILTER = "NOT IS_DEFINED(c.sessionId)"
+
+    def __init__(self, container_name=None):
+        self.container_name = container_name
+        self._local = threading.local()
+
+    @property
+    def container(self):
+        return get_container(self.container_name)
+
+    @property
+    def contacts_container(self):
+        return self.container
+
+    def _partition_key(self, session_id, session=None):
+        """Partition key value of a stored session, or None if it cannot be found"""
+        return session_id
+
+    def get_session(self, session_id):
+        partition_key = self._partition_key(session_id)
+        if partition_key is None:
+            return None
+        try:
+            return from_stored(self.container.read_item(item=session_id, partition_key=partition_key))
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def save_session(self, session):
+        self.container.upsert_item(to_stored(session))
+        return session
+
+    def replace_session(self, session, etag=None):
+        if etag is None:
+            return self.save_session(session)
+        try:
+            stored = self.container.replace_item(item=session["id"], body=to_stored(session),
+                                                 etag=etag, match_condition=MatchConditions.IfNotModified)
+        except exceptions.CosmosAccessConditionFailedError:
+            raise ConcurrencyConflict(f"Session {session['id']} changed since it was read")
+        session['_etag'] = stored.get('_etag')
+        return session
+
+    def delete_session(self, session_id):
+        partition_key = self._partition_key(session_id)
+        if partition_key is None:
+            return False
+        try:
+            self.container.delete_item(item=session_id, partition_key=partition_key)
+        except exceptions.CosmosResourceNotFoundError:
+            return False
+        publish_deletes([session_id])
+        return True
+
+    def _record_charge(self, headers, *_):
+        self._local.charge = getattr(self._local, 'charge', 0.0) + float(headers.get('x-ms-request-charge') or 0)
+
+    def consume_request_charge(self):
+        charge = getattr(self._local, 'charge', 0.0)
+        self._local.charge = 0.0
+        return charge
+
+    def update_fields(self, session_id, fields, session=None):
+        if 'answers' in fields:
+            # Replacing the answers must not leave a packed copy that would be read in their place
+            fields = dict(fields, answersPacked=None)
+        operations = [{"op": "set", "path": f"/{name}", "value": value} for name, value in fields.items()]
+        if len(operations) > self.MAX_PATCH_OPERATIONS:
+            return super().update_fields(session_id, fields, session=session)
+        etag = session.get('_etag') if session else None
+        conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+        partition_key = self._partition_key(session_id, session)
+        if partition_key is None:
+            return None
+        try:
+            return from_stored(self.container.patch_item(item=session_id, partition_key=partition_key,
+                                                         patch_operations=operations,
+                                                         response_hook=self._record_charge, **conditions))
+        except exceptions.CosmosAccessConditionFailedError:
+            raise ConcurrencyConflict(f"Session {session_id} changed since it was read")
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def _sessions_query(self, select, status):
+        query = f"SELECT {select} FROM c WHERE {self.SESSIONS_FILTER}"
+        parameters = []
+        if status:
+            query += " AND c.status = @status"
+            parameters.append({"name": "@status", "value": status})
+        return query, parameters
+
+    def _query_pages(self, container, select, status, page_size, continuation):
+        query, parameters = self._sessions_query(select, status)
+        pages = container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True,
+                                      max_item_count=page_size).by_page(continuation)
+        for page in pages:
+            documents = list(page)
+            self._record_charge(container.client_connection.last_response_headers or {})
+            yield documents, pages.continuation_token
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        return self._query_pages(self.container, "*", status, page_size, continuation)
+
+    def count_sessions(self, status=None):
+        query, parameters = self._sessions_query("VALUE COUNT(1)", status)
+        results = list(self.container.query_items(query=query, parameters=parameters,
+                                                  enable_cross_partition_query=True))
+        return sum(results)
+
+    def append_answers(self, session_id, answers, status=None, completed_at=None, session=None, fields=None):
+        # Partial-document patch: the request size depends on the new answers only,
+        # not on how many answers the session already holds
+        operations = None
+        if get_storage_format() == 'compact':
+            session = session if session is not None else self.get_session(session_id)
+            if session is None:
+                return None
+            all_answers = list(session.get('answers') or []) + list(answers)
+            if can_pack(all_answers):
+                # The packed value is a few dozen bytes, so replacing it stays a small patch
+                operations = [{"op": "set", "path": "/answersPacked",
+                               "value": encode_answers(all_answers, session.get('createdAt'))}]
+        if operations is None:
+            operations = [{"op": "add", "path": "/answers/-", "value": answer} for answer in answers]
+        if status:
+            operations.append({"op": "set", "path": "/status", "value": status})
+        if completed_at:
+            operations.append({"op": "set", "path": "/completedAt", "value": completed_at})
+        operations.extend({"op": "set", "path": f"/{name}", "value": value} for name, value in (fields or {}).items())
+
+        # Only apply the patch if the document is still the version the caller validated against
+        etag = session.get('_etag') if session else None
+        partition_key = self._partition_key(session_id, session)
+        if partition_key is None:
+            return None
+        chunks = [operations[i:i + self.MAX_PATCH_OPERATIONS]
+                  for i in range(0, len(operations), self.MAX_PATCH_OPERATIONS)]
+        try:
+            if len(chunks) == 1:
+                conditions = {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+                return from_stored(self.container.patch_item(item=session_id, partition_key=partition_key,
+                                                             patch_operations=chunks[0], **conditions))
+            # Larger flushes go out as one transactional batch so they apply atomically
+            batch_operations = [("patch", (session_id, chunk)) for chunk in chunks]
+            if etag:
+                batch_operations[0] = ("patch", (session_id, chunks[0]), {"if_match_etag": etag})
+            results = self.container.execute_item_batch(batch_operations=batch_operations,
+                                                        partition_key=partition_key)
+            # The last patch's response is the document with every chunk applied
+            document = results[-1].get('resourceBody') if results else None
+            return from_stored(document) if document is not None else self.get_session(session_id)
+        except exceptions.CosmosAccessConditionFailedError:
+            raise ConcurrencyConflict(f"Session {session_id} changed since it was read")
+        except exceptions.CosmosBatchOperationError as e:
+            if e.error_index is not None and e.operation_responses \
+                    and e.operation_responses[e.error_index].get('statusCode') == 412:
+                raise ConcurrencyConflict(f"Session {session_id} changed since it was read")
+            raise
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def save_contact(self, contact_submission):
+        result = self.contacts_container.upsert_item(contact_submission)
+        logging.info(f"Contact submission stored successfully: {contact_submission['id']}")
+        return result
+
+
+class PartitionedCosmosSessionStore(CosmosSessionStore):
+    """Cosmos DB store on the partitioned layout: /pk of tenant, creation month and ID bucket, contacts apart"""
+
+    name = "cosmos-partitioned"
+
+    # Sessions with pre-UUIDv7 IDs whose partition keys were looked up
+    MAX_CACHED_KEYS = 10000
+
+    def __init__(self, container_name=None):
+        super().__init__(container_name)
+        self._keys = OrderedDict()
+        self._keys_lock = threading.Lock()
+
+    @property
+    def contacts_container(self):
+        return get_container(os.environ.get('COSMOS_CONTACTS_CONTAINER_NAME', 'contacts'))
+
+    def _remember_key(self, session_id, partition_key):
+        with self._keys_lock:
+            self._keys[session_id] = partition_key
+            self._keys.move_to_end(session_id)
+            while len(self._keys) > self.MAX_CACHED_KEYS:
+                self._keys.popitem(last=False)
+
+    def _lookup_key(self, session_id):
+        # Older IDs do not encode their month: one indexed query by id, then cached
+        keys = list(self.container.query_items(query="SELECT VALUE c.pk FROM c WHERE c.id = @id",
+                                               parameters=[{"name": "@id", "value": session_id}],
+                                               enable_cross_partition_query=True))
+        return keys[0] if keys else None
+
+    def _partition_key(self, session_id, session=None):
+        if session and session.get('pk'):
+            return session['pk']
+        month = session_id_month(session_id)
+        if month is not None:
+            return partition_key_for(session_id, month)
+        with self._keys_lock:
+            partition_key = self._keys.get(session_id)
+        if partition_key is None:
+            partition_key = self._lookup_key(session_id)
+            if partition_key is not None:
+                self._remember_key(session_id, partition_key)
+        return partition_key
+
+    def save_session(self, session):
+        session.setdefault('pk', session_partition_key(session))
+        return super().save_session(session)
+
+    def replace_session(self, session, etag=None):
+        session.setdefault('pk', session_partition_key(session))
+        return super().replace_session(session, etag=etag)
+
+
+class DualReadCosmosSessionStore(PartitionedCosmosSessionStore):
+    """Cutover store: writes the partitioned layout, reads fall back to the original container
+
+    A session found only in the original container is copied into the
+    partitioned one on first read, so the writes that follow land there.
+    """
+
+    name = "cosmos-dual"
+
+    # Marks a page-scan continuation that points into the original container
+    LEGACY_CONTINUATION = "legacy:"
+
+    @property
+    def legacy_container(self):
+        return get_container(os.environ.get('COSMOS_LEGACY_CONTAINER_NAME', 'sessions'))
+
+    def _partition_key(self, session_id, session=None):
+        partition_key = super()._partition_key(session_id, session)
+        if partition_key is None and self._move_from_legacy(session_id) is not None:
+            partition_key = super()._partition_key(session_id)
+        return partition_key
+
+    def _move_from_legacy(self, session_id):
+        """Copy a session from the original container if it is only there; returns the stored document"""
+        try:
+            document = self.legacy_container.read_item(item=session_id, partition_key=session_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+        document = {key: value for key, value in document.items() if not key.startswith('_')}
+        document['pk'] = session_partition_key(document)
+        try:
+            stored = self.container.create_item(document)
+        except exceptions.CosmosResourceExistsError:
+            # Moved already, by another instance or by the migration tool
+            stored = self.container.read_item(item=session_id, partition_key=document['pk'])
+        self._remember_key(session_id, document['pk'])
+        return stored
+
+    def _moved_ids(self, session_ids):
+        if not session_ids:
+            return set()
+        return set(self.container.query_items(query="SELECT VALUE c.id FROM c WHERE ARRAY_CONTAINS(@ids, c.id)",
+                                              parameters=[{"name": "@ids", "value": session_ids}],
+                                              enable_cross_partition_query=True))
+
+    def _legacy_pages(self, select, status, page_size, continuation):
+        """Pages of the sessions only in the original container; one lookup per page drops those moved across"""
+        for documents, next_continuation in self._query_pages(self.legacy_container, select, status,
+                                                              page_size, continuation):
+            moved = self._moved_ids([document['id'] for document in documents])
+            yield [document for document in documents if document['id'] not in moved], next_continuation
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        # The partitioned container first, then the original one; continuations into
+        # the original container carry a prefix, so older checkpoints still resume
+        if not (continuation or '').startswith(self.LEGACY_CONTINUATION):
+            for documents, next_continuation in super().iter_session_pages(status, page_size, continuation):
+                yield documents, next_continuation or self.LEGACY_CONTINUATION
+            continuation = None
+        else:
+            continuation = continuation[len(self.LEGACY_CONTINUATION):] or None
+        for documents, next_continuation in self._legacy_pages("*", status, page_size, continuation):
+            yield documents, self.LEGACY_CONTINUATION + next_continuation if next_continuation else None
+
+    def count_sessions(self, status=None):
+        legacy_only = sum(len(page) for page, _ in self._legacy_pages("c.id", status, 1000, None))
+        return super().count_sessions(status) + legacy_only
+
+    def delete_session(self, session_id):
+        # The original copy goes first, so the lookup below does not move it across
+        try:
+            self.legacy_container.delete_item(item=session_id, partition_key=session_id)
+            deleted = True
+        except exceptions.CosmosResourceNotFoundError:
+            deleted = False
+        if super().delete_session(session_id):
+            return True
+        if deleted:
+            publish_deletes([session_id])
+        return deleted
+
+
+class FileSessionStore(SessionStore):
+    """Local store writing one JSON file per session, for development and demos"""
+
+    name = "file"
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('SESSION_STORE_PATH', '.sessions')
+        self.contacts_path = os.path.join(self.path, 'contacts')
+        os.makedirs(self.contacts_path, exist_ok=True)
+        # Serialises conditional writes within this process only
+        self._write_lock = threading.Lock()
+
+    def _file_for(self, directory, document_id):
+        # Session IDs come from the URL, so never let them escape the store directory
+        if not document_id or os.sep in document_id or '/' in document_id or document_id.startswith('.'):
+            raise ValueError(f"Invalid document ID: {document_id!r}")
+        return os.path.join(directory, f"{document_id}.json")
+
+    def _write(self, file_path, document):
+        # Write to a temporary file first so readers never see a partial document
+        directory = os.path.dirname(file_path)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(document, f)
+            os.replace(temp_path, file_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _read_stored(self, session_id):
+        try:
+            with open(self._file_for(self.path, session_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def get_session(self, session_id):
+        return from_stored(self._read_stored(session_id))
+
+    def save_session(self, session):
+        return self.replace_session(session)
+
+    def replace_session(self, session, etag=None):
+        with self._write_lock:
+            if etag is not None:
+                current = self.get_session(session["id"])
+                if current is None or current.get('_etag') != etag:
+                    raise ConcurrencyConflict(f"Session {session['id']} changed since it was read")
+            session['_etag'] = new_etag()
+            self._write(self._file_for(self.path, session["id"]), to_stored(session))
+            publish_change(session)
+        return session
+
+    def delete_session(self, session_id):
+        try:
+            os.remove(self._file_for(self.path, session_id))
+            publish_change({"id": session_id}, op="delete")
+            return True
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        session_ids = (name[:-len('.json')] for name in os.listdir(self.path) if name.endswith('.json'))
+        return _pages_by_id(session_ids, self._read_stored, status, page_size, continuation)
+
+    def count_sessions(self, status=None):
+        return sum(len(page) for page, _ in self.iter_session_pages(status, page_size=1000))
+
+    def save_contact(self, contact_submission):
+        self._write(self._file_for(self.contacts_path, contact_submission["id"]), contact_submission)
+        publish_change(contact_submission)
+        return contact_submission
+
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# reuses the prepared form on every call
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    status TEXT,
+    createdAt TEXT,
+    etag TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_status ON sessions (status);
+CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions (createdAt);
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    sessionId TEXT,
+    doc TEXT NOT NULL
+);
+"""
+SQL_GET_SESSION = "SELECT doc FROM sessions WHERE id = ?"
+SQL_UPSERT_SESSION = (
+    "INSERT INTO sessions (id, status, createdAt, etag, doc) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET status = excluded.status, createdAt = excluded.createdAt, "
+    "etag = excluded.etag, doc = excluded.doc"
+)
+SQL_REPLACE_SESSION_IF_MATCH = (
+    "UPDATE sessions SET status = ?, createdAt = ?, etag = ?, doc = ? WHERE id = ? AND etag = ?"
+)
+SQL_DELETE_SESSION = "DELETE FROM sessions WHERE id = ?"
+SQL_PAGE_SESSIONS = "SELECT id, doc FROM sessions WHERE id > ?1 AND (?2 IS NULL OR status = ?2) ORDER BY id LIMIT ?3"
+SQL_COUNT_SESSIONS = "SELECT COUNT(*) FROM sessions WHERE ?1 IS NULL OR status = ?1"
+SQL_UPSERT_CONTACT = "INSERT OR REPLACE INTO contacts (id, sessionId, doc) VALUES (?, ?, ?)"
+
+
+class SqliteSessionStore(SessionStore):
+    """Local SQLite store in WAL mode, shared by every worker process on the host
+
+    Each thread opens its own connection; WAL lets readers run alongside the single
+    writer, and conditional writes compare the etag column in the UPDATE itself
+    so they stay atomic across processes.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('SESSION_SQLITE_PATH', os.path.join('.sessions', 'sessions.db'))
+        self.mmap_size = int(os.environ.get('SESSION_SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+        self.busy_timeout = float(os.environ.get('SESSION_SQLITE_BUSY_TIMEOUT_SECONDS', 5))
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connect().executescript(SQLITE_SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        # A forked worker must not reuse its parent's connection
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout,
+                                     isolation_level=None, cached_statements=64)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def get_session(self, session_id):
+        row = self._connect().execute(SQL_GET_SESSION, (session_id,)).fetchone()
+        return from_stored(json.loads(row[0])) if row else None
+
+    def save_session(self, session):
+        return self.replace_session(session)
+
+    def replace_session(self, session, etag=None):
+        previous = session.get('_etag')
+        session['_etag'] = new_etag()
+        status, created_at, doc = session.get('status'), session.get('createdAt'), json.dumps(to_stored(session))
+        connection = self._connect()
+        if etag is None:
+            connection.execute(SQL_UPSERT_SESSION, (session["id"], status, created_at, session['_etag'], doc))
+            publish_change(session)
+            return session
+        cursor = connection.execute(SQL_REPLACE_SESSION_IF_MATCH,
+                                    (status, created_at, session['_etag'], doc, session["id"], etag))
+        if cursor.rowcount == 0:
+            session['_etag'] = previous
+            raise ConcurrencyConflict(f"Session {session['id']} changed since it was read")
+        publish_change(session)
+        return session
+
+    def delete_session(self, session_id):
+        deleted = self._connect().execute(SQL_DELETE_SESSION, (session_id,)).rowcount > 0
+        if deleted:
+            publish_change({"id": session_id}, op="delete")
+        return deleted
+
+    def iter_session_pages(self, status=None, page_size=100, continuation=None):
+        connection = self._connect()
+        last_id = continuation or ''
+        while True:
+            rows = connection.execute(SQL_PAGE_SESSIONS, (last_id, status, page_size)).fetchall()
+            last_id = rows[-1][0] if len(rows) == page_size else None
+            yield [json.loads(doc) for _, doc in rows], last_id
+            if last_id is None:
+                return
+
+    def count_sessions(self, status=None):
+        return self._connect().execute(SQL_COUNT_SESSIONS, (status,)).fetchone()[0]
+
+    def save_contact(self, contact_submission):
+        self._connect().execute(SQL_UPSERT_CONTACT, (contact_submission["id"], contact_submission.get("sessionId"),
+                                                     json.dumps(contact_submission)))
+        publish_change(contact_submission)
+        return contact_submission
+
+
+SESSION_STORE_BACKENDS = {
+    "memory": InMemorySessionStore,
+    "cosmos": CosmosSessionStore,
+    "cosmos-partitioned": PartitionedCosmosSessionStore,
+    "cosmos-dual": DualReadCosmosSessionStore,
+    "file": FileSessionStore,
+    "sqlite": SqliteSessionStore,
+}
+
+COSMOS_BACKENDS = ("cosmos", "cosmos-partitioned", "cosmos-dual")
+PARTITIONED_BACKENDS = ("cosmos-partitioned", "cosmos-dual")
+
+_stores = {}
+
+
+def get_store_backend_name():
+    """Resolve which backend to use from the environment"""
+    backend = os.environ.get('SESSION_STORE', '').strip().lower()
+    if backend:
+        return backend
+    if os.environ.get('USE_IN_MEMORY_STORAGE', 'false').lower() == 'true':
+        return "memory"
+    if os.environ.get('COSMOS_ENDPOINT') and os.environ.get('COSMOS_KEY'):
+        return "cosmos"
+    return "memory"
+
+
+def check_single_layout(job):
+    """Raise LayoutCutoverInProgress if job, which queries one container directly, would miss sessions"""
+    if get_store_backend_name() == "cosmos-dual":
+        raise LayoutCutoverInProgress(f"{job} is unavailable during the cosmos-dual cutover; finish "
+                                      "layout_migration.py and switch SESSION_STORE to cosmos-partitioned")
+
+
+def get_session_store(backend=None):
+    """Return the process-wide store instance for the configured backend"""
+    backend = backend or get_store_backend_name()
+    if backend not in SESSION_STORE_BACKENDS:
+        raise ValueError(f"Unknown session store backend: {backend}")
+    if backend not in _stores:
+        _stores[backend] = SESSION_STORE_BACKENDS[backend]()
+    return _stores[backend]
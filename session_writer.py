@@ -0,0 +1,199 @@
+# Answer write path for submit_answer
+# ANSWER_WRITE_MODE selects how each answer reaches the session store:
+#   patch    - append the single answer with a partial-document patch (default)
+#   buffered - keep answers in a per-process write-behind buffer and flush every
+#              ANSWER_FLUSH_EVERY answers, always flushing on the final question
+#   replace  - rewrite the whole session document (previous behaviour)
+# Buffered mode trades durability for fewer round trips: pending answers live
+# in this worker process only, so use it with a single instance or session
+# affinity.
+# Patch and replace writes are conditional on the session's _etag; when another
+# request wins the race the session is re-read, the answer re-validated and the
+# write retried. Flushes are conditional on the version they read, and retried
+# the same way.
+
+import os
+import threading
+from datetime import datetime
+
+from session_store import ConcurrencyConflict, get_max_conflict_retries, record_conflict, session_ttl
+
+TOTAL_QUESTIONS = 40
+
+_pending_answers = {}
+_lock = threading.Lock()
+_stats = {"answersWritten": 0, "storeWrites": 0, "flushes": 0}
+
+
+class AnswerRejected(Exception):
+    """Raised when an answer no longer fits the session after re-reading it"""
+
+
+def get_write_mode():
+    """Get the answer write mode from environment or use default"""
+    mode = os.environ.get('ANSWER_WRITE_MODE', 'patch').lower()
+    if mode not in ('patch', 'buffered', 'replace'):
+        raise ValueError(f"Unknown ANSWER_WRITE_MODE: {mode}")
+    return mode
+
+
+def get_flush_every():
+    """Number of buffered answers that triggers a flush"""
+    return max(1, int(os.environ.get('ANSWER_FLUSH_EVERY', 5)))
+
+
+def completion_duration_seconds(created_at, completed_at):
+    """Seconds between two ISO timestamps, or None if either is missing or malformed"""
+    try:
+        created = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        completed = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return max(0, round((completed - created).total_seconds()))
+
+
+def completion_fields(session, completed_at):
+    """Extra fields stored on completion: the duration for analytics and the Completed ttl"""
+    if not completed_at:
+        return None
+    fields = {"ttl": session_ttl("Completed")}
+    duration = completion_duration_seconds(session.get('createdAt'), completed_at)
+    if duration is not None:
+        fields["completionDurationSeconds"] = duration
+    return fields
+
+
+def load_session(store, session_id):
+    """Read a session and overlay any answers still waiting in the write-behind buffer"""
+    session = store.get_session(session_id)
+    if session is None:
+        return None
+
+    with _lock:
+        pending = list(_pending_answers.get(session_id, ()))
+    if not pending:
+        return session
+
+    # Copy so the overlay never leaks into a cached document
+    merged = dict(session)
+    merged['answers'] = list(session.get('answers', [])) + pending
+    return merged
+
+
+def record_answer(store, session, answer_record, completed_at=None, validate=None):
+    """Persist one answer using the configured write mode
+
+    validate(session) returns an error message if the answer no longer applies;
+    it is called on the re-read session after a concurrency conflict, and a
+    message raises AnswerRejected.
+    """
+    mode = get_write_mode()
+    session_id = session['id']
+    status = 'Completed' if completed_at else None
+    fields = completion_fields(session, completed_at)
+    _stats["answersWritten"] += 1
+
+    if mode != 'buffered':
+        max_retries = get_max_conflict_retries()
+        for attempt in range(max_retries + 1):
+            try:
+                _write_answer(store, mode, session, answer_record, status, completed_at, fields)
+                _stats["storeWrites"] += 1
+                return
+            except ConcurrencyConflict:
+                record_conflict(retrying=attempt < max_retries)
+                if attempt == max_retries:
+                    raise
+            session = load_session(store, session_id)
+            error = "Session not found" if session is None else (validate(session) if validate else None)
+            if error:
+                raise AnswerRejected(error)
+
+    with _lock:
+        pending = _pending_answers.setdefault(session_id, [])
+        pending.append(answer_record)
+        should_flush = completed_at is not None or len(pending) >= get_flush_every() \
+            or answer_record.get('questionNumber') == TOTAL_QUESTIONS
+    if should_flush:
+        flush_answers(store, session_id, status=status, completed_at=completed_at, fields=fields)
+
+
+def _write_answer(store, mode, session, answer_record, status, completed_at, fields):
+    if mode == 'replace':
+        session.setdefault('answers', []).append(answer_record)
+        if completed_at:
+            session['status'] = status
+            session['completedAt'] = completed_at
+        session.update(fields or {})
+        store.replace_session(session, etag=session.get('_etag'))
+    else:
+        store.append_answers(session['id'], [answer_record], status=status, completed_at=completed_at,
+                             session=session, fields=fields)
+
+
+def flush_answers(store, session_id, status=None, completed_at=None, fields=None, session=None):
+    """Write all buffered answers for a session in one store operation
+
+    session is the stored document as last read, without buffered answers; its
+    _etag makes the write conditional. Without one the store conditions the
+    write on its own read if it needs one (compact answers are rewritten whole).
+    On a conflict the session is read again and the flush retried.
+    """
+    with _lock:
+        pending = _pending_answers.pop(session_id, [])
+    if not pending and not status:
+        return 0
+
+    try:
+        max_retries = get_max_conflict_retries()
+        for attempt in range(max_retries + 1):
+            try:
+                store.append_answers(session_id, pending, status=status, completed_at=completed_at,
+                                     session=session, fields=fields)
+                break
+            except ConcurrencyConflict:
+                record_conflict(retrying=attempt < max_retries)
+                if attempt == max_retries:
+                    raise
+            session = store.get_session(session_id)
+            if session is None:
+                # Deleted meanwhile; there is nothing left to append to
+                return 0
+    except Exception:
+        # Put the answers back so a later flush can retry them
+        with _lock:
+            _pending_answers[session_id] = pending + _pending_answers.get(session_id, [])
+        raise
+
+    _stats["storeWrites"] += 1
+    _stats["flushes"] += 1
+    return len(pending)
+
+
+def discard_pending(session_id):
+    """Drop buffered answers for a session, e.g. when it is reset"""
+    with _lock:
+        return len(_pending_answers.pop(session_id, []))
+
+
+def flush_all(store):
+    """Flush every buffered session, e.g. on shutdown"""
+    with _lock:
+        session_ids = list(_pending_answers.keys())
+    return sum(flush_answers(store, session_id) for session_id in session_ids)
+
+
+def get_writer_stats():
+    """Report write mode, buffered answers and how many store writes answers cost"""
+    with _lock:
+        buffered = sum(len(answers) for answers in _pending_answers.values())
+        buffered_sessions = len(_pending_answers)
+    return {
+        "mode": get_write_mode(),
+        "flushEvery": get_flush_every(),
+        "bufferedAnswers": buffered,
+        "bufferedSessions": buffered_sessions,
+        "answersWritten": _stats["answersWritten"],
+        "storeWrites": _stats["storeWrites"],
+        "flushes": _stats["flushes"]
+    }
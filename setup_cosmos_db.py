@@ -7,6 +7,20 @@ import os
 import json
 from azure.cosmos import CosmosClient, PartitionKey
 
+# Admin listings page newest first on (createdAt, id); ORDER BY on two properties needs composite indexes.
+# Apply the same policy to an existing container with replace_container to enable continuation paging.
+# replace_container with default_ttl=-1 likewise turns on session expiry for an existing container,
+# and lets the tombstones of deleted rows expire in an existing projections container.
+LISTING_INDEXING_POLICY = {
+    "indexingMode": "consistent",
+    "includedPaths": [{"path": "/*"}],
+    "excludedPaths": [{"path": "/\"_etag\"/?"}],
+    "compositeIndexes": [
+        [{"path": "/createdAt", "order": "descending"}, {"path": "/id", "order": "descending"}],
+        [{"path": "/submittedAt", "order": "descending"}, {"path": "/id", "order": "descending"}]
+    ]
+}
+
 def setup_cosmos_db():
     """Set up the Cosmos DB database and container"""
     
@@ -15,6 +29,13 @@ def setup_cosmos_db():
     cosmos_key = os.environ.get('COSMOS_KEY')
     database_name = os.environ.get('COSMOS_DATABASE_NAME', 'navigator_profiler')
     container_name = os.environ.get('COSMOS_CONTAINER_NAME', 'sessions')
+    jobs_container_name = os.environ.get('COSMOS_JOBS_CONTAINER_NAME', 'jobs')
+    rollups_container_name = os.environ.get('COSMOS_ROLLUPS_CONTAINER_NAME', 'rollups')
+    projections_container_name = os.environ.get('COSMOS_PROJECTIONS_CONTAINER_NAME', 'projections')
+    contacts_container_name = os.environ.get('COSMOS_CONTACTS_CONTAINER_NAME', 'contacts')
+    # The partitioned layout (cosmos-partitioned, cosmos-dual) keys sessions on /pk and keeps contacts apart
+    partitioned = os.environ.get('SESSION_STORE', '').strip().lower() in ("cosmos-partitioned", "cosmos-dual")
+    partition_key_path = "/pk" if partitioned else "/id"
     
     if not cosmos_endpoint or not cosmos_key:
         print("❌ Error: COSMOS_ENDPOINT and COSMOS_KEY must be set in environment")
@@ -38,7 +59,10 @@ def setup_cosmos_db():
         try:
             container = database.create_container_if_not_exists(
                 id=container_name,
-                partition_key=PartitionKey(path="/id"),
+                partition_key=PartitionKey(path=partition_key_path),
+                indexing_policy=LISTING_INDEXING_POLICY,
+                # Enable TTL without a default: sessions expire by their own ttl property, other documents never
+                default_ttl=-1,
                 offer_throughput=400  # Minimum throughput for serverless
             )
             print(f"✅ Container '{container_name}' created/verified")
@@ -46,10 +70,64 @@ def setup_cosmos_db():
             print(f"❌ Error creating container: {e}")
             return False
         
+        # Create container for contact submissions in the partitioned layout
+        if partitioned:
+            try:
+                database.create_container_if_not_exists(
+                    id=contacts_container_name,
+                    partition_key=PartitionKey(path="/sessionId"),
+                    indexing_policy=LISTING_INDEXING_POLICY
+                )
+                print(f"✅ Container '{contacts_container_name}' created/verified")
+            except Exception as e:
+                print(f"❌ Error creating container: {e}")
+                return False
+        
+        # Create container for admin job checkpoints (re-scoring etc.)
+        try:
+            database.create_container_if_not_exists(
+                id=jobs_container_name,
+                partition_key=PartitionKey(path="/id")
+            )
+            print(f"✅ Container '{jobs_container_name}' created/verified")
+        except Exception as e:
+            print(f"❌ Error creating container: {e}")
+            return False
+        
+        # Create container for analytics rollups (one document per day, partitioned by month)
+        try:
+            database.create_container_if_not_exists(
+                id=rollups_container_name,
+                partition_key=PartitionKey(path="/month")
+            )
+            print(f"✅ Container '{rollups_container_name}' created/verified")
+        except Exception as e:
+            print(f"❌ Error creating container: {e}")
+            return False
+        
+        # Create container for change-feed read models (leases are created by the trigger)
+        try:
+            database.create_container_if_not_exists(
+                id=projections_container_name,
+                partition_key=PartitionKey(path="/bucket"),
+                indexing_policy=LISTING_INDEXING_POLICY,
+                # Tombstones of deleted rows expire by their own ttl property, other rows never
+                default_ttl=-1
+            )
+            print(f"✅ Container '{projections_container_name}' created/verified")
+        except Exception as e:
+            print(f"❌ Error creating container: {e}")
+            return False
+        
         print("\n🎉 Cosmos DB setup completed successfully!")
         print(f"📊 Database: {database_name}")
         print(f"📦 Container: {container_name}")
-        print(f"🔑 Partition Key: /id")
+        if partitioned:
+            print(f"📦 Contacts container: {contacts_container_name}")
+        print(f"📦 Jobs container: {jobs_container_name}")
+        print(f"📦 Rollups container: {rollups_container_name}")
+        print(f"📦 Projections container: {projections_container_name}")
+        print(f"🔑 Partition Key: {partition_key_path}")
         
         return True
         
@@ -1,18 +1,199 @@
-# Shared session storage for testing
-# In production, this would be stored in Cosmos DB
+# Shared session storage for the in-memory backend
+# Bounded hot tier: entries are evicted least-recently-used once the entry or
+# byte budget is exceeded, and expire after a per-entry TTL. A session's own ttl
+# property sets it, counted from the last write as Cosmos DB does, and -1 keeps
+# it until evicted; sessions without one fall back to the cache TTLs, where
+# InProgress sessions get a longer TTL so candidates mid-assessment are not
+# dropped. Expired entries are dropped when they are looked up, and a sweep at
+# most every sweep interval drops the ones nobody asks for again. This cache is
+# the in-memory backend's only copy, so expired and evicted sessions alike are
+# handed to the on_expire callback, if set, so the read models can forget them.
 
-session_storage = {}
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
 
-def get_session(session_id):
-    """Get or create a session"""
-    if session_id not in session_storage:
-        session_storage[session_id] = {
-            "id": session_id,
-            "answers": [],
-            "status": "InProgress"
+
+class BoundedSessionCache:
+    """LRU + TTL session cache with hit/miss/eviction counters and byte accounting"""
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 ttl_seconds=3600, in_progress_ttl_seconds=86400, sweep_interval_seconds=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.in_progress_ttl_seconds = in_progress_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._next_sweep = time.monotonic() + sweep_interval_seconds
+        self._entries = OrderedDict()  # session_id -> (session, expires_at, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.sweeps = 0
+        self.on_expire = None
+
+    def _ttl_for(self, session):
+        ttl = session.get("ttl")
+        if ttl == -1:
+            # Cosmos DB's "never expire"; only the LRU budget can drop the entry
+            return float("inf")
+        if isinstance(ttl, int) and ttl > 0:
+            return ttl
+        if session.get("status") == "InProgress":
+            return self.in_progress_ttl_seconds
+        return self.ttl_seconds
+
+    @staticmethod
+    def _approximate_size(session):
+        return len(json.dumps(session, default=str))
+
+    def _remove(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def _expire_entry(self, session_id, expired):
+        # Called with the lock held
+        expired.append(self._remove(session_id)[0])
+        self.expirations += 1
+
+    def _sweep(self, now, expired):
+        # Called with the lock held; a full pass at most once per interval keeps the cost amortised
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval_seconds
+        self.sweeps += 1
+        for session_id in [key for key, entry in self._entries.items() if entry[1] <= now]:
+            self._expire_entry(session_id, expired)
+
+    def _notify(self, expired):
+        # Outside the lock, so the callback may read the cache
+        if expired and self.on_expire:
+            self.on_expire(expired)
+
+    def expire(self):
+        """Drop every expired entry now; returns how many were dropped"""
+        expired = []
+        with self._lock:
+            self._next_sweep = 0
+            self._sweep(time.monotonic(), expired)
+        self._notify(expired)
+        return len(expired)
+
+    def get(self, session_id, default=None):
+        """Return a live session without ever allocating an entry on a miss"""
+        expired = []
+        try:
+            with self._lock:
+                self._sweep(time.monotonic(), expired)
+                entry = self._entries.get(session_id)
+                if entry is None:
+                    self.misses += 1
+                    return default
+                if entry[1] <= time.monotonic():
+                    self._expire_entry(session_id, expired)
+                    self.misses += 1
+                    return default
+                self._entries.move_to_end(session_id)
+                self.hits += 1
+                return entry[0]
+        finally:
+            self._notify(expired)
+
+    def put(self, session):
+        """Insert or refresh a session, evicting the least recently used entries if over budget"""
+        session_id = session["id"]
+        size = self._approximate_size(session)
+        now = time.monotonic()
+        expires_at = now + self._ttl_for(session)
+        expired = []
+        with self._lock:
+            self._sweep(now, expired)
+            self._remove(session_id)
+            self._entries[session_id] = (session, expires_at, size)
+            self._bytes += size
+            # Never evict the entry just written, even if it alone exceeds the byte budget
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                expired.append(self._remove(next(iter(self._entries)))[0])
+                self.evictions += 1
+        self._notify(expired)
+        return session
+
+    def peek(self, session_id):
+        """Return a live session without counting a lookup or changing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(session_id)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            entry = self._remove(session_id)
+        return entry[0] if entry is not None else default
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def keys(self):
+        """Snapshot of the cached session IDs, including entries not yet found expired"""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "approximateBytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "sweeps": self.sweeps
         }
-    return session_storage[session_id]
+
+
+session_storage = BoundedSessionCache(
+    max_entries=int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', 10000)),
+    max_bytes=int(os.environ.get('SESSION_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl_seconds=int(os.environ.get('SESSION_CACHE_TTL_SECONDS', 3600)),
+    in_progress_ttl_seconds=int(os.environ.get('SESSION_CACHE_IN_PROGRESS_TTL_SECONDS', 86400)),
+    sweep_interval_seconds=int(os.environ.get('SESSION_CACHE_SWEEP_SECONDS', 60))
+)
+
+def get_session(session_id):
+    """Get a session, or None if it is unknown or expired"""
+    return session_storage.get(session_id)
+
+def peek_session(session_id):
+    """Get a session for a scan, leaving the LRU order and hit counters alone"""
+    return session_storage.peek(session_id)
 
 def update_session(session):
     """Update a session"""
-    session_storage[session["id"]] = session 
\ No newline at end of file
+    session_storage.put(session)
+
+def delete_session(session_id):
+    """Delete a session; returns True if it was present"""
+    return session_storage.pop(session_id) is not None
+
+def get_storage_stats():
+    """Return cache counters and approximate memory use"""
+    return session_storage.stats()
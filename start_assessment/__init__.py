@@ -1,11 +1,11 @@
 import azure.functions as func
 import logging
 import json
-import uuid
 import os
 from datetime import datetime, timezone
 from typing import Dict, Any
-from shared_session_storage import update_session
+from session_store import get_session_store, issue_session_id, session_ttl
+from analytics_rollups import record_session_started
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -34,11 +34,12 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         nickname = generate_simple_nickname()
         
         # Create session document
-        session_id = str(uuid.uuid4())
+        session_id = issue_session_id()
         session_doc = create_session_document(session_id, nickname)
         
-        # Save session to shared storage for testing
-        update_session(session_doc)
+        # Save session to the configured session store
+        get_session_store().save_session(session_doc)
+        record_session_started(session_doc)
         
         # Return success response
         response_data = {
@@ -97,5 +98,7 @@ def create_session_document(session_id, nickname):
         "completedAt": None,
         "reportFirstViewedAt": None,
         "answers": [],
-        "result": None
+        "result": None,
+        # Abandoned assessments expire on their own; completing one extends it
+        "ttl": session_ttl("InProgress")
     } 
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the admin assessments listing: keyset paging, projection and totals.
+"""
+
+import json
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+import azure.functions as func
+
+import admin
+from continuation import encode_continuation, decode_continuation
+from refresh_cache import RefreshingCache
+
+
+def make_rows(count):
+    return [{"id": f"session-{i:03d}", "createdAt": f"2025-01-01T00:00:{59 - i:02d}+00:00", "status": "Completed"}
+            for i in range(count)]
+
+
+class FakeContainer:
+    """Answers the listing's keyset query and the COUNT from an in-memory list"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def query_items(self, query, enable_cross_partition_query, parameters=(), max_item_count=None):
+        self.queries.append(query)
+        values = {parameter["name"]: parameter["value"] for parameter in parameters}
+        if "COUNT(1)" in query:
+            rows = self.rows
+            for status in ("Completed", "InProgress"):
+                if f"c.status = '{status}'" in query:
+                    rows = [row for row in rows if row["status"] == status]
+            if "IS_STRING(c.reportFirstViewedAt)" in query:
+                rows = [row for row in rows if isinstance(row.get("reportFirstViewedAt"), str)]
+            return iter([len(rows)])
+        rows = sorted(self.rows, key=lambda row: (row["createdAt"], row["id"]), reverse=True)
+        if "@afterId" in values:
+            after = (values["@afterCreatedAt"], values["@afterId"])
+            rows = [row for row in rows if (row["createdAt"], row["id"]) < after]
+        return iter(rows[:values["@limit"]])
+
+
+def list_page(container, continuation=None, limit=2):
+    params = {"limit": str(limit)}
+    if continuation:
+        params["continuation"] = continuation
+    request = func.HttpRequest(method="GET", url="/api/admin/assessments", params=params, body=b"")
+    with patch.object(admin, "get_container", return_value=container):
+        response = admin.main(request)
+    return response.status_code, json.loads(response.get_body())
+
+
+class TestAdminListing(unittest.TestCase):
+
+    def setUp(self):
+        cache = patch.object(admin, "_summary_cache", RefreshingCache("admin-summary", ttl_seconds=60))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    def test_pages_cover_every_session_once(self):
+        container = FakeContainer(make_rows(5))
+        seen, continuation = [], None
+        while True:
+            status, body = list_page(container, continuation)
+            self.assertEqual(status, 200)
+            self.assertEqual(body["pagination"]["total"], 5)
+            seen.extend(session["id"] for session in body["sessions"])
+            continuation = body["pagination"]["continuationToken"]
+            if continuation is None:
+                break
+        self.assertEqual(seen, [f"session-{i:03d}" for i in range(5)])
+
+    def test_deep_pages_seek_instead_of_offset(self):
+        container = FakeContainer(make_rows(3))
+        list_page(container, encode_continuation(("2025-01-01T00:00:58+00:00", "session-001")))
+        listing_query = next(query for query in container.queries if "TOP @limit" in query)
+        self.assertNotIn("OFFSET", listing_query)
+        self.assertNotIn("SELECT *", listing_query)
+        self.assertIn("c.id < @afterId", listing_query)
+
+    def test_invalid_token_and_offset_are_rejected(self):
+        self.assertEqual(list_page(FakeContainer([]), "not-a-token")[0], 400)
+        request = func.HttpRequest(method="GET", url="/api/admin/assessments", params={"offset": "10"}, body=b"")
+        self.assertEqual(admin.main(request).status_code, 400)
+
+    @patch.dict(os.environ, {"SESSION_STORE": "cosmos-dual"})
+    def test_listing_waits_for_the_layout_cutover(self):
+        status, body = list_page(FakeContainer(make_rows(3)))
+        self.assertEqual(status, 409)
+        self.assertIn("cosmos-partitioned", body["error"])
+
+    def test_summary_is_computed_once_for_repeated_requests(self):
+        container = FakeContainer(make_rows(3))
+        for _ in range(3):
+            status, body = list_page(container)
+        summary_queries = [query for query in container.queries if "TOP @limit" not in query and "c.status = @status" not in query]
+        # Four filtered summary counts plus one COUNT for pagination.total per request
+        self.assertEqual(len(summary_queries), 4 + 3)
+        self.assertEqual(body["summary"]["completedSessions"], 3)
+        self.assertEqual(body["summary"]["completionRate"], 100.0)
+        self.assertIsNotNone(body["summaryCache"]["ageSeconds"])
+
+    def test_token_round_trip(self):
+        key = ("2025-01-01T00:00:00+00:00", "session-001")
+        self.assertEqual(decode_continuation(encode_continuation(key)), key)
+        self.assertIsNone(encode_continuation(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained analytics rollups, run against the in-process backend,
+and for the response cache in front of /api/analytics.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch, MagicMock
+
+import azure.functions as func
+from azure.cosmos import exceptions
+
+import analytics
+import analytics_rollups
+import session_store
+from refresh_cache import RefreshingCache
+from analytics_rollups import (record_session_started, record_session_completed, record_report_generated,
+                               record_archetype_changed, record_session_reset, get_rollup_metrics,
+                               rebuild_rollups, get_activity)
+
+NOW = datetime(2025, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+
+def make_session(session_id, days_ago=0):
+    created_at = (NOW - timedelta(days=days_ago, hours=1)).isoformat()
+    return {"id": session_id, "status": "InProgress", "answers": [], "createdAt": created_at}
+
+
+def complete(session, minutes):
+    completed_at = (datetime.fromisoformat(session['createdAt']) + timedelta(minutes=minutes)).isoformat()
+    session.update({"status": "Completed", "completedAt": completed_at, "completionDurationSeconds": minutes * 60})
+    record_session_completed(session, completed_at)
+
+
+def view_report(session, archetype):
+    result = {"primaryArchetype": archetype, "reportContent": "# Report"}
+    session.update({"result": result, "reportFirstViewedAt": NOW.isoformat()})
+    record_report_generated(session, result)
+
+
+class TestAnalyticsRollups(unittest.TestCase):
+
+    def setUp(self):
+        env = patch.dict(os.environ, {"ANALYTICS_ROLLUP_STORE": "memory"})
+        env.start()
+        self.addCleanup(env.stop)
+        rollups = patch.dict(analytics_rollups._rollups, {"memory": analytics_rollups.InMemoryRollups()})
+        rollups.start()
+        self.addCleanup(rollups.stop)
+
+        self.sessions = [make_session("today-1"), make_session("today-2"), make_session("old", days_ago=10)]
+        for session in self.sessions:
+            record_session_started(session)
+        complete(self.sessions[0], 10)
+        view_report(self.sessions[0], "The Curious Experimenter")
+        complete(self.sessions[2], 20)
+        view_report(self.sessions[2], "The Critical Interrogator")
+
+    def test_period_sums_day_documents(self):
+        metrics = get_rollup_metrics('7d', now=NOW)
+        self.assertEqual(metrics['sessions'], {"total": 2, "completed": 1, "inProgress": 1, "completionRate": 50.0})
+        self.assertEqual(metrics['performance']['averageCompletionTimeMinutes'], 10.0)
+        self.assertEqual(metrics['archetypeDistribution'], {"The Curious Experimenter": 1})
+        self.assertEqual(metrics['dailyActivity']['2025-01-10'], 2)
+        self.assertEqual(len(metrics['dailyActivity']), 7)
+
+    def test_all_time_reads_the_total(self):
+        metrics = get_rollup_metrics('all', now=NOW)
+        self.assertEqual(metrics['sessions']['total'], 3)
+        self.assertEqual(metrics['performance']['averageCompletionTimeMinutes'], 15.0)
+        self.assertEqual(metrics['performance']['reportsViewed'], 2)
+        self.assertEqual(metrics['periodStats']['startDate'], "all time")
+
+    def test_reset_and_rescoring_move_the_counts(self):
+        record_archetype_changed(self.sessions[2], "The Critical Interrogator", "The Curious Experimenter")
+        record_session_reset(self.sessions[0])
+        metrics = get_rollup_metrics('all', now=NOW)
+        self.assertEqual(metrics['sessions']['completed'], 1)
+        self.assertEqual(metrics['performance']['averageCompletionTimeMinutes'], 20.0)
+        self.assertEqual(metrics['performance']['reportsGenerated'], 1)
+        self.assertEqual(metrics['archetypeDistribution'], {"The Curious Experimenter": 1})
+
+    def test_percentiles_merge_across_days_and_reset(self):
+        session = make_session("timed")
+        started = datetime.fromisoformat(session['createdAt'])
+        session['answers'] = [{"questionNumber": n, "submittedAt": (started + timedelta(seconds=8 * n)).isoformat()}
+                              for n in range(1, 40)]
+        record_session_started(session)
+        complete(session, 30)
+
+        performance = get_rollup_metrics('all', now=NOW)['performance']
+        self.assertAlmostEqual(performance['completionTimeMinutes']['p50'], 20.0, delta=0.2)
+        # 39 answers 8 s apart, then the last one after the remaining 30 min - 312 s
+        self.assertAlmostEqual(performance['answerLatencySeconds']['p50'], 8.0, delta=0.1)
+        self.assertAlmostEqual(performance['answerLatencySeconds']['p99'], 8.0, delta=0.1)
+
+        record_session_reset(session)
+        performance = get_rollup_metrics('all', now=NOW)['performance']
+        self.assertEqual(performance['answerLatencySeconds'], {"p50": None, "p90": None, "p99": None})
+        self.assertAlmostEqual(performance['completionTimeMinutes']['p50'], 10.0, delta=0.1)
+
+    def test_activity_counts_events_in_the_hour_they_happened(self):
+        day = NOW.replace(hour=0)
+        hourly = get_activity(NOW - timedelta(hours=2), NOW, "hour")
+        self.assertEqual([bucket["started"] for bucket in hourly["buckets"]], [0, 2])
+        # Completed at 11:10; the report view at 12:00 falls outside [10:00, 12:00)
+        self.assertEqual(hourly["totals"], {"started": 2, "completed": 1, "reportsViewed": 0})
+
+        # The old session was started ten days ago but completed (20 minutes later) on that day too
+        daily = get_activity(day - timedelta(days=10), day + timedelta(days=1))
+        self.assertEqual(len(daily["buckets"]), 11)
+        self.assertEqual(daily["buckets"][0], {"start": (day - timedelta(days=10)).isoformat(),
+                                               "started": 1, "completed": 1, "reportsViewed": 0})
+        self.assertEqual(daily["buckets"][-1]["completed"], 1)
+        self.assertEqual(daily["totals"], {"started": 3, "completed": 2, "reportsViewed": 2})
+
+        record_session_reset(self.sessions[2])
+        self.assertEqual(get_activity(day - timedelta(days=10), day + timedelta(days=1))["totals"],
+                         {"started": 3, "completed": 1, "reportsViewed": 1})
+        with self.assertRaises(ValueError):
+            get_activity(day - timedelta(days=400), day)
+
+    def test_query_source_reads_completion_times_from_the_rollups(self):
+        container = MagicMock()
+        container.query_items.return_value = [0]
+        metrics = analytics.get_analytics_data(container, None, 'all')
+        expected = get_rollup_metrics('all', now=NOW)['performance']
+        for name in ('averageCompletionTimeMinutes', 'completionTimeMinutes', 'answerLatencySeconds'):
+            self.assertEqual(metrics['performance'][name], expected[name])
+        self.assertEqual(metrics['performance']['averageCompletionTimeMinutes'], 15.0)
+        self.assertEqual(metrics['periodStats']['timingsStartDate'], "all time")
+        # Only single-value aggregates run against the sessions; nothing is streamed
+        queries = [call.kwargs["query"] for call in container.query_items.call_args_list]
+        self.assertTrue(all(query.startswith("SELECT VALUE ") for query in queries))
+
+    def test_rebuild_matches_incremental_counts(self):
+        incremental = get_rollup_metrics('all', now=NOW)
+        activity_range = (NOW - timedelta(days=30), NOW + timedelta(days=1))
+        incremental_activity = get_activity(*activity_range)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = session_store.SqliteSessionStore(os.path.join(temp_dir, "sessions.db"))
+            for session in self.sessions:
+                store.save_session(session)
+            analytics_rollups.get_rollups().replace_all([])
+            rebuild_rollups(store)
+        rebuilt = get_rollup_metrics('all', now=NOW)
+        self.assertEqual(rebuilt['sessions'], incremental['sessions'])
+        self.assertEqual(rebuilt['performance'], incremental['performance'])
+        self.assertEqual(rebuilt['archetypeDistribution'], incremental['archetypeDistribution'])
+        self.assertEqual(get_activity(*activity_range), incremental_activity)
+
+
+class TestAnalyticsResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        cache = patch.object(analytics, "_response_cache", RefreshingCache("analytics", ttl_seconds=60))
+        cache.start()
+        self.addCleanup(cache.stop)
+        self.calls = []
+        build = patch.object(analytics, "build_response", side_effect=self.build_response)
+        build.start()
+        self.addCleanup(build.stop)
+
+    def build_response(self, period):
+        self.calls.append(period)
+        return b'{"period": "%s"}' % period.encode(), 'W/"%d"' % len(self.calls)
+
+    def get(self, params=None, headers=None):
+        return analytics.main(func.HttpRequest(method="GET", url="/api/analytics", params=params or {},
+                                               headers=headers or {}, body=b""))
+
+    def test_periods_are_cached_separately(self):
+        for period in ("7d", "7d", "30d"):
+            response = self.get({"period": period})
+        self.assertEqual(self.calls, ["7d", "30d"])
+        self.assertEqual(response.headers["ETag"], 'W/"2"')
+        self.assertIn("max-age=", response.headers["Cache-Control"])
+        self.assertEqual(response.headers["Age"], "0")
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.get().headers["ETag"]
+        self.assertEqual(self.get(headers={"If-None-Match": etag}).status_code, 304)
+
+    @patch.dict(os.environ, {"ANALYTICS_MIN_REFRESH_SECONDS": "0"})
+    def test_refresh_recomputes(self):
+        self.get()
+        self.get({"refresh": "true"})
+        self.assertEqual(len(self.calls), 2)
+
+    def test_refresh_is_rate_limited(self):
+        self.get()
+        self.get({"refresh": "true"})
+        self.assertEqual(len(self.calls), 1)
+
+    def test_cold_cache_error_returns_500(self):
+        with patch.object(analytics, "build_response", side_effect=RuntimeError("Cosmos DB unavailable")):
+            self.assertEqual(self.get().status_code, 500)
+        self.assertIsNone(analytics._response_cache.peek("7d"))
+
+    @patch.dict(os.environ, {"ANALYTICS_MIN_REFRESH_SECONDS": "0"})
+    def test_failed_refresh_keeps_serving_the_previous_response(self):
+        body = self.get().get_body()
+        with patch.object(analytics, "build_response", side_effect=RuntimeError("Cosmos DB unavailable")):
+            response = self.get({"refresh": "true"})
+        self.assertEqual((response.status_code, response.get_body()), (200, body))
+        self.assertEqual(analytics._response_cache.stats()["errors"], 1)
+
+    def test_query_errors_propagate(self):
+        container = MagicMock()
+        container.query_items.side_effect = exceptions.CosmosHttpResponseError(status_code=503, message="Unavailable")
+        with self.assertRaises(exceptions.CosmosHttpResponseError):
+            analytics.get_analytics_data(container, None)
+
+
+class TestCosmosRollups(unittest.TestCase):
+
+    def test_documents_without_sketch_maps_get_them_added(self):
+        container = MagicMock()
+        container.execute_item_batch.side_effect = [
+            exceptions.CosmosBatchOperationError(error_index=0, headers={}, status_code=400,
+                                               operation_responses=[{"statusCode": 400}]), None]
+        # Twelve increments exceed one patch, so they go out as one transactional batch
+        increments = {f"answerLatencySketch/{key}": 1 for key in range(12)}
+        with patch.object(analytics_rollups.CosmosRollups, "container", container):
+            analytics_rollups.CosmosRollups().increment("2025-01-10", increments)
+
+        added = [call.kwargs for call in container.patch_item.call_args_list]
+        self.assertEqual([kwargs["filter_predicate"] for kwargs in added],
+                         [f"FROM c WHERE NOT IS_DEFINED(c.{name})" for name in analytics_rollups.ROLLUP_MAPS])
+        self.assertEqual(container.execute_item_batch.call_count, 2)
+        batch = container.execute_item_batch.call_args.kwargs["batch_operations"]
+        self.assertEqual([len(operation[1][1]) for operation in batch], [10, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
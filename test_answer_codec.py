@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the compact answer storage encoding.
+"""
+
+import json
+import os
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import answer_codec
+from item_bank import get_question_pair, get_construct_for_statement_id
+
+CREATED_AT = datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc)
+
+
+def make_answers(count):
+    answers = []
+    for question_number in range(1, count + 1):
+        chosen = 'B' if question_number % 3 == 0 else 'A'
+        statement = get_question_pair(question_number)[chosen]
+        answers.append({
+            "questionNumber": question_number,
+            "chosenStatementId": chosen,
+            "chosenStatement": statement,
+            "constructId": get_construct_for_statement_id(statement['id']),
+            "submittedAt": (CREATED_AT + timedelta(seconds=7 * question_number)).isoformat()
+        })
+    return answers
+
+
+class TestAnswerCodec(unittest.TestCase):
+
+    def test_round_trip_full_assessment(self):
+        answers = make_answers(40)
+        packed = answer_codec.encode_answers(answers, CREATED_AT.isoformat())
+        self.assertEqual(packed["n"], 40)
+        self.assertLess(packed["mask"], 1 << 40)
+        self.assertEqual(answer_codec.decode_answers(packed, CREATED_AT.isoformat()), answers)
+
+    def test_packed_document_is_much_smaller(self):
+        answers = make_answers(40)
+        packed = answer_codec.encode_answers(answers, CREATED_AT.isoformat())
+        self.assertLess(len(json.dumps(packed)) * 10, len(json.dumps(answers)))
+
+    def test_sub_millisecond_timestamps_round_trip(self):
+        answers = make_answers(3)
+        answers[0]["submittedAt"] = (CREATED_AT + timedelta(seconds=4, microseconds=123457)).isoformat()
+        answers[1]["submittedAt"] = (CREATED_AT + timedelta(seconds=9, microseconds=999)).isoformat()
+        # A clock step backwards is kept rather than clamped
+        answers[2]["submittedAt"] = (CREATED_AT + timedelta(seconds=8, microseconds=500001)).isoformat()
+        packed = answer_codec.encode_answers(answers, CREATED_AT.isoformat())
+        self.assertEqual(answer_codec.decode_answers(packed, CREATED_AT.isoformat()), answers)
+
+    def test_millisecond_latencies_still_decode(self):
+        packed = {"v": answer_codec.ITEM_BANK_VERSION, "n": 2, "mask": 0, "lat": [7000, 1500]}
+        decoded = answer_codec.decode_answers(packed, CREATED_AT.isoformat())
+        self.assertEqual([answer["submittedAt"] for answer in decoded],
+                         [(CREATED_AT + timedelta(seconds=7)).isoformat(),
+                          (CREATED_AT + timedelta(seconds=8.5)).isoformat()])
+
+    def test_latencies_are_optional(self):
+        answers = make_answers(3)
+        packed = answer_codec.encode_answers(answers)
+        self.assertNotIn("latUs", packed)
+        decoded = answer_codec.decode_answers(packed)
+        self.assertEqual([a["chosenStatementId"] for a in decoded], ['A', 'A', 'B'])
+        self.assertIsNone(decoded[0]["submittedAt"])
+
+    def test_unknown_item_bank_version(self):
+        with self.assertRaises(ValueError):
+            answer_codec.decode_answers({"v": 99, "n": 1, "mask": 0})
+
+    @patch.dict(os.environ, {"ANSWER_STORAGE_FORMAT": "compact"})
+    def test_other_item_bank_version_keeps_the_stored_answers(self):
+        document = {"id": "s1", "answers": make_answers(1), "answersPacked": {"v": 99, "n": 2, "mask": 2}}
+        with self.assertLogs(level="WARNING"):
+            session = answer_codec.from_stored(document)
+        self.assertEqual(session["answers"], make_answers(1))
+        self.assertEqual(answer_codec.to_stored(session)["answersPacked"], {"v": 99, "n": 2, "mask": 2})
+
+    @patch.dict(os.environ, {"ANSWER_STORAGE_FORMAT": "compact"})
+    def test_to_stored_and_back(self):
+        session = {"id": "s1", "createdAt": CREATED_AT.isoformat(), "answers": make_answers(5)}
+        stored = answer_codec.to_stored(session)
+        self.assertNotIn("answers", stored)
+        self.assertEqual(answer_codec.count_answers(stored), 5)
+        self.assertEqual(answer_codec.from_stored(stored), session)
+
+    @patch.dict(os.environ, {"ANSWER_STORAGE_FORMAT": "compact"})
+    def test_out_of_order_answers_stay_json(self):
+        answers = make_answers(3)[1:]
+        session = {"id": "s1", "answers": answers}
+        self.assertIs(answer_codec.to_stored(session), session)
+
+    @patch.dict(os.environ, {"ANSWER_STORAGE_FORMAT": "json"})
+    def test_json_format_is_unchanged(self):
+        session = {"id": "s1", "answers": make_answers(2)}
+        self.assertIs(answer_codec.to_stored(session), session)
+
+
+if __name__ == '__main__':
+    unittest.main()
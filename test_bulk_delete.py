@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk delete engine: per-partition batches, fallback to point deletes and 429 backoff.
+"""
+
+import threading
+import unittest
+from unittest.mock import patch
+
+import azure.cosmos.exceptions as exceptions
+
+import bulk_delete
+from bulk_delete import BulkDeleter, AdaptiveConcurrency
+
+
+class FakeContainer:
+    """Point and batch deletes over {id: partition key}, throttling the first requests if asked"""
+
+    def __init__(self, items, throttle=0):
+        self.items = dict(items)
+        self.throttle = throttle
+        self.batches = []
+        self.point_deletes = 0
+        self._lock = threading.Lock()
+
+    def _throttled(self):
+        with self._lock:
+            if self.throttle:
+                self.throttle -= 1
+                return True
+        return False
+
+    def delete_item(self, item, partition_key, **kwargs):
+        if self._throttled():
+            raise exceptions.CosmosHttpResponseError(status_code=429, message="Too many requests")
+        with self._lock:
+            if self.items.get(item) != partition_key:
+                raise exceptions.CosmosResourceNotFoundError(message="Not found")
+            del self.items[item]
+            self.point_deletes += 1
+
+    def execute_item_batch(self, batch_operations, partition_key, **kwargs):
+        if self._throttled():
+            raise exceptions.CosmosBatchOperationError(error_index=0, headers={"x-ms-retry-after-ms": "5"},
+                                                       status_code=429, operation_responses=[{"statusCode": 429}])
+        with self._lock:
+            ids = [operation[1][0] for operation in batch_operations]
+            for index, item_id in enumerate(ids):
+                if self.items.get(item_id) != partition_key:
+                    raise exceptions.CosmosBatchOperationError(error_index=index, headers={}, status_code=404,
+                                                               operation_responses=[{"statusCode": 404}] * len(ids))
+            for item_id in ids:
+                del self.items[item_id]
+            self.batches.append(len(ids))
+
+
+class TestBulkDeleter(unittest.TestCase):
+
+    def test_batches_per_partition(self):
+        items = {f"s-{index:03d}": f"acme|2025-0{index % 2 + 1}" for index in range(250)}
+        container = FakeContainer(items)
+        result = BulkDeleter(container, concurrency=4, ru_per_second=0).delete(items.items())
+        self.assertEqual((result["deleted"], result["missing"], result["failed"]), (250, 0, 0))
+        self.assertEqual(container.items, {})
+        self.assertEqual(sorted(container.batches), [25, 25, 100, 100])
+
+    def test_groups_are_formed_a_chunk_at_a_time(self):
+        consumed = []
+
+        def items():
+            for index in range(25):
+                consumed.append(index)
+                yield f"doc-{index}", f"pk-{index % 2}"
+
+        with patch.object(bulk_delete, "GROUPING_CHUNK_ITEMS", 10):
+            groups = BulkDeleter._groups(items())
+            self.assertEqual(next(groups), ("pk-0", ["doc-0", "doc-2", "doc-4", "doc-6", "doc-8"]))
+            self.assertEqual(len(consumed), 10)
+            self.assertEqual(sum(len(ids) for _, ids in groups), 20)
+
+    def test_single_document_partitions_use_point_deletes(self):
+        items = {f"s-{index}": f"s-{index}" for index in range(30)}
+        container = FakeContainer(items)
+        progress = []
+        result = BulkDeleter(container, concurrency=8, ru_per_second=0, progress=progress.append,
+                             progress_every=10).delete(list(items.items()) + [("gone", "gone")])
+        self.assertEqual((result["deleted"], result["missing"]), (30, 1))
+        self.assertEqual(container.point_deletes, 30)
+        self.assertGreater(len(progress), 1)
+
+    def test_missing_document_splits_batch(self):
+        container = FakeContainer({"a": "p", "b": "p", "c": "p"})
+        deleted = []
+        result = BulkDeleter(container, concurrency=2, ru_per_second=0).delete([("a", "p"), ("x", "p"), ("c", "p")],
+                                                                               on_deleted=deleted.extend)
+        self.assertEqual((result["deleted"], result["missing"]), (2, 1))
+        self.assertEqual(container.items, {"b": "p"})
+        self.assertEqual(sorted(deleted), ["a", "c"])
+
+    @patch.object(bulk_delete.time, "sleep")
+    def test_throttling_backs_off_and_retries(self, sleep):
+        items = {f"s-{index}": "p" for index in range(150)}
+        container = FakeContainer(items, throttle=2)
+        deleter = BulkDeleter(container, concurrency=8, ru_per_second=0)
+        result = deleter.delete(items.items())
+        self.assertEqual((result["deleted"], result["failed"], result["throttled"]), (150, 0, 2))
+        sleep.assert_any_call(0.005)
+
+    @patch.object(bulk_delete.time, "sleep")
+    def test_gives_up_after_max_retries(self, sleep):
+        container = FakeContainer({"a": "a"}, throttle=10)
+        result = BulkDeleter(container, ru_per_second=0, max_retries=2).delete([("a", "a")])
+        self.assertEqual(result["failed"], 1)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_adaptive_concurrency(self):
+        limiter = AdaptiveConcurrency(8)
+        limiter.acquire()
+        limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 4)
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release()
+        self.assertEqual(limiter.limit, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Tests for patch-based session resets: per-ID bulk results, conflict retries, the Cosmos DB patch and the endpoint.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import azure.functions as func
+
+import bulk_reset
+import session_bulk_reset
+import session_store
+from answer_codec import from_stored, encode_answers
+from bulk_reset import reset_session, reset_sessions, reset_fields
+
+
+def make_session(session_id, status="Completed"):
+    return {"id": session_id, "nickname": "Aqua-Badger-88", "status": status,
+            "createdAt": "2025-01-01T00:00:00+00:00", "completedAt": "2025-01-01T00:10:00+00:00",
+            "answers": [{"questionNumber": number, "chosenStatementId": "A"} for number in range(1, 41)],
+            "result": {"primaryArchetype": "Explorer"}, "reportFirstViewedAt": "2025-01-02T00:00:00+00:00"}
+
+
+class TestBulkReset(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.store = session_store.SqliteSessionStore(os.path.join(temp_dir.name, "sessions.db"))
+        for index in range(20):
+            self.store.save_session(make_session(f"loadtest-{index:02d}"))
+        self.store.save_session(make_session("live-00"))
+        rollups = patch.object(bulk_reset, "record_session_reset")
+        self.record_session_reset = rollups.start()
+        self.addCleanup(rollups.stop)
+
+    def test_resets_every_session_and_reports_per_id(self):
+        ids = [f"loadtest-{index:02d}" for index in range(20)] + ["missing"]
+        summary = reset_sessions(ids, store=self.store, concurrency=8)
+        self.assertEqual((summary["reset"], summary["notFound"], summary["failed"]), (20, 1, 0))
+        self.assertEqual([result["sessionId"] for result in summary["results"]], ids)
+        self.assertEqual(summary["results"][-1]["result"], "notFound")
+
+        session = self.store.get_session("loadtest-07")
+        self.assertEqual((session["status"], session["answers"], session["result"]), ("InProgress", [], None))
+        self.assertIsNone(session["reportFirstViewedAt"])
+        self.assertEqual(session["nickname"], "Aqua-Badger-88")
+        self.assertEqual(self.store.get_session("live-00")["status"], "Completed")
+        # The rollups are given the version each reset replaced
+        self.assertEqual(self.record_session_reset.call_count, 20)
+        self.assertEqual(self.record_session_reset.call_args[0][0]["status"], "Completed")
+
+    def test_conflicting_update_is_retried_on_a_fresh_read(self):
+        update_fields = self.store.update_fields
+        calls = []
+
+        def conflict_once(session_id, fields, session=None):
+            calls.append(session_id)
+            if len(calls) == 1:
+                raise session_store.ConcurrencyConflict("changed")
+            return update_fields(session_id, fields, session=session)
+
+        with patch.object(self.store, "update_fields", side_effect=conflict_once):
+            self.assertEqual(reset_session(self.store, "loadtest-00")["status"], "InProgress")
+        self.assertEqual(len(calls), 2)
+
+    def test_failures_are_reported_not_raised(self):
+        with patch.object(self.store, "update_fields", side_effect=RuntimeError("boom")):
+            summary = reset_sessions(["loadtest-00"], store=self.store)
+        self.assertEqual(summary["results"], [{"sessionId": "loadtest-00", "result": "failed", "error": "boom"}])
+
+    def test_cosmos_reset_is_one_conditional_patch(self):
+        container = MagicMock()
+        container.patch_item.return_value = {"id": "s-1", "status": "InProgress", "answers": [],
+                                              "answersPacked": None}
+        store = session_store.CosmosSessionStore()
+        with patch.object(session_store, "get_container", return_value=container):
+            updated = store.update_fields("s-1", reset_fields(), session={"id": "s-1", "_etag": "v1"})
+        self.assertEqual(updated["answers"], [])
+        kwargs = container.patch_item.call_args.kwargs
+        paths = [operation["path"] for operation in kwargs["patch_operations"]]
+        self.assertIn("/answersPacked", paths)
+        self.assertLessEqual(len(paths), store.MAX_PATCH_OPERATIONS)
+        self.assertEqual(kwargs["etag"], "v1")
+        container.replace_item.assert_not_called()
+
+    def test_cleared_packed_answers_are_not_decoded(self):
+        packed = encode_answers([{"questionNumber": 1, "chosenStatementId": "A"}], None)
+        self.assertEqual(len(from_stored({"id": "s-1", "answers": [], "answersPacked": packed})["answers"]), 1)
+        self.assertEqual(from_stored({"id": "s-1", "answers": [], "answersPacked": None})["answers"], [])
+
+
+class TestBulkResetEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.store = session_store.SqliteSessionStore(os.path.join(temp_dir.name, "sessions.db"))
+        for index in range(5):
+            self.store.save_session(make_session(f"loadtest-{index}"))
+        self.store.save_session(make_session("live-0"))
+        for target, name in ((session_bulk_reset, "get_session_store"), (bulk_reset, "record_session_reset")):
+            patcher = patch.object(target, name, return_value=self.store)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def reset(self, body, **params):
+        request = func.HttpRequest(method="POST", url="/api/admin/sessions/reset", params=params,
+                                   body=json.dumps(body).encode())
+        response = session_bulk_reset.main(request)
+        return response.status_code, json.loads(response.get_body())
+
+    def test_resets_listed_ids(self):
+        status, body = self.reset({"sessionIds": ["loadtest-0", "nope"]}, concurrency="2")
+        self.assertEqual(status, 200)
+        self.assertEqual([result["result"] for result in body["results"]], ["reset", "notFound"])
+
+    def test_resets_sessions_matching_a_filter(self):
+        status, body = self.reset({"status": "Completed", "idPrefix": "loadtest-", "limit": 3})
+        self.assertEqual(status, 200)
+        self.assertEqual(body["reset"], 3)
+        self.assertEqual(self.store.get_session("live-0")["status"], "Completed")
+
+    def test_concurrency_is_capped_at_the_configured_value(self):
+        with patch.dict(os.environ, {"BULK_RESET_CONCURRENCY": "4"}), \
+                patch.object(session_bulk_reset, "reset_sessions", wraps=reset_sessions) as reset:
+            self.assertEqual(self.reset({"sessionIds": ["loadtest-0"]}, concurrency="1000")[0], 200)
+            self.assertEqual(self.reset({"sessionIds": ["loadtest-0"]}, concurrency="2")[0], 200)
+        self.assertEqual([call.kwargs["concurrency"] for call in reset.call_args_list], [4, 2])
+
+    def test_matching_stops_reading_pages_at_the_limit(self):
+        pages = [([{"id": f"loadtest-{page}{index}"} for index in range(3)], None) for page in range(3)]
+        store = MagicMock()
+        store.iter_session_pages.return_value = iter(pages)
+        self.assertEqual(list(bulk_reset.iter_matching_ids(store, id_prefix="loadtest-", limit=4)),
+                         ["loadtest-00", "loadtest-01", "loadtest-02", "loadtest-10"])
+        # The third page was never requested
+        self.assertEqual(next(store.iter_session_pages.return_value), pages[2])
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.reset({})[0], 400)
+        self.assertEqual(self.reset({"sessionIds": "loadtest-0"})[0], 400)
+        self.assertEqual(self.reset({"status": "Archived"})[0], 400)
+        self.assertEqual(self.reset({"idPrefix": "loadtest-", "limit": 0})[0], 400)
+        self.assertEqual(self.reset({"idPrefix": "loadtest-", "limit": "all"})[0], 400)
+        self.assertEqual(self.reset({"idPrefix": "loadtest-"}, concurrency="many")[0], 400)
+        with patch.dict(os.environ, {"BULK_RESET_MAX_SESSIONS": "1"}):
+            self.assertEqual(self.reset({"sessionIds": ["a", "b"]})[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
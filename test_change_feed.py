@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the change-feed projections, fed by the local event log of the SQLite session store.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import change_feed
+import session_store
+from change_feed import LocalChangeFeed, SqliteProjections, CosmosProjections
+
+
+def make_session(session_id, status="InProgress", archetype=None):
+    session = {"id": session_id, "nickname": f"Nick-{session_id}", "status": status,
+               "createdAt": f"2025-01-0{session_id[-1]}T10:00:00+00:00", "answers": []}
+    if archetype:
+        session["result"] = {"primaryArchetype": archetype, "secondaryArchetype": None}
+        session["reportFirstViewedAt"] = "2025-01-09T10:00:00+00:00"
+    return session
+
+
+class TestLocalChangeFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"CHANGE_FEED_ENABLED": "true",
+                                      "CHANGE_FEED_LOG_PATH": os.path.join(self.temp_dir.name, "changes.jsonl")})
+        env.start()
+        self.addCleanup(env.stop)
+        # Poll explicitly instead of through the background consumer
+        consumer = patch.object(change_feed, "ensure_local_consumer")
+        consumer.start()
+        self.addCleanup(consumer.stop)
+
+        self.store = session_store.SqliteSessionStore(os.path.join(self.temp_dir.name, "sessions.db"))
+        self.projections = SqliteProjections(os.path.join(self.temp_dir.name, "projections.db"))
+        self.feed = LocalChangeFeed(self.projections, batch_size=2)
+
+    def test_projects_status_counts_listing_and_contacts(self):
+        self.store.save_session(make_session("s1"))
+        self.store.save_session(make_session("s2"))
+        completed = make_session("s1", "Completed", "The Curious Experimenter")
+        self.store.replace_session(completed)
+        self.store.save_contact({"id": "s1_contact", "sessionId": "s1", "name": "Ada", "email": "a@b.co",
+                                 "message": "Hi", "submittedAt": "2025-01-09T11:00:00+00:00"})
+
+        self.assertEqual(self.feed.catch_up(), 4)
+        self.assertEqual(self.feed.backlog_bytes(), 0)
+        summary = change_feed.summary_from_counters(self.projections.get_counters())
+        self.assertEqual((summary["totalSessions"], summary["completedSessions"], summary["inProgressSessions"]),
+                         (2, 1, 1))
+        self.assertEqual(summary["archetypeDistribution"], {"The Curious Experimenter": 1})
+        self.assertEqual(summary["contacts"], 1)
+        self.assertEqual([row["id"] for row in self.projections.list_rows("session")], ["s2", "s1"])
+        self.assertEqual([row["id"] for row in self.projections.list_rows("session", "Completed")], ["s1"])
+        self.assertIsNotNone(self.projections.get_status()["lagSeconds"])
+
+    def test_redelivered_changes_are_not_counted_twice(self):
+        self.store.save_session(make_session("s1", "Completed", "The Critical Interrogator"))
+        changes, _ = self.feed._read_batch(0)
+        self.assertEqual(self.projections.apply(changes), (1, 0))
+        self.assertEqual(self.projections.apply(changes), (0, 1))
+        self.assertEqual(self.projections.get_counters()["archetypes:The Critical Interrogator"], 1)
+
+    def test_delete_removes_row_and_counts(self):
+        self.store.save_session(make_session("s1"))
+        self.store.delete_session("s1")
+        self.feed.catch_up()
+        self.assertEqual(self.projections.list_rows("session"), [])
+        self.assertEqual(self.projections.get_counters().get("total"), 0)
+
+    def test_only_the_lease_holder_applies_changes(self):
+        self.store.save_session(make_session("s1"))
+        other = LocalChangeFeed(self.projections, batch_size=2)
+        self.assertEqual(self.feed.poll(), 1)
+        self.store.save_session(make_session("s2"))
+        self.assertEqual(other.poll(), 0)
+        self.assertEqual(self.feed.poll(), 1)
+
+
+class TestCosmosProjections(unittest.TestCase):
+
+    def test_row_and_counter_delta_are_one_batch(self):
+        container = MagicMock()
+        previous = change_feed.project(make_session("s1"), 5, 100.0)
+        previous["_etag"] = "etag-1"
+        container.read_item.return_value = previous
+        with patch.object(CosmosProjections, "container", container):
+            applied = CosmosProjections()._apply_one(
+                "upsert", make_session("s1", "Completed", "The Critical Interrogator"), 6, 101.0)
+
+        self.assertTrue(applied)
+        operations = container.execute_item_batch.call_args.kwargs["batch_operations"]
+        self.assertEqual(operations[0][0], "replace")
+        self.assertEqual(operations[0][2], {"if_match_etag": "etag-1"})
+        increments = {op["path"]: op["value"] for op in operations[1][1][1]}
+        self.assertEqual(increments, {"/counters/status:Completed": 1, "/counters/status:InProgress": -1,
+                                      "/counters/reportsViewed": 1,
+                                      "/counters/archetypes:The Critical Interrogator": 1})
+
+    def test_late_change_after_a_delete_is_dropped(self):
+        container = MagicMock()
+        container.read_item.side_effect = change_feed.exceptions.CosmosResourceNotFoundError()
+        with patch.object(CosmosProjections, "container", container):
+            # The delete is published before the trigger delivers the session's last write
+            self.assertTrue(CosmosProjections()._apply_one("delete", {"id": "s1"}, None, None))
+            operations = container.execute_item_batch.call_args.kwargs["batch_operations"]
+            self.assertEqual(operations, [("create", (change_feed.tombstone("s1"),))])
+
+            container.reset_mock()
+            container.read_item.side_effect = None
+            container.read_item.return_value = dict(change_feed.tombstone("s1"), _etag="etag-2")
+            self.assertFalse(CosmosProjections()._apply_one("upsert", make_session("s1"), 7, 102.0))
+            container.execute_item_batch.assert_not_called()
+
+    def test_delete_replaces_the_row_with_a_tombstone(self):
+        container = MagicMock()
+        previous = change_feed.project(make_session("s1"), 5, 100.0)
+        previous["_etag"] = "etag-1"
+        container.read_item.return_value = previous
+        with patch.object(CosmosProjections, "container", container):
+            self.assertTrue(CosmosProjections()._apply_one("delete", {"id": "s1"}, None, None))
+
+        operations = container.execute_item_batch.call_args.kwargs["batch_operations"]
+        self.assertEqual(operations[0], ("replace", ("s1", change_feed.tombstone("s1")), {"if_match_etag": "etag-1"}))
+        increments = {op["path"]: op["value"] for op in operations[1][1][1]}
+        self.assertEqual(increments, {"/counters/total": -1, "/counters/status:InProgress": -1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Tests for the resumable session cleanup job, its endpoint and the governed scheduled cleanup,
+run against an in-process container fake.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch, MagicMock
+
+import azure.functions as func
+import azure.cosmos.exceptions as exceptions
+
+import analytics_rollups
+import change_feed
+import cleanup_job
+import ru_budget
+import session_store
+from cleanup_governor import CleanupGovernor, run_cleanup_slice, run_expiry_sweep
+from cleanup_job import CleanupJob, ExpirySweep, build_cleanup_query, build_expiry_query
+from ru_budget import AdaptiveRequestUnitBudget
+from change_feed import LocalChangeFeed, SqliteProjections
+from checkpoints import load_checkpoint
+from session_cleanup import main as cleanup_main
+
+
+class FakePages:
+    """by_page() result: the continuation is the last ID returned, so deleting returned items moves nothing"""
+
+    def __init__(self, container, parameters, page_size, continuation):
+        self.container = container
+        self.parameters = parameters
+        self.page_size = page_size
+        self.continuation_token = continuation
+
+    def __iter__(self):
+        while True:
+            after = self.continuation_token or ""
+            remaining = [match for match in self.container.matches(self.parameters) if match["id"] > after]
+            if not remaining:
+                return
+            page = remaining[:self.page_size]
+            self.continuation_token = page[-1]["id"] if len(remaining) > len(page) else None
+            yield page
+            if self.continuation_token is None:
+                return
+
+
+class FakeContainer:
+    """Sessions keyed on id; queries filter on the cutoff and status parameters"""
+
+    def __init__(self, sessions):
+        self.items = {session['id']: session for session in sessions}
+        self.client_connection = MagicMock(last_response_headers={"x-ms-request-charge": "2.5"})
+
+    def matches(self, parameters):
+        values = {parameter["name"]: parameter["value"] for parameter in parameters}
+        return [self.items[item_id] for item_id in sorted(self.items)
+                if self.items[item_id]["createdAt"] < values["@cutoff_date"]
+                and values.get("@status", self.items[item_id]["status"]) == self.items[item_id]["status"]]
+
+    def expiring(self, parameters):
+        values = {parameter["name"]: parameter["value"] for parameter in parameters}
+        before = {value: values[name.replace("@status", "@before")] for name, value in values.items()
+                  if name.startswith("@status")}
+        return [item for item in (self.items[item_id] for item_id in sorted(self.items))
+                if item.get("ttl", -1) > 0 and item["_ts"] + item["ttl"] < values["@horizon"]
+                and item["status"] in before and item["_ts"] < before[item["status"]]]
+
+    def query_items(self, query, parameters, enable_cross_partition_query=None, max_item_count=None):
+        if "@horizon" in query:
+            return self.expiring(parameters)[:int(query.split("TOP ")[1].split()[0])]
+        if "COUNT(1)" in query:
+            return [len(self.matches(parameters))]
+        if "TOP" in query:
+            return [{key: match[key] for key in ("id", "status", "createdAt")}
+                    for match in self.matches(parameters)[:int(query.split("TOP ")[1].split()[0])]]
+        pager = MagicMock()
+        pager.by_page = lambda continuation=None: FakePages(self, parameters, max_item_count, continuation)
+        return pager
+
+    def delete_item(self, item, partition_key, **kwargs):
+        if item not in self.items:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        del self.items[item]
+
+
+def make_sessions():
+    now = datetime.now(timezone.utc)
+    sessions = []
+    for index in range(30):
+        age = timedelta(days=60 if index < 25 else 1)
+        sessions.append({"id": f"s-{index:02d}", "status": "InProgress" if index % 5 == 0 else "Completed",
+                         "createdAt": (now - age).isoformat(), "answers": [{"questionNumber": 1}] * 40})
+    return sessions
+
+
+class TestCleanupJob(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        env = patch.dict(os.environ, {"CHECKPOINT_STORE": "file",
+                                      "CHECKPOINT_PATH": os.path.join(temp_dir.name, "checkpoints")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.container = FakeContainer(make_sessions())
+        get_container = patch.object(cleanup_job, "get_container", return_value=self.container)
+        get_container.start()
+        self.addCleanup(get_container.stop)
+
+    def cleanup(self, **params):
+        request = func.HttpRequest(method="DELETE", url="/api/admin/sessions/cleanup",
+                                   params={key: str(value) for key, value in params.items()}, body=b"")
+        response = cleanup_main(request)
+        return response.status_code, json.loads(response.get_body())
+
+    def test_query_projects_only_what_cleanup_needs(self):
+        query, parameters = build_cleanup_query(cleanup_job.PREVIEW_SELECT, "2025-01-01", "Completed")
+        self.assertEqual(query, "SELECT c.id, c.pk, c.status, c.createdAt, c.completedAt FROM c "
+                                "WHERE c.createdAt < @cutoff_date AND c.status = @status")
+        self.assertEqual(len(parameters), 2)
+        self.assertNotIn("c.result,", cleanup_job.CLEANUP_SELECT)
+        self.assertIn("c.result.primaryArchetype", cleanup_job.CLEANUP_SELECT)
+
+    def test_dry_run_returns_count_and_capped_sample(self):
+        status, body = self.cleanup(dry_run="true", sample=3)
+        self.assertEqual(status, 200)
+        self.assertEqual(body["sessions_found"], 25)
+        self.assertEqual([session["id"] for session in body["sample"]], ["s-00", "s-01", "s-02"])
+        self.assertNotIn("answers", body["sample"][0])
+        self.assertEqual(len(self.container.items), 30)
+        self.assertEqual(self.cleanup(dry_run="true", sample=1000)[0], 400)
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        job = CleanupJob(days=30, page_size=10)
+        state = job.run(max_pages=1)
+        self.assertFalse(state["completed"])
+        self.assertEqual((state["processed"], state["deleted"]), (10, 10))
+        self.assertIsNotNone(load_checkpoint("session-cleanup"))
+
+        status, body = self.cleanup(days=30)
+        self.assertEqual(status, 200)
+        self.assertTrue(body["completed"])
+        self.assertEqual((body["sessions_processed"], body["sessions_deleted"]), (25, 25))
+        self.assertEqual(sorted(self.container.items), [f"s-{index}" for index in range(25, 30)])
+        self.assertIsNone(load_checkpoint("session-cleanup"))
+
+    def test_changed_parameters_start_a_new_job(self):
+        CleanupJob(days=30, page_size=2).run(max_pages=1)
+        state = CleanupJob(days=30, status="InProgress", page_size=2).run()
+        self.assertTrue(state["completed"])
+        self.assertEqual(state["processed"], 4)
+
+    def test_cleaned_up_sessions_leave_the_listing_and_rollups(self):
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.dict(os.environ, {"CHANGE_FEED_ENABLED": "true", "PROJECTION_STORE": "sqlite",
+                                        "CHANGE_FEED_LOG_PATH": os.path.join(temp_dir, "changes.jsonl")}), \
+                patch.object(change_feed, "ensure_local_consumer"), \
+                patch.dict(analytics_rollups._rollups, {"memory": analytics_rollups.InMemoryRollups()}), \
+                patch.object(analytics_rollups, "get_rollup_backend", return_value="memory"):
+            projections = SqliteProjections(os.path.join(temp_dir, "projections.db"))
+            feed = LocalChangeFeed(projections)
+            for session in self.container.items.values():
+                change_feed.publish_change(session)
+                analytics_rollups.record_session_started(session)
+            feed.catch_up()
+            self.assertEqual(len(projections.list_rows("session", limit=100)), 30)
+
+            CleanupJob(days=30, page_size=10).run()
+            feed.catch_up()
+            self.assertEqual(sorted(row["id"] for row in projections.list_rows("session", limit=100)),
+                             [f"s-{index}" for index in range(25, 30)])
+            self.assertEqual(change_feed.summary_from_counters(projections.get_counters())["totalSessions"], 5)
+            total = analytics_rollups.get_rollups().read([analytics_rollups.TOTAL_ID])[0]
+            self.assertEqual(total["started"], 5)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.cleanup(days=0)[0], 400)
+        self.assertEqual(self.cleanup(status="Archived")[0], 400)
+        self.assertEqual(self.cleanup(pages=0)[0], 400)
+
+
+class TestScheduledCleanup(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        env = patch.dict(os.environ, {"CHECKPOINT_STORE": "file", "ANALYTICS_ROLLUP_STORE": "memory",
+                                      "CHECKPOINT_PATH": os.path.join(temp_dir.name, "checkpoints")})
+        env.start()
+        self.addCleanup(env.stop)
+        rollups = patch.dict(analytics_rollups._rollups, {"memory": analytics_rollups.InMemoryRollups()})
+        rollups.start()
+        self.addCleanup(rollups.stop)
+        self.container = FakeContainer(make_sessions())
+
+    def test_budget_halves_on_throttling_and_recovers(self):
+        with patch.object(ru_budget.time, "monotonic", return_value=100.0):
+            budget = AdaptiveRequestUnitBudget(200, recovery_seconds=10)
+            budget.throttled()
+            budget.throttled()
+        self.assertEqual(budget.ru_per_second, 50)
+        with patch.object(ru_budget.time, "monotonic", return_value=102.0):
+            budget.wait()
+        self.assertEqual(budget.ru_per_second, 90)
+        with patch.object(ru_budget.time, "monotonic", return_value=200.0):
+            budget.wait()
+        self.assertEqual(budget.ru_per_second, 200)
+        self.assertEqual(budget.stats()["throttles"], 2)
+
+    def test_slice_deletes_under_the_budget(self):
+        state = run_cleanup_slice(self.container, CleanupGovernor(ru_per_second=1000, peak_starts_per_hour=5))
+        self.assertTrue(state["completed"])
+        self.assertEqual(state["deleted"], 25)
+        self.assertEqual(state["ruCeiling"], 1000)
+        self.assertGreater(state["consumedRequestUnits"], 0)
+
+    def test_expiry_sweep_deletes_sessions_whose_lifetime_ran_out(self):
+        now = 1_800_000_000
+        for index, session in enumerate(sorted(self.container.items.values(), key=lambda item: item["id"])):
+            # Ten sessions ran out half an hour ago, ten run out in half an hour, ten never
+            session["_ts"] = now - 7 * 86400 + (-1800 if index < 10 else 1800)
+            session["ttl"] = 7 * 86400 + 3600 if index < 20 else -1
+            analytics_rollups.record_session_started(session)
+        query, parameters = build_expiry_query("*", now, {"InProgress": 7 * 86400, "Completed": 0}, 3600)
+        self.assertIn("c.status = @status0 AND c._ts < @before0", query)
+        self.assertEqual(len(parameters), 3)
+
+        with patch.dict(os.environ, {"SESSION_TTL_COMPLETED_SECONDS": str(7 * 86400)}):
+            state = ExpirySweep(self.container, page_size=4, grace_seconds=3600).run(now=now)
+        self.assertTrue(state["completed"])
+        self.assertEqual(state["deleted"], 10)
+        self.assertEqual(sorted(self.container.items), [f"s-{index:02d}" for index in range(10, 30)])
+        total = analytics_rollups.get_rollups().read([analytics_rollups.TOTAL_ID])[0]
+        self.assertEqual(total["started"], 20)
+
+    def test_sweep_is_opt_in_and_extends_the_ttl(self):
+        with patch.dict(os.environ, {"SESSION_STORE": "cosmos", "SESSION_TTL_IN_PROGRESS_SECONDS": "86400"}):
+            self.assertFalse(session_store.is_expiry_sweep_enabled())
+            self.assertEqual(session_store.session_ttl("InProgress"), 86400)
+            with patch.dict(os.environ, {"SESSION_EXPIRY_SWEEP_ENABLED": "true"}):
+                self.assertTrue(session_store.is_expiry_sweep_enabled())
+                self.assertEqual(session_store.session_ttl("InProgress"), 86400 + 3600)
+
+    def test_pauses_during_peak_traffic(self):
+        for index in range(5):
+            analytics_rollups.record_session_started({"id": f"live-{index}", "status": "InProgress", "answers": [],
+                                                      "createdAt": datetime.now(timezone.utc).isoformat()})
+        governor = CleanupGovernor(ru_per_second=1000, peak_starts_per_hour=5)
+        self.assertIsNone(run_cleanup_slice(self.container, governor))
+        self.assertIsNone(run_expiry_sweep(self.container, governor))
+        self.assertEqual(len(self.container.items), 30)
+        self.assertEqual(governor.stats()["recentStartsPerHour"], 5)
+        self.assertEqual(governor.stats()["pauses"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
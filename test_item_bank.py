@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled item bank.
+"""
+
+import json
+import unittest
+
+import item_bank
+
+
+class TestItemBank(unittest.TestCase):
+
+    def test_every_question_pair_uses_known_statements(self):
+        self.assertEqual(len(item_bank.QUESTION_PAIRS), item_bank.TOTAL_QUESTIONS)
+        for statement_a, statement_b in item_bank.QUESTION_PAIRS:
+            self.assertIn(statement_a, item_bank.STATEMENT_TEXTS)
+            self.assertIn(statement_b, item_bank.STATEMENT_TEXTS)
+
+    def test_question_pair_shape(self):
+        pair = item_bank.get_question_pair(1)
+        self.assertEqual(pair["A"], {"id": 103, "text": "I like to analyze a problem from every angle before making a decision."})
+        self.assertEqual(pair["B"]["id"], 604)
+        self.assertIs(item_bank.get_question_pair(1), pair)
+
+    def test_unknown_question_number(self):
+        for question_number in (0, 41, "1", None):
+            with self.assertRaises(ValueError):
+                item_bank.get_question_pair(question_number)
+
+    def test_construct_lookups_agree(self):
+        for question_number, (index_a, index_b) in enumerate(item_bank.QUESTION_CONSTRUCT_INDEX, start=1):
+            pair = item_bank.get_question_pair(question_number)
+            self.assertEqual(item_bank.CONSTRUCTS[index_a], item_bank.get_construct_for_statement_id(pair["A"]["id"]))
+            self.assertEqual(index_b, item_bank.get_construct_index(pair["B"]["id"]))
+        self.assertEqual(item_bank.get_construct_for_statement_id(1201), "Unknown")
+
+    def test_question_json_matches_response_shape(self):
+        body = json.loads(item_bank.get_question_json(40))
+        self.assertEqual(body["questionNumber"], 40)
+        self.assertEqual(body["totalQuestions"], 40)
+        self.assertEqual(body["statements"], item_bank.get_question_pair(40))
+
+    def test_bank_is_read_only(self):
+        with self.assertRaises(TypeError):
+            item_bank.STATEMENT_CONSTRUCTS[101] = "Other"
+
+
+if __name__ == '__main__':
+    unittest.main()
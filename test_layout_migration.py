@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Tests for the partitioned container layout: the migration job and the dual-read cutover store,
+run against in-process fakes of Cosmos DB containers.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import azure.cosmos.exceptions as exceptions
+
+import session_store
+from layout_migration import LayoutMigration, migrated_document
+from checkpoints import load_checkpoint
+
+
+class FakePages:
+    """by_page() result: pages of the documents with an offset as continuation token"""
+
+    def __init__(self, documents, page_size, continuation):
+        self.documents = documents
+        self.page_size = page_size
+        self.start = int(continuation or 0)
+        self.continuation_token = None
+
+    def __iter__(self):
+        start = self.start
+        while start < len(self.documents):
+            page = self.documents[start:start + self.page_size]
+            start += self.page_size
+            self.continuation_token = str(start) if start < len(self.documents) else None
+            yield page
+
+
+class FakeContainer:
+    """The container calls the layout code makes, keyed on id"""
+
+    def __init__(self, documents=()):
+        self.items = {document['id']: dict(document) for document in documents}
+        self.client_connection = MagicMock(last_response_headers={"x-ms-request-charge": "1"})
+        self.batches = []
+
+    def query_items(self, query, parameters=None, enable_cross_partition_query=None, max_item_count=None):
+        if "COUNT(1)" in query:
+            return [len(self.items)]
+        if "ARRAY_CONTAINS(@ids, c.id)" in query:
+            return [item_id for item_id in parameters[0]["value"] if item_id in self.items]
+        if "c.id = @id" in query:
+            document = self.items.get(parameters[0]["value"])
+            return [document['pk']] if document else []
+        pager = MagicMock()
+        pager.by_page = lambda continuation=None: FakePages(list(self.items.values()), max_item_count, continuation)
+        return pager
+
+    def read_item(self, item, partition_key):
+        document = self.items.get(item)
+        if document is None or document.get('pk', document['id']) != partition_key:
+            raise exceptions.CosmosResourceNotFoundError(message="Not found")
+        return dict(document, _etag="etag-1")
+
+    def create_item(self, body, **kwargs):
+        if body['id'] in self.items:
+            raise exceptions.CosmosResourceExistsError(message="Exists")
+        self.items[body['id']] = dict(body)
+        return body
+
+    def upsert_item(self, body, **kwargs):
+        self.items[body['id']] = dict(body)
+        return body
+
+    def delete_item(self, item, partition_key):
+        self.read_item(item, partition_key)
+        del self.items[item]
+
+    def execute_item_batch(self, batch_operations, partition_key, **kwargs):
+        for index, (_, (document,)) in enumerate(batch_operations):
+            if document['id'] in self.items:
+                raise exceptions.CosmosBatchOperationError(error_index=index, headers={}, status_code=409,
+                                                           operation_responses=[{"statusCode": 409}])
+        self.batches.append((partition_key, len(batch_operations)))
+        for _, (document,) in batch_operations:
+            self.items[document['id']] = dict(document)
+
+
+def make_session(index, month="01"):
+    return {"id": f"session-{index:03d}", "status": "Completed", "createdAt": f"2025-{month}-15T10:00:00+00:00",
+            "answers": [], "_etag": "etag", "_rid": "rid", "_ts": 1}
+
+
+class TestLayoutMigration(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        # One ID bucket per month keeps the batch sizes below predictable
+        env = patch.dict(os.environ, {"CHECKPOINT_STORE": "file", "TENANT_ID": "acme", "SESSION_PARTITION_BUCKETS": "1",
+                                      "CHECKPOINT_PATH": os.path.join(temp_dir.name, "checkpoints")})
+        env.start()
+        self.addCleanup(env.stop)
+        documents = [make_session(index, "01" if index < 15 else "02") for index in range(25)]
+        documents.append({"id": "session-003_contact_1", "sessionId": "session-003", "email": "a@b.c", "_ts": 1})
+        self.source = FakeContainer(documents)
+        self.target = FakeContainer()
+        self.contacts = FakeContainer()
+
+    def migration(self, **kwargs):
+        return LayoutMigration(source=self.source, target=self.target, contacts=self.contacts,
+                               page_size=10, concurrency=2, ru_per_second=0, **kwargs)
+
+    def test_documents_are_stamped_and_split(self):
+        state = self.migration().run()
+        self.assertTrue(state["completed"])
+        self.assertEqual((state["processed"], state["copied"], state["failed"]), (26, 26, 0))
+        self.assertEqual((state["sourceCount"], state["targetCount"]), (26, 26))
+        self.assertEqual(self.target.items["session-020"]["pk"], "acme|2025-02|00")
+        self.assertNotIn("_etag", self.target.items["session-000"])
+        self.assertIn("session-003_contact_1", self.contacts.items)
+        self.assertNotIn("pk", self.contacts.items["session-003_contact_1"])
+        # One batch per partition and page: 10 + 5 January sessions, 5 + 5 February
+        self.assertEqual(sorted(size for _, size in self.target.batches), [5, 5, 5, 10])
+
+    def test_resumes_from_checkpoint(self):
+        state = self.migration().run(max_pages=1)
+        self.assertFalse(state["completed"])
+        self.assertEqual(load_checkpoint("layout-migration")["continuation"], "10")
+        state = self.migration().run()
+        self.assertTrue(state["completed"])
+        self.assertEqual(state["processed"], 26)
+        self.assertEqual(len(self.target.items) + len(self.contacts.items), 26)
+        self.assertIsNone(load_checkpoint("layout-migration"))
+
+    def test_never_overwrites_sessions_moved_on_read(self):
+        moved = migrated_document(make_session(4))
+        moved["status"] = "InProgress"
+        self.target.items[moved["id"]] = moved
+        state = self.migration().run()
+        self.assertEqual((state["copied"], state["existing"]), (25, 1))
+        self.assertEqual(self.target.items["session-004"]["status"], "InProgress")
+
+    def test_refuses_to_copy_onto_itself(self):
+        with self.assertRaises(ValueError):
+            LayoutMigration(source=self.source, target=self.source, contacts=self.contacts)
+
+
+class TestDualReadStore(unittest.TestCase):
+
+    def setUp(self):
+        self.legacy = FakeContainer([make_session(1)])
+        self.target = FakeContainer()
+        self.contacts = FakeContainer()
+        containers = {"sessions": self.legacy, "sessions_v2": self.target, "contacts": self.contacts}
+        env = patch.dict(os.environ, {"TENANT_ID": "acme", "COSMOS_CONTAINER_NAME": "sessions_v2"})
+        env.start()
+        self.addCleanup(env.stop)
+        get_container = patch.object(session_store, "get_container",
+                                     side_effect=lambda name=None: containers[name or "sessions_v2"])
+        get_container.start()
+        self.addCleanup(get_container.stop)
+        self.store = session_store.DualReadCosmosSessionStore("sessions_v2")
+
+    def test_read_moves_session_across(self):
+        session = self.store.get_session("session-001")
+        self.assertEqual(session["status"], "Completed")
+        self.assertEqual(self.target.items["session-001"]["pk"], session_store.partition_key_for("session-001", "2025-01"))
+        self.assertRegex(self.target.items["session-001"]["pk"], r"^acme\|2025-01\|\d{2}$")
+        self.assertNotIn("_rid", self.target.items["session-001"])
+        self.assertIsNone(self.store.get_session("session-999"))
+
+    def test_new_sessions_use_the_id_month(self):
+        session_id = session_store.new_session_id()
+        self.store.save_session({"id": session_id, "status": "InProgress", "answers": []})
+        self.assertEqual(self.store.get_session(session_id)["status"], "InProgress")
+        self.assertTrue(self.target.items[session_id]["pk"].startswith("acme|"))
+
+    def test_delete_removes_both_copies(self):
+        self.store.get_session("session-001")
+        self.legacy.items["session-001"] = make_session(1)
+        self.assertTrue(self.store.delete_session("session-001"))
+        self.assertEqual((self.legacy.items, self.target.items), ({}, {}))
+
+    def test_scans_cover_both_containers(self):
+        self.legacy.items["session-002"] = make_session(2)
+        self.store.get_session("session-001")  # moved across, the original copy stays
+        self.store.save_session({"id": session_store.new_session_id(), "status": "InProgress", "answers": []})
+        pages = list(self.store.iter_session_pages(page_size=1))
+        seen = [document["id"] for documents, _ in pages for document in documents]
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(set(seen) - set(self.target.items), {"session-002"})
+        self.assertIsNone(pages[-1][1])
+        self.assertEqual(self.store.count_sessions(), 3)
+        # A continuation into the original container resumes there
+        resumed = [document["id"] for documents, _ in self.store.iter_session_pages(page_size=1, continuation="legacy:1")
+                   for document in documents]
+        self.assertEqual(resumed, ["session-002"])
+
+    def test_container_level_jobs_wait_for_the_switch(self):
+        with patch.dict(os.environ, {"SESSION_STORE": "cosmos-dual"}):
+            with self.assertRaises(session_store.LayoutCutoverInProgress):
+                session_store.check_single_layout("Session cleanup")
+        with patch.dict(os.environ, {"SESSION_STORE": "cosmos-partitioned"}):
+            session_store.check_single_layout("Session cleanup")
+
+    def test_contacts_go_to_their_own_container(self):
+        self.store.save_contact({"id": "session-001_contact_1", "sessionId": "session-001"})
+        self.assertNotIn("session-001_contact_1", self.target.items)
+        self.assertIn("session-001_contact_1", self.contacts.items)
+
+
+if __name__ == "__main__":
+    unittest.main()
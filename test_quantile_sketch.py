@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for the mergeable DDSketch quantile sketches.
+"""
+
+import random
+import unittest
+
+from quantile_sketch import RELATIVE_ACCURACY, add, merge, quantiles
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(6, 1.2) for _ in range(20000))
+        sketch = {}
+        for value in values:
+            add(sketch, value)
+        for name, estimate in quantiles(sketch).items():
+            exact = values[int(int(name[1:]) / 100 * (len(values) - 1))]
+            self.assertLessEqual(abs(estimate - exact) / exact, RELATIVE_ACCURACY * 1.01, name)
+        self.assertLess(len(sketch), 600)
+
+    def test_merge_equals_one_sketch_and_values_can_be_taken_back(self):
+        first, second, both = {}, {}, {}
+        for value in range(1, 500):
+            add(first if value % 2 else second, value)
+            add(both, value)
+        self.assertEqual(merge([first, second]), both)
+        for value in range(2, 500, 2):
+            add(both, value, count=-1)
+        self.assertEqual(quantiles(both), quantiles(first))
+
+    def test_empty_sketch(self):
+        self.assertEqual(quantiles({}), {"p50": None, "p90": None, "p99": None})
+
+
+if __name__ == "__main__":
+    unittest.main()
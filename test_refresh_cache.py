@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process refreshing cache.
+"""
+
+import threading
+import time
+import unittest
+
+from refresh_cache import RefreshingCache
+
+
+class TestRefreshingCache(unittest.TestCase):
+
+    def test_fresh_values_are_served_from_cache(self):
+        cache = RefreshingCache("test", ttl_seconds=60)
+        calls = []
+        for _ in range(3):
+            entry = cache.get("key", lambda: calls.append(1) or len(calls))
+        self.assertEqual((entry.value, len(calls)), (1, 1))
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_stale_value_is_served_while_refreshing_in_background(self):
+        cache = RefreshingCache("test", ttl_seconds=0.01, stale_seconds=60)
+        release = threading.Event()
+        values = iter(["old", "new"])
+
+        def compute():
+            value = next(values)
+            if value == "new":
+                release.wait(1)
+            return value
+
+        self.assertEqual(cache.get("key", compute).value, "old")
+        time.sleep(0.02)
+        started = time.monotonic()
+        self.assertEqual(cache.get("key", compute).value, "old")
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        for _ in range(100):
+            if cache.get("key", compute).value == "new":
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.get("key", compute).value, "new")
+
+    def test_concurrent_misses_share_one_computation(self):
+        cache = RefreshingCache("test", ttl_seconds=60)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        threads = [threading.Thread(target=cache.get, args=("key", compute)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_failed_refresh_keeps_stale_value(self):
+        cache = RefreshingCache("test", ttl_seconds=0.01, stale_seconds=60)
+        cache.get("key", lambda: "value")
+        time.sleep(0.02)
+
+        def fail():
+            raise RuntimeError("query failed")
+
+        self.assertEqual(cache.get("key", fail).value, "value")
+        time.sleep(0.05)
+        self.assertEqual(cache.get("key", fail).value, "value")
+        self.assertGreaterEqual(cache.stats()["errors"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk re-scoring job, run against the SQLite backend with file checkpoints.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import session_store
+from generate_report import calculate_scores_and_generate_report
+from rescoring import RescoringJob
+from checkpoints import load_checkpoint
+
+
+def make_completed_session(index):
+    answers = [
+        {"questionNumber": question_number, "chosenStatementId": 'B' if (question_number + index) % 3 == 0 else 'A'}
+        for question_number in range(1, 41)
+    ]
+    session = {"id": f"session-{index:03d}", "nickname": f"Nick-{index}", "status": "Completed", "answers": answers}
+    session["result"] = calculate_scores_and_generate_report(session)
+    return session
+
+
+class TestRescoringJob(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        env = patch.dict(os.environ, {"CHECKPOINT_STORE": "file",
+                                      "CHECKPOINT_PATH": os.path.join(self.temp_dir.name, "checkpoints")})
+        env.start()
+        self.addCleanup(env.stop)
+        self.store = session_store.SqliteSessionStore(os.path.join(self.temp_dir.name, "sessions.db"))
+        for index in range(25):
+            self.store.save_session(make_completed_session(index))
+        self.store.save_session({"id": "session-in-progress", "status": "InProgress", "answers": []})
+
+    def test_nothing_changes_with_unchanged_weights(self):
+        state = RescoringJob(store=self.store, page_size=10).run()
+        self.assertTrue(state["completed"])
+        self.assertEqual((state["total"], state["processed"], state["unchanged"], state["updated"]), (25, 25, 25, 0))
+
+    @patch.dict(os.environ, {"SCORING_CONSTRUCT_WEIGHTS": json.dumps({"Epistemic Curiosity": 2})})
+    def test_new_weights_are_written_back(self):
+        state = RescoringJob(store=self.store, page_size=10, concurrency=4).run()
+        self.assertEqual(state["updated"], 25)
+        session = self.store.get_session("session-007")
+        self.assertIn("rescoredAt", session)
+        self.assertEqual(session["result"], calculate_scores_and_generate_report(session))
+
+    @patch.dict(os.environ, {"SCORING_CONSTRUCT_WEIGHTS": json.dumps({"Experimental Drive": 3})})
+    def test_resumes_from_checkpoint(self):
+        progress = []
+        first = RescoringJob(store=self.store, page_size=10, progress=progress.append).run(max_pages=1)
+        self.assertFalse(first["completed"])
+        self.assertEqual(first["processed"], 10)
+        self.assertEqual(load_checkpoint("rescore-sessions")["continuation"], "session-009")
+        self.assertIsNotNone(progress[-1]["etaSeconds"])
+
+        second = RescoringJob(store=self.store, page_size=10).run()
+        self.assertTrue(second["completed"])
+        self.assertEqual((second["processed"], second["updated"]), (25, 25))
+        self.assertIsNone(load_checkpoint("rescore-sessions"))
+
+
+if __name__ == '__main__':
+    unittest.main()
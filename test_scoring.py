@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorised scoring engine.
+"""
+
+import json
+import os
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import scoring
+from answer_codec import encode_answers
+from item_bank import CONSTRUCTS, get_question_pair, get_construct_for_statement_id
+
+
+def make_answers(choose):
+    return [
+        {"questionNumber": question_number, "chosenStatementId": choose(question_number)}
+        for question_number in range(1, 41)
+    ]
+
+
+def loop_construct_counts(answers):
+    counts = dict.fromkeys(CONSTRUCTS, 0)
+    for answer in answers:
+        statement = get_question_pair(answer["questionNumber"])[answer["chosenStatementId"]]
+        counts[get_construct_for_statement_id(statement["id"])] += 1
+    return [counts[construct] for construct in CONSTRUCTS]
+
+
+class TestScoring(unittest.TestCase):
+
+    def test_single_session_matches_per_answer_count(self):
+        answers = make_answers(lambda q: 'B' if q % 3 == 0 else 'A')
+        construct_scores, archetype_scores = scoring.score_session(answers)
+        self.assertEqual([score["score"] for score in construct_scores], loop_construct_counts(answers))
+        self.assertEqual(sum(score["score"] for score in construct_scores), 40)
+        by_name = {score["name"]: score["score"] for score in construct_scores}
+        for (name, formula), archetype in zip(scoring.ARCHETYPES, archetype_scores):
+            self.assertEqual(archetype["name"], name)
+            self.assertEqual(archetype["score"], sum(by_name[construct] for construct in formula))
+
+    def test_partial_sessions_only_count_answered_questions(self):
+        construct_scores, _ = scoring.score_session(make_answers(lambda q: 'A')[:10])
+        self.assertEqual(sum(score["score"] for score in construct_scores), 10)
+
+    def test_batch_matches_single_scoring(self):
+        rng = np.random.default_rng(7)
+        choices = rng.integers(0, 2, size=(500, 40), dtype=np.int8)
+        construct_scores, archetype_scores = scoring.score_choices(choices)
+        self.assertEqual(construct_scores.shape, (500, 11))
+        self.assertEqual(archetype_scores.shape, (500, 3))
+        row = choices[42]
+        answers = make_answers(lambda q: 'B' if row[q - 1] else 'A')
+        single, _ = scoring.score_session(answers)
+        self.assertEqual(construct_scores[42].tolist(), [score["score"] for score in single])
+
+    def test_packed_and_json_documents_score_the_same(self):
+        answers = make_answers(lambda q: 'B' if q % 2 else 'A')
+        documents = [{"answers": answers}, {"answersPacked": encode_answers(answers[:25])}]
+        choices = scoring.choices_from_documents(documents)
+        self.assertEqual(choices[0].tolist(), scoring.choices_from_answers(answers).tolist())
+        self.assertEqual(choices[1][:25].tolist(), choices[0][:25].tolist())
+        self.assertTrue((choices[1][25:] == scoring.UNANSWERED).all())
+
+    @patch.dict(os.environ, {"SCORING_CONSTRUCT_WEIGHTS": json.dumps({"Epistemic Curiosity": 0.5})})
+    def test_configurable_weights(self):
+        answers = make_answers(lambda q: 'A')
+        construct_scores, _ = scoring.score_session(answers)
+        unweighted = loop_construct_counts(answers)[CONSTRUCTS.index("Epistemic Curiosity")]
+        self.assertEqual(construct_scores[CONSTRUCTS.index("Epistemic Curiosity")]["score"], unweighted * 0.5)
+
+    @patch.dict(os.environ, {"SCORING_CONSTRUCT_WEIGHTS": json.dumps({"Unknown Construct": 2})})
+    def test_unknown_weight_construct(self):
+        with self.assertRaises(ValueError):
+            scoring.get_construct_weights()
+
+
+if __name__ == '__main__':
+    unittest.main()
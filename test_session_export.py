@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the session export: filters, page continuation and the paged HTTP endpoint.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import azure.functions as func
+
+import session_export
+import session_store
+from session_export import parse_filters, iter_export_rows, build_export_query
+from admin_export import main as export_main
+
+
+def make_session(index, status="Completed", archetype="The Curious Experimenter"):
+    session = {"id": f"session-{index:03d}", "nickname": f"Nick, {index}", "status": status,
+               "createdAt": f"2025-01-{index % 28 + 1:02d}T10:00:00+00:00", "answers": [{"questionId": 1}]}
+    if archetype:
+        session["result"] = {"primaryArchetype": archetype, "secondaryArchetype": None}
+    return session
+
+
+class TestSessionExport(unittest.TestCase):
+
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.store = session_store.SqliteSessionStore(os.path.join(temp_dir.name, "sessions.db"))
+        for index in range(25):
+            self.store.save_session(make_session(index, "InProgress" if index % 5 == 0 else "Completed",
+                                                 "The Critical Interrogator" if index % 2 else "The Curious Experimenter"))
+        store = patch.object(session_export, "get_session_store", return_value=self.store)
+        store.start()
+        self.addCleanup(store.stop)
+
+    def export(self, **params):
+        headers = params.pop("headers", {})
+        request = func.HttpRequest(method="GET", url="/api/admin/sessions/export", headers=headers,
+                                   params={key: str(value) for key, value in params.items()}, body=b"")
+        return export_main(request)
+
+    def test_filters_select_rows(self):
+        filters = parse_filters("Completed", "2025-01-05", "2025-01-10", "The Critical Interrogator")
+        rows = list(iter_export_rows(filters, page_size=4))
+        # Created 2025-01-05..09 are sessions 4-8; of those 5 and 7 are interrogators, and 5 is in progress
+        self.assertEqual([row["id"] for row in rows], ["session-007"])
+        self.assertEqual(rows[0]["answersCount"], 1)
+        self.assertEqual(set(rows[0]), set(session_export.EXPORT_FIELDS))
+
+    def test_pages_concatenate_into_one_csv(self):
+        body, token, pages = "", None, 0
+        while True:
+            response = self.export(format="csv", limit=10, headers={"X-Continuation-Token": token} if token else {})
+            self.assertEqual(response.status_code, 200)
+            body += response.get_body().decode("utf-8")
+            pages += 1
+            token = response.headers.get("X-Continuation-Token")
+            if not token:
+                break
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(len({row["id"] for row in rows}), 25)
+        self.assertEqual(rows[0]["nickname"], "Nick, 0")
+
+    def test_gzip_and_token_bound_to_filters(self):
+        response = self.export(status="InProgress", limit=2, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        lines = gzip.decompress(response.get_body()).decode("utf-8").splitlines()
+        self.assertEqual([json.loads(line)["status"] for line in lines], ["InProgress", "InProgress"])
+        token = response.headers["X-Continuation-Token"]
+        self.assertEqual(self.export(status="Completed", continuation=token).status_code, 400)
+        self.assertEqual(self.export(status="InProgress", continuation=token).status_code, 200)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.export(format="xml").status_code, 400)
+        self.assertEqual(self.export(limit=0).status_code, 400)
+        self.assertEqual(self.export(**{"from": "2025-02-01", "to": "2025-01-01"}).status_code, 400)
+        self.assertEqual(self.export(continuation="not-a-token").status_code, 400)
+
+    def test_cosmos_query_applies_filters_server_side(self):
+        query, parameters = build_export_query(parse_filters("Completed", "2025-01-05", None, "The Critical Interrogator"))
+        self.assertIn("c.status = @status AND c.createdAt >= @from AND c.result.primaryArchetype = @archetype", query)
+        self.assertEqual([parameter["value"] for parameter in parameters],
+                         ["Completed", "2025-01-05T00:00:00+00:00", "The Critical Interrogator"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Tests for the pluggable session store backends.
+These run against the in-memory, local-file and SQLite backends only, so no Azure services are needed.
+"""
+
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch, MagicMock
+
+# Mock Azure modules when the SDK is not installed
+try:
+    import azure.core.pipeline.transport
+    import azure.cosmos.cosmos_client
+    import azure.cosmos.exceptions
+except ImportError:
+    for module_name in ['requests', 'requests.adapters', 'azure', 'azure.core', 'azure.core.pipeline',
+                        'azure.core.pipeline.transport', 'azure.cosmos', 'azure.cosmos.cosmos_client',
+                        'azure.cosmos.exceptions']:
+        sys.modules[module_name] = MagicMock()
+
+import session_store
+
+
+def make_session(session_id="session-1"):
+    return {
+        "id": session_id,
+        "nickname": "Aqua-Badger-88",
+        "status": "InProgress",
+        "answers": [],
+        "result": None
+    }
+
+
+class SessionStoreContract:
+    """Behaviour every backend must share"""
+
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_missing_session_returns_none(self):
+        self.assertIsNone(self.store.get_session("does-not-exist"))
+
+    def test_save_and_get_round_trip(self):
+        self.store.save_session(make_session())
+        session = self.store.get_session("session-1")
+        self.assertEqual(session["nickname"], "Aqua-Badger-88")
+        self.assertEqual(session["answers"], [])
+
+    def test_save_replaces_existing_document(self):
+        self.store.save_session(make_session())
+        updated = make_session()
+        updated["status"] = "Completed"
+        self.store.save_session(updated)
+        self.assertEqual(self.store.get_session("session-1")["status"], "Completed")
+
+    def test_conditional_replace_detects_concurrent_update(self):
+        self.store.save_session(make_session())
+        first = self.store.get_session("session-1")
+        second = self.store.get_session("session-1")
+        first["status"] = "Completed"
+        self.store.replace_session(first, etag=first["_etag"])
+        second["nickname"] = "Stale-Write-11"
+        with self.assertRaises(session_store.ConcurrencyConflict):
+            self.store.replace_session(second, etag=second["_etag"])
+        self.assertEqual(self.store.get_session("session-1")["nickname"], "Aqua-Badger-88")
+
+    def test_mutate_session_retries_and_merges(self):
+        self.store.save_session(make_session())
+        stale = self.store.get_session("session-1")
+        concurrent = self.store.get_session("session-1")
+        concurrent["status"] = "Completed"
+        self.store.replace_session(concurrent, etag=concurrent["_etag"])
+        conflicts_before = session_store.get_concurrency_stats()["conflicts"]
+
+        def rename(session):
+            session["nickname"] = "Merged-Write-22"
+            return True
+
+        result = self.store.mutate_session("session-1", rename, session=stale)
+        self.assertEqual(result["nickname"], "Merged-Write-22")
+        stored = self.store.get_session("session-1")
+        self.assertEqual((stored["status"], stored["nickname"]), ("Completed", "Merged-Write-22"))
+        self.assertEqual(session_store.get_concurrency_stats()["conflicts"], conflicts_before + 1)
+
+    def test_append_answers_is_conditional(self):
+        self.store.save_session(make_session())
+        stale = self.store.get_session("session-1")
+        self.store.append_answers("session-1", [{"questionNumber": 1, "chosenStatementId": "A"}])
+        with self.assertRaises(session_store.ConcurrencyConflict):
+            self.store.append_answers("session-1", [{"questionNumber": 1, "chosenStatementId": "B"}], session=stale)
+        self.assertEqual(len(self.store.get_session("session-1")["answers"]), 1)
+
+    def test_pages_resume_from_continuation(self):
+        for index in range(7):
+            session = make_session(f"session-{index}")
+            session["status"] = "Completed" if index % 2 == 0 else "InProgress"
+            self.store.save_session(session)
+        first_page, continuation = next(iter(self.store.iter_session_pages(status="Completed", page_size=2)))
+        self.assertEqual([session["id"] for session in first_page], ["session-0", "session-2"])
+        rest = [session["id"] for page, _ in self.store.iter_session_pages("Completed", 2, continuation) for session in page]
+        self.assertEqual(rest, ["session-4", "session-6"])
+        self.assertEqual(self.store.count_sessions(), 7)
+        self.assertEqual(self.store.count_sessions(status="Completed"), 4)
+
+    def test_update_fields(self):
+        self.store.save_session(make_session())
+        stale = self.store.get_session("session-1")
+        self.store.update_fields("session-1", {"result": {"primaryArchetype": "The Curious Experimenter"}})
+        self.assertEqual(self.store.get_session("session-1")["result"]["primaryArchetype"], "The Curious Experimenter")
+        with self.assertRaises(session_store.ConcurrencyConflict):
+            self.store.update_fields("session-1", {"result": None}, session=stale)
+
+    def test_delete_session(self):
+        self.store.save_session(make_session())
+        self.assertTrue(self.store.delete_session("session-1"))
+        self.assertFalse(self.store.delete_session("session-1"))
+        self.assertIsNone(self.store.get_session("session-1"))
+
+
+class TestInMemorySessionStore(SessionStoreContract, unittest.TestCase):
+
+    def make_store(self):
+        session_store.shared_session_storage.session_storage.clear()
+        return session_store.InMemorySessionStore()
+
+
+class TestFileSessionStore(SessionStoreContract, unittest.TestCase):
+
+    def make_store(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        return session_store.FileSessionStore(self.temp_dir.name)
+
+    def test_rejects_path_traversal(self):
+        self.assertIsNone(self.store.get_session("../etc/passwd"))
+        with self.assertRaises(ValueError):
+            self.store.save_session(make_session("../escape"))
+
+    def test_save_contact(self):
+        self.store.save_contact({"id": "session-1_contact_1", "sessionId": "session-1"})
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir.name, "contacts", "session-1_contact_1.json")))
+
+
+class TestSqliteSessionStore(SessionStoreContract, unittest.TestCase):
+
+    def make_store(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        return session_store.SqliteSessionStore(os.path.join(self.temp_dir.name, "sessions.db"))
+
+    def test_uses_wal_journal(self):
+        mode = self.store._connect().execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_sessions_are_shared_between_store_instances(self):
+        # A second instance on the same file stands in for another worker process
+        other = session_store.SqliteSessionStore(self.store.path)
+        self.store.save_session(make_session())
+        session = other.get_session("session-1")
+        self.assertEqual(session["nickname"], "Aqua-Badger-88")
+        self.store.append_answers("session-1", [{"questionNumber": 1, "chosenStatementId": "A"}])
+        with self.assertRaises(session_store.ConcurrencyConflict):
+            other.replace_session(session, etag=session["_etag"])
+
+
+class TestSessionIds(unittest.TestCase):
+
+    def test_new_ids_are_time_ordered_uuid7(self):
+        first, second = session_store.new_session_id(), session_store.new_session_id()
+        self.assertEqual(first[14], "7")
+        self.assertLessEqual(first[:13], second[:13])
+        self.assertRegex(session_store.session_id_month(first), r"^\d{4}-\d{2}$")
+
+    def test_only_partitioned_layouts_issue_uuid7(self):
+        # cosmos-dual would never look for a UUIDv7 session in the original container
+        with patch.dict(os.environ, {"SESSION_STORE": "cosmos"}):
+            self.assertIsNone(session_store.session_id_month(session_store.issue_session_id()))
+        for backend in session_store.PARTITIONED_BACKENDS:
+            with patch.dict(os.environ, {"SESSION_STORE": backend}):
+                self.assertIsNotNone(session_store.session_id_month(session_store.issue_session_id()))
+
+    def test_month_of_older_ids(self):
+        self.assertIsNone(session_store.session_id_month("4a1c2b3d-0000-4000-8000-000000000000"))
+        self.assertIsNone(session_store.session_id_month("session-1"))
+
+    @patch.dict(os.environ, {"TENANT_ID": "acme"})
+    def test_partition_key(self):
+        self.assertRegex(session_store.session_partition_key(
+            {"id": "018f0000-0000-7000-8000-000000000000"}), r"^acme\|2024-04\|\d{2}$")
+        self.assertRegex(session_store.session_partition_key(
+            {"id": "session-1", "createdAt": "2025-03-31T23:30:00-02:00"}), r"^acme\|2025-04\|\d{2}$")
+
+    @patch.dict(os.environ, {"TENANT_ID": "acme", "SESSION_PARTITION_BUCKETS": "8"})
+    def test_month_is_spread_over_id_buckets(self):
+        keys = {session_store.session_partition_key({"id": session_store.new_session_id()}) for _ in range(200)}
+        self.assertEqual(len(keys), 8)
+        session_id = session_store.new_session_id()
+        self.assertEqual(session_store.session_partition_key({"id": session_id}),
+                         session_store.PartitionedCosmosSessionStore()._partition_key(session_id))
+
+
+class TestSessionTtl(unittest.TestCase):
+
+    @patch.dict(os.environ, {"SESSION_TTL_IN_PROGRESS_SECONDS": "3600", "SESSION_TTL_COMPLETED_SECONDS": "0"})
+    def test_ttl_per_status(self):
+        self.assertEqual(session_store.session_ttl("InProgress"), 3600)
+        self.assertEqual(session_store.session_ttl("Completed"), -1)
+
+    @patch.dict(os.environ, {"SESSION_TTL_COMPLETED_SECONDS": "86400"})
+    def test_completion_extends_ttl(self):
+        from session_writer import completion_fields
+        fields = completion_fields({"createdAt": "2025-01-01T10:00:00+00:00"}, "2025-01-01T10:20:00+00:00")
+        self.assertEqual(fields, {"ttl": 86400, "completionDurationSeconds": 1200})
+
+
+class TestBufferedFlush(unittest.TestCase):
+
+    @patch.dict(os.environ, {"ANSWER_WRITE_MODE": "buffered", "ANSWER_FLUSH_EVERY": "2"})
+    def test_flush_retries_on_a_concurrent_write(self):
+        import session_writer
+        store = session_store.InMemorySessionStore()
+        store.save_session(make_session())
+        stale = store.get_session("session-1")
+        store.update_fields("session-1", {"reportFirstViewedAt": "2025-01-01T10:00:00+00:00"})
+        with patch.object(session_writer, "_pending_answers", {"session-1": [{"questionNumber": 1}]}):
+            self.assertEqual(session_writer.flush_answers(store, "session-1", session=stale), 1)
+        stored = store.get_session("session-1")
+        self.assertEqual(stored["answers"], [{"questionNumber": 1}])
+        self.assertEqual(stored["reportFirstViewedAt"], "2025-01-01T10:00:00+00:00")
+
+
+class TestCosmosAppendAnswers(unittest.TestCase):
+
+    def setUp(self):
+        self.container = MagicMock()
+        container = patch.object(session_store.CosmosSessionStore, "container", self.container)
+        container.start()
+        self.addCleanup(container.stop)
+        env = patch.dict(os.environ, {"ANSWER_STORAGE_FORMAT": "json"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.store = session_store.CosmosSessionStore()
+        self.session = dict(make_session(), _etag="etag-1")
+
+    def test_single_patch_returns_the_updated_session(self):
+        updated = dict(self.session, answers=[{"questionNumber": 1}], _etag="etag-2")
+        self.container.patch_item.return_value = updated
+        self.assertEqual(self.store.append_answers("session-1", [{"questionNumber": 1}], session=self.session),
+                         updated)
+
+    def test_batched_append_returns_the_updated_session(self):
+        answers = [{"questionNumber": number} for number in range(1, 16)]
+        updated = dict(self.session, answers=answers, _etag="etag-2")
+        self.container.execute_item_batch.return_value = [{"statusCode": 200, "resourceBody": dict(updated)},
+                                                          {"statusCode": 200, "resourceBody": updated}]
+        self.assertEqual(self.store.append_answers("session-1", answers, session=self.session), updated)
+        self.assertEqual(len(self.container.execute_item_batch.call_args.kwargs["batch_operations"]), 2)
+
+
+class TestBackendSelection(unittest.TestCase):
+
+    @patch.dict(os.environ, {"SESSION_STORE": "file"}, clear=True)
+    def test_explicit_backend(self):
+        self.assertEqual(session_store.get_store_backend_name(), "file")
+
+    @patch.dict(os.environ, {"USE_IN_MEMORY_STORAGE": "true", "COSMOS_ENDPOINT": "x", "COSMOS_KEY": "y"}, clear=True)
+    def test_in_memory_flag_wins_over_credentials(self):
+        self.assertEqual(session_store.get_store_backend_name(), "memory")
+
+    @patch.dict(os.environ, {"COSMOS_ENDPOINT": "x", "COSMOS_KEY": "y"}, clear=True)
+    def test_cosmos_when_configured(self):
+        self.assertEqual(session_store.get_store_backend_name(), "cosmos")
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_memory_fallback(self):
+        self.assertEqual(session_store.get_store_backend_name(), "memory")
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            session_store.get_session_store("redis")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded in-memory session cache.
+"""
+
+import unittest
+from unittest.mock import patch
+
+from shared_session_storage import BoundedSessionCache
+
+
+def make_session(session_id, status="Completed", answers=0):
+    return {"id": session_id, "status": status, "answers": [{"questionNumber": n} for n in range(answers)]}
+
+
+class TestBoundedSessionCache(unittest.TestCase):
+
+    def test_miss_does_not_allocate(self):
+        cache = BoundedSessionCache()
+        for i in range(100):
+            self.assertIsNone(cache.get(f"random-{i}"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["misses"], 100)
+        self.assertEqual(cache.stats()["approximateBytes"], 0)
+
+    def test_lru_eviction_by_entry_count(self):
+        cache = BoundedSessionCache(max_entries=2)
+        cache.put(make_session("a"))
+        cache.put(make_session("b"))
+        cache.get("a")  # "b" is now least recently used
+        cache.put(make_session("c"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_eviction_by_bytes(self):
+        cache = BoundedSessionCache(max_bytes=2000)
+        for i in range(20):
+            cache.put(make_session(f"s{i}", answers=10))
+        stats = cache.stats()
+        self.assertLessEqual(stats["approximateBytes"], 2000)
+        self.assertGreater(stats["evictions"], 0)
+        self.assertIsNotNone(cache.get("s19"))
+
+    def test_replacing_entry_keeps_byte_count_accurate(self):
+        cache = BoundedSessionCache()
+        cache.put(make_session("a", answers=10))
+        cache.put(make_session("a", answers=0))
+        self.assertEqual(cache.stats()["approximateBytes"], len('{"id": "a", "status": "Completed", "answers": []}'))
+
+    def test_in_progress_sessions_live_longer(self):
+        cache = BoundedSessionCache(ttl_seconds=10, in_progress_ttl_seconds=100)
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0):
+            cache.put(make_session("done"))
+            cache.put(make_session("active", status="InProgress"))
+        with patch("shared_session_storage.time.monotonic", return_value=1050.0):
+            self.assertIsNone(cache.get("done"))
+            self.assertIsNotNone(cache.get("active"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_session_ttl_counts_from_last_write(self):
+        cache = BoundedSessionCache(ttl_seconds=10, in_progress_ttl_seconds=10)
+        session = dict(make_session("a", status="InProgress"), ttl=60)
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0):
+            cache.put(session)
+        with patch("shared_session_storage.time.monotonic", return_value=1050.0):
+            self.assertIsNotNone(cache.get("a"))
+            cache.put(session)  # activity renews the ttl
+        with patch("shared_session_storage.time.monotonic", return_value=1100.0):
+            self.assertIsNotNone(cache.get("a"))
+        with patch("shared_session_storage.time.monotonic", return_value=1111.0):
+            self.assertIsNone(cache.get("a"))
+
+    def test_session_ttl_of_minus_one_never_expires(self):
+        cache = BoundedSessionCache(ttl_seconds=10, in_progress_ttl_seconds=10, max_entries=2)
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0):
+            cache.put(dict(make_session("kept"), ttl=-1))
+            cache.put(make_session("default"))
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0 + 10 ** 9):
+            self.assertEqual(cache.expire(), 1)
+            self.assertIsNotNone(cache.get("kept"))
+            # Still subject to the LRU budget
+            cache.put(make_session("a"))
+            cache.put(make_session("b"))
+            self.assertIsNone(cache.get("kept"))
+
+    def test_evicted_sessions_are_handed_to_the_callback(self):
+        removed = []
+        cache = BoundedSessionCache(max_entries=2)
+        cache.on_expire = removed.extend
+        for session_id in ("a", "b", "c"):
+            cache.put(make_session(session_id))
+        self.assertEqual([session["id"] for session in removed], ["a"])
+
+    def test_peek_leaves_lru_order_and_counters_alone(self):
+        cache = BoundedSessionCache(max_entries=2)
+        cache.put(make_session("a"))
+        cache.put(make_session("b"))
+        self.assertEqual(cache.peek("a")["id"], "a")
+        self.assertIsNone(cache.peek("missing"))
+        cache.put(make_session("c"))  # "a" is still least recently used
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (0, 1))
+
+    def test_periodic_sweep_drops_unread_entries(self):
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0):
+            cache = BoundedSessionCache(ttl_seconds=10, sweep_interval_seconds=30)
+            for i in range(5):
+                cache.put(make_session(f"old{i}"))
+        with patch("shared_session_storage.time.monotonic", return_value=1020.0):
+            cache.put(make_session("new"))
+            self.assertEqual(len(cache), 6)  # expired, but the next sweep is not due yet
+        with patch("shared_session_storage.time.monotonic", return_value=1029.0):
+            self.assertIsNone(cache.get("missing"))
+            self.assertEqual(len(cache), 6)
+        with patch("shared_session_storage.time.monotonic", return_value=1031.0):
+            self.assertIsNone(cache.get("missing"))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.stats()["expirations"], 6)
+        self.assertEqual(cache.stats()["sweeps"], 1)
+
+    def test_expired_sessions_are_handed_to_the_callback(self):
+        expired = []
+        with patch("shared_session_storage.time.monotonic", return_value=1000.0):
+            cache = BoundedSessionCache(ttl_seconds=10, sweep_interval_seconds=30)
+            cache.on_expire = expired.extend
+            cache.put(make_session("a"))
+            cache.put(make_session("b"))
+        with patch("shared_session_storage.time.monotonic", return_value=1020.0):
+            self.assertIsNone(cache.get("a"))
+            cache.pop("b")  # deleted, not expired
+        self.assertEqual([session["id"] for session in expired], ["a"])
+
+
+if __name__ == '__main__':
+    unittest.main()